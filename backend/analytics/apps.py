@@ -5,3 +5,7 @@ class AnalyticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analytics'
     verbose_name = 'Analityka'
+
+    def ready(self):
+        # Znaczniki dni do przeliczenia dziennych faktów analitycznych.
+        from . import handlers  # noqa: F401
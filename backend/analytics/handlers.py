@@ -0,0 +1,90 @@
+"""
+Znaczniki dni do przeliczenia faktów (`services.facts.mark_dirty`) oraz
+unieważnianie cache metryk (`services.metrics_cache`) przy zmianie statusu,
+utworzeniu i usunięciu posta.
+
+Kierunek zależności: analytics → ideas / users; tamte nie wiedzą o analityce.
+Dzień faktu to dzień utworzenia posta, więc każda zmiana „dotyka” dokładnie
+dnia swojego posta — a zmiana działu autora wszystkich dni jego postów.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from ideas.models import Comment, KaizenPost, PostApproval, PostSurvey
+from .services import facts, metrics_cache
+
+User = get_user_model()
+
+
+def _mark_post_day(post_id):
+    # Queryset, nie lista: bez śledzonych faktów `mark_dirty` go nie wykona.
+    facts.mark_dirty(
+        KaizenPost.objects.filter(pk=post_id).values_list(TruncDate('created_at'), flat=True)
+    )
+
+
+def _on_post_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        facts.mark_dirty([facts.day_of(instance.created_at)])
+
+
+def _on_related_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _mark_post_day(instance.post_id)
+
+
+@receiver(pre_save, sender=KaizenPost)
+def _stash_status(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and 'status' not in update_fields:
+        return
+    instance._analytics_old_status = (
+        sender.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=KaizenPost)
+def _invalidate_on_status(sender, instance, created, raw=False, **kwargs):
+    old_status = instance.__dict__.pop('_analytics_old_status', instance.status)
+    if not raw and (created or old_status != instance.status):
+        transaction.on_commit(metrics_cache.invalidate)
+
+
+@receiver(post_delete, sender=KaizenPost)
+def _invalidate_on_delete(sender, instance, **kwargs):
+    transaction.on_commit(metrics_cache.invalidate)
+
+
+post_save.connect(_on_post_changed, sender=KaizenPost, dispatch_uid='analytics_facts_post_save')
+post_delete.connect(_on_post_changed, sender=KaizenPost, dispatch_uid='analytics_facts_post_delete')
+for _model in (PostSurvey, PostApproval, Comment):
+    post_save.connect(_on_related_changed, sender=_model, dispatch_uid=f'analytics_facts_save_{_model.__name__}')
+    post_delete.connect(_on_related_changed, sender=_model, dispatch_uid=f'analytics_facts_delete_{_model.__name__}')
+
+
+@receiver(pre_save, sender=User)
+def _stash_department(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance.pk is None or (update_fields is not None and 'department' not in update_fields):
+        return
+    instance._old_department_id = (
+        User.objects.filter(pk=instance.pk).values_list('department_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=User)
+def _on_department_changed(sender, instance, created, raw=False, **kwargs):
+    old_department_id = instance.__dict__.pop('_old_department_id', instance.department_id)
+    if raw or created or old_department_id == instance.department_id:
+        return
+    days = (
+        KaizenPost.objects.filter(author=instance)
+        .annotate(day=TruncDate('created_at'))
+        .values_list('day', flat=True)
+        .distinct()
+        .order_by()
+    )
+    facts.mark_dirty(days)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from analytics.services import facts
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds daily analytics fact tables from posts (run nightly).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true',
+                            help='Przelicz tylko dni oznaczone do przeliczenia (bez pełnej odbudowy).')
+
+    def handle(self, *args, **options):
+        if options['incremental']:
+            days = facts.refresh_dirty()
+            self.stdout.write(self.style.SUCCESS(f'Refreshed {days} dirty day(s).'))
+            return
+        count = facts.refresh_all()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} fact row(s).'))
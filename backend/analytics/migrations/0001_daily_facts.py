@@ -0,0 +1,63 @@
+# Generated by Django 6.0 on 2026-10-18 15:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('ideas', '0016_pendingupload'),
+        ('users', '0007_customuser_avatar_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtyFactDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Dzień do przeliczenia',
+                'verbose_name_plural': 'Dni do przeliczenia',
+            },
+        ),
+        migrations.CreateModel(
+            name='FactsRefreshState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Stan faktów analitycznych',
+                'verbose_name_plural': 'Stan faktów analitycznych',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyPostFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('TO_VERIFY', 'Do weryfikacji'), ('SUBMITTED', 'Zgłoszony'), ('IN_PROGRESS', 'W trakcie wdrożenia'), ('IMPLEMENTED', 'Wdrożone'), ('CANCELLED', 'Odrzucony')], max_length=20)),
+                ('posts', models.PositiveIntegerField(default=0)),
+                ('savings_money', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('savings_hours', models.FloatField(default=0)),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('approval_seconds', models.FloatField(default=0)),
+                ('approvals', models.PositiveIntegerField(default=0)),
+                ('progress_sum', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ideas.category')),
+                ('department', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='users.department')),
+            ],
+            options={
+                'verbose_name': 'Dzienny fakt analityczny',
+                'verbose_name_plural': 'Dzienne fakty analityczne',
+                'indexes': [models.Index(fields=['day'], name='analytics_fact_day_idx')],
+            },
+        ),
+    ]
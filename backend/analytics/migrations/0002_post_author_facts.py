@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-18 17:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_daily_facts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostAuthorFact',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('first_day', models.DateField()),
+            ],
+            options={
+                'verbose_name': 'Autor w faktach',
+                'verbose_name_plural': 'Autorzy w faktach',
+                'indexes': [models.Index(fields=['first_day'], name='analytics_author_day_idx')],
+            },
+        ),
+    ]
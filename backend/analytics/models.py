@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.db import models
+
+from ideas.models import Category, KaizenPost
+from users.models import Department
+
+
+class DailyPostFact(models.Model):
+    """Zagregowane posty z jednego dnia utworzenia (strefa `TIME_ZONE`) × dział autora × kategoria × status.
+
+    Pochodna `KaizenPost` / `PostSurvey` / `PostApproval`; odświeżana
+    przyrostowo (`services.facts`) i w całości: `manage.py refresh_analytics`.
+    """
+    day = models.DateField()
+    department = models.ForeignKey(Department, on_delete=models.SET_NULL, null=True, related_name='+')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    status = models.CharField(max_length=20, choices=KaizenPost.Status.choices)
+
+    posts = models.PositiveIntegerField(default=0)
+    savings_money = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    savings_hours = models.FloatField(default=0)
+    cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Czas od utworzenia posta do akceptacji etapu MANAGER: suma sekund i liczba etapów.
+    approval_seconds = models.FloatField(default=0)
+    approvals = models.PositiveIntegerField(default=0)
+    progress_sum = models.PositiveIntegerField(default=0)
+    comments = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Dzienny fakt analityczny'
+        verbose_name_plural = 'Dzienne fakty analityczne'
+        indexes = [models.Index(fields=['day'], name='analytics_fact_day_idx')]
+
+    def __str__(self):
+        return f'{self.day} {self.department_id}/{self.category_id}/{self.status}: {self.posts}'
+
+
+class PostAuthorFact(models.Model):
+    """Autor z co najmniej jednym postem i dniem pierwszego z nich.
+
+    Unikalnych autorów nie da się zsumować z dziennych faktów, a liczenie ich
+    z postów to pełny skan — tu wystarczy `COUNT(*)` po tabeli wielkości
+    liczby autorów. Odświeżana razem z `DailyPostFact`.
+    """
+    author = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='+',
+    )
+    first_day = models.DateField()
+
+    class Meta:
+        verbose_name = 'Autor w faktach'
+        verbose_name_plural = 'Autorzy w faktach'
+        indexes = [models.Index(fields=['first_day'], name='analytics_author_day_idx')]
+
+    def __str__(self):
+        return f'{self.author_id}: {self.first_day}'
+
+
+class DirtyFactDay(models.Model):
+    """Dzień, którego fakty trzeba przeliczyć (zapisany w transakcji zmiany)."""
+    day = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Dzień do przeliczenia'
+        verbose_name_plural = 'Dni do przeliczenia'
+
+
+class FactsRefreshState(models.Model):
+    """Jeden wiersz (pk=1): czas ostatniego pełnego odświeżenia; blokada odświeżeń."""
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Stan faktów analitycznych'
+        verbose_name_plural = 'Stan faktów analitycznych'
+
+    def __str__(self):
+        return f'Fakty odświeżone: {self.refreshed_at}'
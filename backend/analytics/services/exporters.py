@@ -1,14 +1,51 @@
-"""Generowanie raportów CSV / XLSX z danych analityki."""
+"""
+Generowanie raportów CSV / XLSX z danych analityki.
+
+Raporty zagregowane mają kilkadziesiąt wierszy; raport `posts` (wiersz na
+post, z ankietą, etapami akceptacji i kosztem) może mieć setki tysięcy.
+Dlatego eksport strumieniujemy: CSV to generator kawałków pliku
+(`stream_csv`), a XLSX powstaje w trybie write-only openpyxl w pliku
+tymczasowym (`xlsx_file`). Wiersze `posts` czytamy `iterator()` — pamięć
+nie rośnie z liczbą postów.
+
+Pod ASGI Django konsumuje synchroniczny iterator odpowiedzi w całości
+(`sync_to_async(list)`) przed wysłaniem pierwszego bajtu, dlatego widok
+opakowuje kawałki w `aiter_chunks` — iterator asynchroniczny pobierający je
+pojedynczo.
+"""
 import csv
-import io
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.db.models import F, FilteredRelation, Q
+from django.utils import timezone
 
-from . import metrics
+from ideas.models import KaizenPost, PostApproval
+from . import metrics_cache
+
+CSV_CHUNK_ROWS = 500
+FILE_CHUNK_SIZE = 64 * 1024
+ITERATOR_CHUNK_SIZE = 2000
+DEFAULT_COLUMN_WIDTH = 14
+MAX_COLUMN_WIDTH = 40
+
+POST_HEADERS = [
+    'ID', 'Tytuł', 'Autor', 'Dział', 'Kategoria', 'Status', 'Utworzono', 'Postęp (%)',
+    'Koszt (zł)', 'Oszczędności (zł)', 'Oszczędności czasu (h)',
+    'Lider zespołu', 'Decyzja lidera', 'Kierownik', 'Decyzja kierownika', 'Data decyzji kierownika',
+    'Dyrektor', 'Decyzja dyrektora',
+]
+APPROVAL_STAGES = (
+    ('tl', PostApproval.Stage.TEAM_LEAD),
+    ('mgr', PostApproval.Stage.MANAGER),
+    ('dir', PostApproval.Stage.DIRECTOR),
+)
 
 
 def _report_rows(report):
-    """Zwraca (nagłówki, wiersze) dla danego raportu."""
+    """Zwraca (nagłówki, wiersze) dla danego raportu; wiersze `posts` to generator."""
     if report == 'overview':
-        d = metrics.overview()
+        d = metrics_cache.overview()
         sb = d['status_breakdown']
         headers = ['Metryka', 'Wartość']
         rows = [
@@ -28,7 +65,7 @@ def _report_rows(report):
         return headers, rows
 
     if report == 'departments':
-        data = metrics.departments()
+        data = metrics_cache.departments()
         headers = ['Dział', 'Pomysły', 'Wdrożone', '% wdrożeń',
                    'Oszczędności (zł)', 'Koszt (zł)', 'ROI', 'Śr. akceptacja (h)']
         rows = [
@@ -40,7 +77,7 @@ def _report_rows(report):
         return headers, rows
 
     if report == 'categories':
-        data = metrics.categories()
+        data = metrics_cache.categories()
         headers = ['Kategoria', 'Pomysły', 'Wdrożone', '% wdrożeń', 'Oszczędności (zł)']
         rows = [
             [r['category'], r['total_ideas'], r['implemented'],
@@ -50,7 +87,7 @@ def _report_rows(report):
         return headers, rows
 
     if report == 'trends':
-        data = metrics.trends()
+        data = metrics_cache.trends()
         headers = ['Okres', 'Zgłoszenia', 'Wdrożenia', 'Oszczędności (zł)']
         rows = [
             [r['period'], r['submissions'], r['implementations'], r['savings']]
@@ -58,45 +95,171 @@ def _report_rows(report):
         ]
         return headers, rows
 
+    if report == 'posts':
+        return POST_HEADERS, _post_rows()
+
     raise ValueError(f'Nieznany raport: {report}')
 
 
-def to_csv(report):
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _safe_text(value):
+    """Tekst użytkownika zaczynający się od znaku formuły dostaje prefiks `'` —
+    Excel nie wykona go po otwarciu eksportu (CSV/formula injection)."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _format_datetime(value):
+    return timezone.localtime(value).strftime('%Y-%m-%d %H:%M') if value else ''
+
+
+def _post_rows():
+    """Wiersz na post. Etapy akceptacji są unikalne per post, więc dołączamy je
+    (`FilteredRelation`) zamiast prefetchu — jedno zapytanie czytane porcjami."""
+    stages = {
+        f'{alias}_approval': FilteredRelation('approvals', condition=Q(approvals__stage=stage))
+        for alias, stage in APPROVAL_STAGES
+    }
+    columns = {
+        'author_name': F('author__username'),
+        'department_name': F('author__department__name'),
+        'category_name': F('category__name'),
+        'money': F('survey__estimated_financial_savings'),
+        'hours': F('survey__estimated_time_savings_hours'),
+    }
+    for alias, _ in APPROVAL_STAGES:
+        columns[f'{alias}_approver'] = F(f'{alias}_approval__approver__username')
+        columns[f'{alias}_decision'] = F(f'{alias}_approval__decision')
+    columns['mgr_decided_at'] = F('mgr_approval__decided_at')
+
+    rows = (
+        KaizenPost.objects.annotate(**stages)
+        .annotate(**columns)
+        .order_by('pk')
+        .values_list(
+            'pk', 'title', 'author_name', 'department_name', 'category_name', 'status',
+            'created_at', 'progress_percent', 'estimated_cost', 'money', 'hours',
+            'tl_approver', 'tl_decision', 'mgr_approver', 'mgr_decision', 'mgr_decided_at',
+            'dir_approver', 'dir_decision',
+        )
+    )
+    for row in rows.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        row = list(row)
+        row[6] = _format_datetime(row[6])
+        row[15] = _format_datetime(row[15])
+        yield ['' if value is None else _safe_text(value) for value in row]
+
+
+class _Echo:
+    """Pseudo-plik dla `csv.writer`: `write` zwraca linię zamiast ją zapisywać."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(report):
+    """Generator kawałków pliku CSV (bajty, UTF-8 z BOM dla Excela).
+
+    Nieznany raport zgłasza ValueError od razu, przed pierwszym kawałkiem.
+    """
     headers, rows = _report_rows(report)
-    buf = io.StringIO()
-    writer = csv.writer(buf, delimiter=';')
-    writer.writerow(headers)
-    writer.writerows(rows)
-    return buf.getvalue().encode('utf-8-sig')
 
+    def chunks():
+        writer = csv.writer(_Echo(), delimiter=';')
+        yield ('\ufeff' + writer.writerow(headers)).encode('utf-8')
+        lines = []
+        for row in rows:
+            lines.append(writer.writerow(row))
+            if len(lines) == CSV_CHUNK_ROWS:
+                yield ''.join(lines).encode('utf-8')
+                lines = []
+        if lines:
+            yield ''.join(lines).encode('utf-8')
 
-def to_xlsx(report):
+    return chunks()
+
+
+def file_chunks(out):
+    """Generator kawałków otwartego pliku; zamyka plik po odczycie (albo `close()`)."""
+    with out:
+        yield from iter(lambda: out.read(FILE_CHUNK_SIZE), b'')
+
+
+async def aiter_chunks(chunks):
+    """Asynchroniczny iterator po synchronicznym generatorze kawałków.
+
+    Każdy kawałek pobieramy osobnym `sync_to_async(next)` (w wątku żądania,
+    więc z tym samym połączeniem i kursorem `iterator()`), więc w pamięci
+    jest naraz jeden kawałek.
+    """
+    done = object()
+    pull = sync_to_async(next)
+    try:
+        while True:
+            chunk = await pull(chunks, done)
+            if chunk is done:
+                return
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
+
+
+def to_csv(report):
+    return b''.join(stream_csv(report))
+
+
+def _column_widths(headers, rows):
+    """Szerokości kolumn. Tryb write-only wymaga ich przed wierszami, więc dla
+    małych raportów (listy) liczymy je jednym przejściem po danych, a dla
+    strumienia (`posts`) — z nagłówków."""
+    if not isinstance(rows, list):
+        return [min(MAX_COLUMN_WIDTH, max(len(str(header)), DEFAULT_COLUMN_WIDTH) + 4) for header in headers]
+    widths = [len(str(header)) for header in headers]
+    for row in rows:
+        for index, value in enumerate(row):
+            widths[index] = max(widths[index], len(str(value)))
+    return [min(MAX_COLUMN_WIDTH, width + 4) for width in widths]
+
+
+def xlsx_file(report):
+    """Raport XLSX zapisany w pliku tymczasowym (tryb write-only); zwraca otwarty plik od początku.
+
+    Plik znika po zamknięciu — `FileResponse` zamyka go po wysłaniu.
+    """
     from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
     from openpyxl.styles import Font, PatternFill
+    from openpyxl.utils import get_column_letter
 
     headers, rows = _report_rows(report)
-    wb = Workbook()
-    ws = wb.active
-    ws.title = report[:31]
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(report[:31])
+
+    for index, width in enumerate(_column_widths(headers, rows), start=1):
+        ws.column_dimensions[get_column_letter(index)].width = width
 
     header_fill = PatternFill('solid', fgColor='1D2B64')
     header_font = Font(bold=True, color='FFFFFF')
-    ws.append(headers)
-    for cell in ws[1]:
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
         cell.fill = header_fill
         cell.font = header_font
+        header_cells.append(cell)
+    ws.append(header_cells)
 
     for row in rows:
         ws.append(row)
 
-    for col_idx, _ in enumerate(headers, start=1):
-        letter = ws.cell(row=1, column=col_idx).column_letter
-        width = max(
-            len(str(headers[col_idx - 1])),
-            *(len(str(r[col_idx - 1])) for r in rows) if rows else [10],
-        )
-        ws.column_dimensions[letter].width = min(40, width + 4)
-
-    out = io.BytesIO()
+    out = tempfile.TemporaryFile()
     wb.save(out)
-    return out.getvalue()
+    out.seek(0)
+    return out
+
+
+def to_xlsx(report):
+    with xlsx_file(report) as out:
+        return out.read()
@@ -0,0 +1,191 @@
+"""
+Dzienne fakty analityczne (`DailyPostFact`).
+
+Dashboard czyta zagregowane dni zamiast wszystkich postów, więc jego koszt
+nie rośnie z długością historii. Fakty są pochodną postów:
+
+- zmiana posta, ankiety, etapu akceptacji, komentarza albo działu autora
+  zapisuje w tej samej transakcji dzień do przeliczenia (`DirtyFactDay`,
+  sygnały w `analytics.handlers`) i po commicie zleca zadanie
+  `analytics.refresh_facts`, które przelicza te dni od zera — chyba że
+  w kolejce czeka już takie, które jeszcze nie ruszyło;
+- dopóki faktów nie przeliczono ani razu, nikt ich nie czyta, więc dni nie
+  znaczymy (pierwsze `refresh_all` i tak liczy wszystko);
+- `manage.py refresh_analytics` (co noc) przelicza wszystko i zapisuje czas
+  odświeżenia — wyrównuje ścieżki omijające sygnały (`bulk_create`, `update`).
+
+Obok dni trzymamy autorów z dniem ich pierwszego posta (`PostAuthorFact`) —
+przegląd liczy unikalnych autorów bez skanu postów.
+
+Fakty uznajemy za świeże (`is_fresh`), gdy pełne odświeżenie jest młodsze niż
+`ANALYTICS_FACTS_MAX_AGE_HOURS`; inaczej metryki liczą z surowych tabel.
+Odczyt niczego nie przelicza: zaległe dni opróżnia tylko zadanie, więc
+świeże fakty mogą spóźniać się o czas jego wykonania. Po zatwierdzeniu
+odświeżenia unieważniamy cache metryk — wynik policzony ze starych faktów
+nie dotrwa do końca TTL.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, FilteredRelation, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ideas.models import KaizenPost, PostApproval
+from jobs.models import Job
+from jobs.services import MODE_WORKER, enqueue, queue_mode
+from ..models import DailyPostFact, DirtyFactDay, FactsRefreshState, PostAuthorFact
+
+
+REFRESH_TASK = 'analytics.refresh_facts'
+
+
+def day_of(moment):
+    return timezone.localdate(moment)
+
+
+def max_age():
+    return timedelta(hours=getattr(settings, 'ANALYTICS_FACTS_MAX_AGE_HOURS', 36))
+
+
+def is_tracked():
+    """Czy fakty przeliczono choć raz (tylko wtedy utrzymujemy je na bieżąco)."""
+    return FactsRefreshState.objects.filter(pk=1, refreshed_at__isnull=False).exists()
+
+
+def _enqueue_refresh():
+    # Oczekujące zadanie odczyta znaczniki dopiero przy starcie — obejmie też nasze.
+    if queue_mode() == MODE_WORKER and Job.objects.filter(
+        name=REFRESH_TASK, status=Job.Status.PENDING,
+    ).exists():
+        return
+    enqueue(REFRESH_TASK)
+
+
+def mark_dirty(days):
+    """Oznacza dni do przeliczenia i po commicie zleca ich przeliczenie.
+
+    `days` może być querysetem — bez śledzonych faktów nie jest wykonywany.
+    """
+    if not is_tracked():
+        return
+    days = {day for day in days if day is not None}
+    if not days:
+        return
+    DirtyFactDay.objects.bulk_create([DirtyFactDay(day=day) for day in days])
+    transaction.on_commit(_enqueue_refresh)
+
+
+def _facts(qs):
+    """Fakty policzone jednym `GROUP BY` z podanych postów."""
+    approval_delta = ExpressionWrapper(
+        F('manager_approval__decided_at') - F('created_at'),
+        output_field=DurationField(),
+    )
+    decided = Q(manager_approval__decided_at__isnull=False)
+    rows = (
+        qs.annotate(
+            manager_approval=FilteredRelation(
+                'approvals',
+                condition=Q(
+                    approvals__stage=PostApproval.Stage.MANAGER,
+                    approvals__decision=PostApproval.Decision.APPROVED,
+                ),
+            ),
+        )
+        .values('category_id', 'status', fact_day=TruncDate('created_at'), fact_department=F('author__department'))
+        .annotate(
+            posts=Count('id'),
+            savings_money=Sum('survey__estimated_financial_savings', default=0),
+            savings_hours=Sum('survey__estimated_time_savings_hours', default=0.0),
+            cost=Sum('estimated_cost', default=0),
+            approval=Sum(approval_delta, filter=decided),
+            approvals=Count('id', filter=decided),
+            progress_sum=Sum('progress_percent'),
+            comments=Sum('comments_count'),
+        )
+        .values(
+            'fact_day', 'fact_department', 'category_id', 'status', 'posts', 'savings_money',
+            'savings_hours', 'cost', 'approval', 'approvals', 'progress_sum', 'comments',
+        )
+        .order_by()
+    )
+    for row in rows.iterator(chunk_size=2000):
+        approval = row.pop('approval')
+        yield DailyPostFact(
+            day=row.pop('fact_day'),
+            department_id=row.pop('fact_department'),
+            approval_seconds=approval.total_seconds() if approval else 0.0,
+            **row,
+        )
+
+
+def _author_facts(qs):
+    rows = qs.values('author').annotate(first_day=Min(TruncDate('created_at'))).order_by()
+    for row in rows.iterator(chunk_size=2000):
+        yield PostAuthorFact(author_id=row['author'], first_day=row['first_day'])
+
+
+def _lock():
+    """Blokada wiersza stanu — odświeżenia nie przeplatają kasowania i wstawiania."""
+    state, _ = FactsRefreshState.objects.select_for_update().get_or_create(pk=1)
+    return state
+
+
+def _invalidate_metrics():
+    # Import lokalny: metrics_cache → metrics → facts.
+    from . import metrics_cache
+
+    transaction.on_commit(metrics_cache.invalidate)
+
+
+def rebuild_days(days):
+    posts = KaizenPost.objects.filter(created_at__date__in=days)
+    DailyPostFact.objects.filter(day__in=days).delete()
+    DailyPostFact.objects.bulk_create(_facts(posts), batch_size=1000)
+
+    # Autorzy z postami w tych dniach oraz ci, których pierwszy post mógł z nich zniknąć.
+    authors = set(posts.values_list('author', flat=True).distinct().order_by())
+    authors.update(PostAuthorFact.objects.filter(first_day__in=days).values_list('author', flat=True))
+    PostAuthorFact.objects.filter(author__in=authors).delete()
+    PostAuthorFact.objects.bulk_create(
+        _author_facts(KaizenPost.objects.filter(author__in=authors)), batch_size=1000,
+    )
+
+
+def refresh_dirty():
+    """Przelicza zaległe dni; zwraca ich liczbę."""
+    if not DirtyFactDay.objects.exists():
+        return 0
+    with transaction.atomic():
+        _lock()
+        markers = list(DirtyFactDay.objects.values_list('pk', 'day'))
+        days = sorted({day for _, day in markers})
+        if days:
+            rebuild_days(days)
+            # Tylko odczytane znaczniki — zmiana zatwierdzona w trakcie zostawia nowy.
+            DirtyFactDay.objects.filter(pk__in=[pk for pk, _ in markers]).delete()
+            _invalidate_metrics()
+    return len(days)
+
+
+def refresh_all():
+    """Przelicza wszystkie fakty od zera; zwraca liczbę wierszy."""
+    with transaction.atomic():
+        state = _lock()
+        markers = list(DirtyFactDay.objects.values_list('pk', flat=True))
+        DailyPostFact.objects.all().delete()
+        count = len(DailyPostFact.objects.bulk_create(_facts(KaizenPost.objects.all()), batch_size=1000))
+        PostAuthorFact.objects.all().delete()
+        PostAuthorFact.objects.bulk_create(_author_facts(KaizenPost.objects.all()), batch_size=1000)
+        DirtyFactDay.objects.filter(pk__in=markers).delete()
+        state.refreshed_at = timezone.now()
+        state.save(update_fields=['refreshed_at'])
+        _invalidate_metrics()
+    return count
+
+
+def is_fresh():
+    refreshed_at = FactsRefreshState.objects.filter(pk=1).values_list('refreshed_at', flat=True).first()
+    return refreshed_at is not None and timezone.now() - refreshed_at <= max_age()
@@ -1,6 +1,9 @@
 """
 Czysta warstwa agregacji analityki — funkcje bezstanowe, testowalne,
 niezależne od HTTP. Widoki DRF tylko je wołają i serializują.
+
+Przegląd, zestawienia działów/kategorii i trendy czytają dzienne fakty
+(`services.facts`), gdy są świeże; w przeciwnym razie liczą z surowych tabel.
 """
 from datetime import timedelta
 from decimal import Decimal
@@ -12,6 +15,7 @@ from django.db.models import (
     DurationField,
     ExpressionWrapper,
     F,
+    FilteredRelation,
     FloatField,
     Q,
     Sum,
@@ -19,7 +23,9 @@ from django.db.models import (
 from django.db.models.functions import TruncMonth, TruncQuarter
 from django.utils import timezone
 
-from ideas.models import Category, Comment, KaizenPost, PostApproval, PostSurvey
+from ideas.models import KaizenPost, PostApproval, PostSurvey
+from ..models import DailyPostFact, PostAuthorFact
+from . import facts
 
 Status = KaizenPost.Status
 
@@ -40,26 +46,6 @@ def _status_breakdown(qs):
     return out
 
 
-def _approval_hours(qs):
-    """Średni czas (h) od utworzenia posta do decyzji APPROVED etapu MANAGER."""
-    approvals = PostApproval.objects.filter(
-        post__in=qs,
-        stage=PostApproval.Stage.MANAGER,
-        decision=PostApproval.Decision.APPROVED,
-        decided_at__isnull=False,
-    ).annotate(
-        delta=ExpressionWrapper(
-            F('decided_at') - F('post__created_at'),
-            output_field=DurationField(),
-        )
-    )
-    agg = approvals.aggregate(avg=Avg('delta'))
-    delta = agg['avg']
-    if not delta:
-        return 0.0
-    return round(delta.total_seconds() / 3600.0, 1)
-
-
 def _savings(qs):
     """Zrealizowane (IMPLEMENTED) i potencjalne (wszystkie z ankietą) oszczędności."""
     realized = PostSurvey.objects.filter(
@@ -80,87 +66,227 @@ def _savings(qs):
     }
 
 
+def filter_posts(qs, date_from=None, date_to=None, statuses=None):
+    """Zawęża posty do zakresu dat utworzenia (włącznie) i listy statusów."""
+    if date_from is not None:
+        qs = qs.filter(created_at__date__gte=date_from)
+    if date_to is not None:
+        qs = qs.filter(created_at__date__lte=date_to)
+    if statuses:
+        qs = qs.filter(status__in=statuses)
+    return qs
+
+
+def filter_facts(qs, date_from=None, date_to=None, statuses=None):
+    """`filter_posts` dla `DailyPostFact` (dzień faktu = dzień utworzenia posta)."""
+    if date_from is not None:
+        qs = qs.filter(day__gte=date_from)
+    if date_to is not None:
+        qs = qs.filter(day__lte=date_to)
+    if statuses:
+        qs = qs.filter(status__in=statuses)
+    return qs
+
+
+def _with_manager_approval(qs):
+    """Dołącza zaakceptowany etap MANAGER jako `manager_approval`.
+
+    Etap jest unikalny per post (`unique_together`), a ankieta to relacja 1:1,
+    więc żadne z dołączeń w agregatach poniżej nie mnoży wierszy postów.
+    """
+    return qs.annotate(
+        manager_approval=FilteredRelation(
+            'approvals',
+            condition=Q(
+                approvals__stage=PostApproval.Stage.MANAGER,
+                approvals__decision=PostApproval.Decision.APPROVED,
+            ),
+        ),
+    )
+
+
+def _kpi_aggregates():
+    """Wspólne agregaty warunkowe przeglądu i zestawień per dział / kategoria."""
+    implemented = Q(status=Status.IMPLEMENTED)
+    approval_delta = ExpressionWrapper(
+        F('manager_approval__decided_at') - F('created_at'),
+        output_field=DurationField(),
+    )
+    return {
+        'total': Count('id'),
+        **{f'status_{s.value}': Count('id', filter=Q(status=s)) for s in Status},
+        'realized_money': Sum('survey__estimated_financial_savings', filter=implemented),
+        'realized_hours': Sum('survey__estimated_time_savings_hours', filter=implemented),
+        'potential_money': Sum('survey__estimated_financial_savings'),
+        'potential_hours': Sum('survey__estimated_time_savings_hours'),
+        'avg_approval': Avg(approval_delta, filter=Q(manager_approval__decided_at__isnull=False)),
+    }
+
+
+def _fact_aggregates():
+    """Odpowiedniki `_kpi_aggregates` liczone z `DailyPostFact`."""
+    implemented = Q(status=Status.IMPLEMENTED)
+    return {
+        'total': Sum('posts', default=0),
+        **{f'status_{s.value}': Sum('posts', filter=Q(status=s), default=0) for s in Status},
+        'realized_money': Sum('savings_money', filter=implemented),
+        'realized_hours': Sum('savings_hours', filter=implemented),
+        'potential_money': Sum('savings_money'),
+        'potential_hours': Sum('savings_hours'),
+        'approval_seconds': Sum('approval_seconds'),
+        'approvals': Sum('approvals'),
+    }
+
+
+def _hours(delta):
+    return round(delta.total_seconds() / 3600.0, 1) if delta else 0.0
+
+
+def _approval_hours_of(row):
+    """Średni czas akceptacji (h) z wiersza agregatów — surowego albo z faktów."""
+    if 'avg_approval' in row:
+        return _hours(row['avg_approval'])
+    if not row['approvals']:
+        return 0.0
+    return round(row['approval_seconds'] / row['approvals'] / 3600.0, 1)
+
+
+def _breakdown(agg):
+    return {s.value: agg[f'status_{s.value}'] for s in Status}
+
+
+def _savings_of(agg):
+    return {
+        'realized_money': float(agg['realized_money'] or 0),
+        'realized_hours': round(float(agg['realized_hours'] or 0), 1),
+        'potential_money': float(agg['potential_money'] or 0),
+        'potential_hours': round(float(agg['potential_hours'] or 0), 1),
+    }
+
+
 def overview(base_qs=None):
-    qs = base_qs if base_qs is not None else KaizenPost.objects.all()
-    total = qs.count()
-    breakdown = _status_breakdown(qs)
+    """Przegląd całego programu jednym zapytaniem (agregaty warunkowe).
+
+    Komentarze bierzemy z licznika `comments_count` posta. Bez `base_qs`
+    i przy świeżych faktach — z faktów (unikalnych autorów z `PostAuthorFact`).
+    """
+    if base_qs is None and facts.is_fresh():
+        agg = DailyPostFact.objects.aggregate(
+            **_fact_aggregates(),
+            progress_sum=Sum('progress_sum', filter=Q(status=Status.IN_PROGRESS)),
+            comments=Sum('comments'),
+        )
+        in_progress = agg[f'status_{Status.IN_PROGRESS.value}']
+        agg['avg_progress'] = agg['progress_sum'] / in_progress if in_progress else None
+        agg['authors'] = PostAuthorFact.objects.count()
+    else:
+        qs = base_qs if base_qs is not None else KaizenPost.objects.all()
+        agg = _with_manager_approval(qs).aggregate(
+            **_kpi_aggregates(),
+            avg_progress=Avg('progress_percent', filter=Q(status=Status.IN_PROGRESS)),
+            comments=Sum('comments_count'),
+            authors=Count('author', distinct=True),
+        )
+
+    total = agg['total']
+    breakdown = _breakdown(agg)
     non_cancelled = total - breakdown.get(Status.CANCELLED, 0)
     implemented = breakdown.get(Status.IMPLEMENTED, 0)
-    avg_progress = qs.filter(status=Status.IN_PROGRESS).aggregate(
-        v=Avg('progress_percent')
-    )['v']
-    savings = _savings(qs)
     return {
         'total_ideas': total,
         'status_breakdown': breakdown,
         'implemented_rate': _safe_div(implemented * 100, non_cancelled),
-        'avg_approval_hours': _approval_hours(qs),
-        'avg_progress': round(float(avg_progress or 0), 1),
-        'savings': savings,
+        'avg_approval_hours': _approval_hours_of(agg),
+        'avg_progress': round(float(agg['avg_progress'] or 0), 1),
+        'savings': _savings_of(agg),
         'engagement': {
-            'comments': Comment.objects.filter(post__in=qs).count(),
-            'authors': qs.values('author').distinct().count(),
+            'comments': agg['comments'] or 0,
+            'authors': agg['authors'],
         },
     }
 
 
-def departments():
-    """KPI per dział: pomysły, % wdrożeń, oszczędności, ROI, czas akceptacji."""
-    from users.models import Department
+def _grouped(group_by, fact_group_by, **filters):
+    """Agregaty KPI w jednym `GROUP BY` — grupy bez postów nie występują.
+
+    Wiersze mają klucze `group_id` / `group_name` i agregaty KPI; źródłem są
+    fakty (grupowane po `fact_group_by`), gdy świeże, inaczej posty.
+    """
+    if facts.is_fresh():
+        qs = filter_facts(DailyPostFact.objects.filter(**{f'{fact_group_by}__isnull': False}), **filters)
+        group_by, aggregates = fact_group_by, {**_fact_aggregates(), 'cost': Sum('cost')}
+    else:
+        qs = _with_manager_approval(
+            filter_posts(KaizenPost.objects.filter(**{f'{group_by}__isnull': False}), **filters)
+        )
+        aggregates = {**_kpi_aggregates(), 'cost': Sum('estimated_cost')}
+    return (
+        qs.values(group_id=F(group_by), group_name=F(f'{group_by}__name'))
+        .annotate(**aggregates)
+        .order_by('group_name', 'group_id')
+    )
+
 
+def departments(date_from=None, date_to=None, statuses=None):
+    """KPI per dział: pomysły, % wdrożeń, oszczędności, ROI, czas akceptacji.
+
+    Jedno zapytanie niezależnie od liczby działów; filtry jak w `filter_posts`.
+    """
+    rows = _grouped(
+        'author__department', 'department',
+        date_from=date_from, date_to=date_to, statuses=statuses,
+    )
     result = []
-    for dep in Department.objects.all().order_by('name'):
-        qs = KaizenPost.objects.filter(author__department=dep)
-        total = qs.count()
-        if total == 0:
-            continue
-        breakdown = _status_breakdown(qs)
-        implemented = breakdown.get(Status.IMPLEMENTED, 0)
-        savings = _savings(qs)
-        cost = qs.aggregate(c=Sum('estimated_cost'))['c'] or Decimal('0')
+    for row in rows:
+        implemented = row[f'status_{Status.IMPLEMENTED.value}']
+        savings = _savings_of(row)
+        cost = row['cost'] or Decimal('0')
         result.append({
-            'department_id': dep.id,
-            'department': dep.name,
-            'total_ideas': total,
+            'department_id': row['group_id'],
+            'department': row['group_name'],
+            'total_ideas': row['total'],
             'implemented': implemented,
-            'implemented_rate': _safe_div(implemented * 100, total),
+            'implemented_rate': _safe_div(implemented * 100, row['total']),
             'savings_money': savings['realized_money'],
             'savings_potential': savings['potential_money'],
             'estimated_cost': float(cost),
             'roi': _safe_div(savings['realized_money'], float(cost)) if cost else 0.0,
-            'avg_approval_hours': _approval_hours(qs),
+            'avg_approval_hours': _approval_hours_of(row),
         })
     result.sort(key=lambda r: r['savings_money'], reverse=True)
     return result
 
 
-def categories():
+def categories(date_from=None, date_to=None, statuses=None):
+    """KPI per kategoria — jedno zapytanie; filtry jak w `filter_posts`."""
+    rows = _grouped(
+        'category', 'category',
+        date_from=date_from, date_to=date_to, statuses=statuses,
+    )
     result = []
-    for cat in Category.objects.all().order_by('name'):
-        qs = KaizenPost.objects.filter(category=cat)
-        total = qs.count()
-        if total == 0:
-            continue
-        breakdown = _status_breakdown(qs)
-        savings = _savings(qs)
+    for row in rows:
+        implemented = row[f'status_{Status.IMPLEMENTED.value}']
         result.append({
-            'category_id': cat.id,
-            'category': cat.name,
-            'total_ideas': total,
-            'implemented': breakdown.get(Status.IMPLEMENTED, 0),
-            'implemented_rate': _safe_div(
-                breakdown.get(Status.IMPLEMENTED, 0) * 100, total
-            ),
-            'savings_money': savings['realized_money'],
+            'category_id': row['group_id'],
+            'category': row['group_name'],
+            'total_ideas': row['total'],
+            'implemented': implemented,
+            'implemented_rate': _safe_div(implemented * 100, row['total']),
+            'savings_money': _savings_of(row)['realized_money'],
         })
     result.sort(key=lambda r: r['total_ideas'], reverse=True)
     return result
 
 
 def trends(granularity='month', months_back=12):
-    """Szeregi czasowe: zgłoszenia, wdrożenia, oszczędności w okresach."""
+    """Szeregi czasowe: zgłoszenia, wdrożenia, oszczędności w okresach.
+
+    Z faktów okno zaczyna się od pełnego dnia `since` (fakty nie znają godzin).
+    """
     trunc = TruncQuarter if granularity == 'quarter' else TruncMonth
     since = timezone.now() - timedelta(days=months_back * 31)
+    if facts.is_fresh():
+        return _trends_from_facts(trunc, timezone.localdate(since))
 
     submissions = (
         KaizenPost.objects.filter(created_at__gte=since)
@@ -206,6 +332,30 @@ def trends(granularity='month', months_back=12):
     ]
 
 
+def _trends_from_facts(trunc, since_day):
+    implemented = Q(status=Status.IMPLEMENTED)
+    rows = (
+        DailyPostFact.objects.filter(day__gte=since_day)
+        .annotate(period=trunc('day'))
+        .values('period')
+        .annotate(
+            submissions=Sum('posts'),
+            implementations=Sum('posts', filter=implemented, default=0),
+            savings=Sum('savings_money', filter=implemented),
+        )
+        .order_by('period')
+    )
+    return [
+        {
+            'period': row['period'].isoformat(),
+            'submissions': int(row['submissions']),
+            'implementations': int(row['implementations']),
+            'savings': float(row['savings'] or 0),
+        }
+        for row in rows
+    ]
+
+
 def activity_heatmap(user, year):
     """Mapa aktywności dzień→liczba (proxy: pozytywne transakcje punktowe)."""
     from gamification.models import PointTransaction
@@ -226,22 +376,25 @@ def activity_heatmap(user, year):
 
 def me_impact(user):
     qs = KaizenPost.objects.filter(author=user)
-    total = qs.count()
     breakdown = _status_breakdown(qs)
     savings = _savings(qs)
     gamification = getattr(user, 'gamification', None)
     from gamification.services.leaderboard import user_rank
+    from gamification.services.stats import get_stats
 
+    # Liczniki z jednego wiersza UserStats; rozkład statusów i oszczędności
+    # nadal liczymy z postów.
+    stats = get_stats(user)
     return {
-        'total_ideas': total,
+        'total_ideas': stats.posts_count,
         'status_breakdown': breakdown,
-        'implemented': breakdown.get(Status.IMPLEMENTED, 0),
+        'implemented': stats.implemented_count,
         'implemented_rate': _safe_div(
-            breakdown.get(Status.IMPLEMENTED, 0) * 100, total
+            stats.implemented_count * 100, stats.posts_count
         ),
         'savings_generated': savings['realized_money'],
         'savings_hours': savings['realized_hours'],
-        'comments_made': Comment.objects.filter(author=user).count(),
+        'comments_made': stats.comments_count,
         'points': getattr(gamification, 'total_points', 0),
         'rank': user_rank(user) if gamification else None,
         'longest_streak': getattr(gamification, 'longest_streak', 0),
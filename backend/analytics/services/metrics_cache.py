@@ -0,0 +1,169 @@
+"""
+Cache wyników `metrics` dla dashboardu kierownictwa.
+
+Dashboard pobiera przegląd, działy, kategorie i trendy naraz, a kilku
+kierowników otwiera go o tej samej porze — `cached` sprawia, że identyczne
+agregacje liczą się raz:
+
+- klucz to funkcja + argumenty (JSON) + wersja; argumentów, których nie da się
+  zapisać w JSON-ie (np. queryset w `overview(base_qs)`), nie cache'ujemy;
+- wpis jest świeży przez `ANALYTICS_CACHE_TIMEOUT` s, a potem jeszcze przez
+  `ANALYTICS_CACHE_STALE_SECONDS` s może być serwowany jako nieaktualny;
+- nieaktualny wpis wraca od razu, a przeliczenie zleca (zadanie
+  `analytics.refresh_metric`) tylko ten, kto zdobędzie blokadę (`cache.add`);
+  blokadę zwalnia zadanie. Tak jest tylko w trybie `worker` — w trybach
+  in-process zadanie liczyłoby się w tym samym żądaniu, więc posiadacz
+  blokady liczy od razu i zwraca świeży wynik;
+- gdy wpisu nie ma wcale, liczy posiadacz blokady, a pozostali czekają na
+  wynik najwyżej `ANALYTICS_CACHE_LOCK_SECONDS` s (potem liczą sami);
+- `invalidate` podbija wersję — zmiana statusu, utworzenie albo usunięcie
+  posta (`analytics.handlers`, po commicie) oraz odświeżenie faktów
+  (`facts.refresh_dirty` / `refresh_all`), z których liczą się świeże
+  metryki. Pozostałe zmiany (ankiety, komentarze) widać najpóźniej po TTL
+  albo po przeliczeniu ich dnia.
+
+W trybie `worker` przeliczenie i unieważnienie dzieją się w procesie workera,
+więc cache musi być wspólny z serwerem WWW (Redis; check `realtime.E002`) —
+z `LocMemCache` worker zapisywałby tylko do własnej pamięci.
+"""
+import hashlib
+import json
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from jobs.services import MODE_WORKER, enqueue, queue_mode
+from . import metrics
+
+VERSION_KEY = 'analytics:metrics:version'
+KEY_PREFIX = 'analytics:metrics'
+POLL_SECONDS = 0.05
+
+_functions = {}  # nazwa -> funkcja liczona, dla zadania odświeżenia
+
+
+def timeout():
+    return getattr(settings, 'ANALYTICS_CACHE_TIMEOUT', 300)
+
+
+def stale_seconds():
+    return getattr(settings, 'ANALYTICS_CACHE_STALE_SECONDS', 600)
+
+
+def lock_seconds():
+    return getattr(settings, 'ANALYTICS_CACHE_LOCK_SECONDS', 30)
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate():
+    """Podbija wersję — wszystkie zapisane wyniki przestają być trafiane."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+
+
+def _name(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def _arguments(args, kwargs):
+    """Argumenty jako JSON; TypeError, gdy się nie da."""
+    return json.dumps([args, kwargs], sort_keys=True, cls=DjangoJSONEncoder)
+
+
+def cache_key(func, args, kwargs):
+    """Klucz wyniku; TypeError, gdy argumentów nie da się zapisać w JSON-ie."""
+    digest = hashlib.sha1(_arguments(args, kwargs).encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}:{current_version()}:{_name(func)}:{digest}'
+
+
+def _store(key, value):
+    ttl = timeout()
+    cache.set(key, {'value': value, 'fresh_until': time.time() + ttl}, ttl + stale_seconds())
+
+
+def _wait_for(key, lock_key):
+    deadline = time.monotonic() + lock_seconds()
+    while time.monotonic() < deadline:
+        time.sleep(POLL_SECONDS)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+        if cache.get(lock_key) is None:
+            break
+    return None
+
+
+def refresh(name, key, args, kwargs):
+    """Przelicza wpis `key` (zadanie `analytics.refresh_metric`) i zwalnia jego blokadę.
+
+    Argumenty przychodzą z JSON-a (daty jako tekst ISO) — ORM przyjmuje je tak samo.
+    """
+    try:
+        _store(key, _functions[name](*args, **kwargs))
+    finally:
+        cache.delete(f'{key}:lock')
+
+
+def cached(func):
+    name = _name(func)
+    _functions[name] = func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if timeout() <= 0:
+            return func(*args, **kwargs)
+        try:
+            key = cache_key(func, args, kwargs)
+        except TypeError:
+            return func(*args, **kwargs)
+
+        entry = cache.get(key)
+        if entry is not None and entry['fresh_until'] > time.time():
+            return entry['value']
+
+        lock_key = f'{key}:lock'
+        locked = cache.add(lock_key, 1, lock_seconds())
+        if entry is not None:
+            if not locked:
+                # Ktoś już przelicza — nieaktualny wpis wraca od razu.
+                return entry['value']
+            if queue_mode() == MODE_WORKER:
+                payload = json.loads(_arguments(args, kwargs))
+                enqueue('analytics.refresh_metric', {
+                    'name': name, 'key': key, 'args': payload[0], 'kwargs': payload[1],
+                })
+                return entry['value']
+            # Bez workera zadanie i tak liczyłoby się w tym żądaniu — zwracamy świeży wynik.
+
+        if locked:
+            try:
+                value = func(*args, **kwargs)
+                _store(key, value)
+                return value
+            finally:
+                cache.delete(lock_key)
+
+        entry = _wait_for(key, lock_key)
+        if entry is not None:
+            return entry['value']
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+overview = cached(metrics.overview)
+departments = cached(metrics.departments)
+categories = cached(metrics.categories)
+trends = cached(metrics.trends)
@@ -0,0 +1,14 @@
+from jobs.registry import task
+
+from .services import facts, metrics_cache
+
+
+# Zaległość po dłuższej przerwie workera to wiele dni do przeliczenia.
+@task('analytics.refresh_facts', lock_timeout=3600)
+def refresh_facts():
+    facts.refresh_dirty()
+
+
+@task('analytics.refresh_metric')
+def refresh_metric(name, key, args, kwargs):
+    metrics_cache.refresh(name, key, args, kwargs)
@@ -0,0 +1,622 @@
+import csv
+import io
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Avg, DurationField, ExpressionWrapper, F, Sum
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from analytics import handlers, tasks
+from analytics.models import DailyPostFact, DirtyFactDay, FactsRefreshState, PostAuthorFact
+from analytics.services import exporters, facts, metrics, metrics_cache
+from ideas.models import Category, Comment, KaizenPost, PostApproval, PostSurvey
+from jobs.models import Job
+from users.models import Department
+
+User = get_user_model()
+Status = KaizenPost.Status
+
+
+def legacy_approval_hours(qs):
+    """Średni czas (h) od utworzenia posta do decyzji APPROVED etapu MANAGER, osobnym zapytaniem."""
+    approvals = PostApproval.objects.filter(
+        post__in=qs,
+        stage=PostApproval.Stage.MANAGER,
+        decision=PostApproval.Decision.APPROVED,
+        decided_at__isnull=False,
+    ).annotate(
+        delta=ExpressionWrapper(
+            F('decided_at') - F('post__created_at'),
+            output_field=DurationField(),
+        )
+    )
+    delta = approvals.aggregate(avg=Avg('delta'))['avg']
+    if not delta:
+        return 0.0
+    return round(delta.total_seconds() / 3600.0, 1)
+
+
+def legacy_overview(qs):
+    """Przegląd liczony osobnymi zapytaniami (implementacja sprzed agregacji warunkowej)."""
+    total = qs.count()
+    breakdown = metrics._status_breakdown(qs)
+    non_cancelled = total - breakdown.get(Status.CANCELLED, 0)
+    implemented = breakdown.get(Status.IMPLEMENTED, 0)
+    avg_progress = qs.filter(status=Status.IN_PROGRESS).aggregate(v=Avg('progress_percent'))['v']
+    return {
+        'total_ideas': total,
+        'status_breakdown': breakdown,
+        'implemented_rate': metrics._safe_div(implemented * 100, non_cancelled),
+        'avg_approval_hours': legacy_approval_hours(qs),
+        'avg_progress': round(float(avg_progress or 0), 1),
+        'savings': metrics._savings(qs),
+        'engagement': {
+            'comments': Comment.objects.filter(post__in=qs).count(),
+            'authors': qs.values('author').distinct().count(),
+        },
+    }
+
+
+def legacy_departments(**filters):
+    """Zestawienie działów liczone pętlą po działach (implementacja sprzed GROUP BY)."""
+    result = []
+    for dep in Department.objects.all().order_by('name'):
+        qs = metrics.filter_posts(KaizenPost.objects.filter(author__department=dep), **filters)
+        total = qs.count()
+        if total == 0:
+            continue
+        implemented = metrics._status_breakdown(qs).get(Status.IMPLEMENTED, 0)
+        savings = metrics._savings(qs)
+        cost = qs.aggregate(c=Sum('estimated_cost'))['c'] or Decimal('0')
+        result.append({
+            'department_id': dep.id,
+            'department': dep.name,
+            'total_ideas': total,
+            'implemented': implemented,
+            'implemented_rate': metrics._safe_div(implemented * 100, total),
+            'savings_money': savings['realized_money'],
+            'savings_potential': savings['potential_money'],
+            'estimated_cost': float(cost),
+            'roi': metrics._safe_div(savings['realized_money'], float(cost)) if cost else 0.0,
+            'avg_approval_hours': legacy_approval_hours(qs),
+        })
+    result.sort(key=lambda r: r['savings_money'], reverse=True)
+    return result
+
+
+def legacy_categories(**filters):
+    result = []
+    for cat in Category.objects.all().order_by('name'):
+        qs = metrics.filter_posts(KaizenPost.objects.filter(category=cat), **filters)
+        total = qs.count()
+        if total == 0:
+            continue
+        implemented = metrics._status_breakdown(qs).get(Status.IMPLEMENTED, 0)
+        result.append({
+            'category_id': cat.id,
+            'category': cat.name,
+            'total_ideas': total,
+            'implemented': implemented,
+            'implemented_rate': metrics._safe_div(implemented * 100, total),
+            'savings_money': metrics._savings(qs)['realized_money'],
+        })
+    result.sort(key=lambda r: r['total_ideas'], reverse=True)
+    return result
+
+
+class AnalyticsFixtureMixin:
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.departments = [Department.objects.create(name=name) for name in ('Produkcja', 'Logistyka', 'Pusty')]
+        # Ostatni autor nie ma działu — jego posty nie trafiają do zestawienia działów.
+        cls.authors = [
+            User.objects.create_user(username=f'autor{i}', password='pass', department=department)
+            for i, department in enumerate((cls.departments[0], cls.departments[1], None))
+        ]
+        cls.manager = User.objects.create_user(username='kierownik', password='pass')
+        cls.categories = [Category.objects.create(name=name) for name in ('Jakość', 'BHP')]
+        now = timezone.now()
+        specs = [
+            (0, 0, Status.IMPLEMENTED, 100, Decimal('1200.50'), 10.5, 5),
+            (0, 1, Status.IMPLEMENTED, 100, Decimal('300.00'), 2.25, 30),
+            (1, 0, Status.IN_PROGRESS, 40, Decimal('800.00'), 4.0, 12),
+            (1, 1, Status.IN_PROGRESS, 75, None, None, None),
+            (2, 0, Status.SUBMITTED, 0, Decimal('50.00'), 1.0, None),
+            (2, 1, Status.CANCELLED, 0, None, None, 2),
+            (0, 0, Status.TO_VERIFY, 0, None, None, None),
+        ]
+        cls.posts = []
+        for n, (author, category, status, progress, money, hours, approval_hours) in enumerate(specs):
+            post = KaizenPost.objects.create(
+                author=cls.authors[author], category=cls.categories[category],
+                title=f'Pomysł {n}', content='Treść', status=status, progress_percent=progress,
+                estimated_cost=Decimal('100.00') * (n + 1),
+            )
+            cls.posts.append(post)
+            if money is not None:
+                PostSurvey.objects.create(
+                    post=post, frequency_value=1, frequency_unit=PostSurvey.FrequencyUnit.DAY,
+                    affected_people=2, time_lost_minutes=15,
+                    estimated_time_savings_hours=hours, estimated_financial_savings=money,
+                )
+            if approval_hours is not None:
+                PostApproval.objects.create(
+                    post=post, stage=PostApproval.Stage.MANAGER, order=1, approver=cls.manager,
+                    decision=PostApproval.Decision.APPROVED,
+                    decided_at=post.created_at + timedelta(hours=approval_hours),
+                )
+            # Etapy, które nie wchodzą do średniego czasu akceptacji.
+            PostApproval.objects.create(
+                post=post, stage=PostApproval.Stage.TEAM_LEAD, order=0, approver=cls.manager,
+                decision=PostApproval.Decision.APPROVED, decided_at=now + timedelta(days=3),
+            )
+            for i in range(n % 3):
+                Comment.objects.create(post=post, author=cls.authors[(author + 1) % 3], text=f'Komentarz {i}')
+
+
+class OverviewTests(AnalyticsFixtureMixin, TestCase):
+    def test_matches_legacy_implementation(self):
+        result = metrics.overview()
+        self.assertEqual(result, legacy_overview(KaizenPost.objects.all()))
+        self.assertGreater(result['avg_approval_hours'], 0)
+        self.assertGreater(result['engagement']['comments'], 0)
+
+    def test_matches_legacy_implementation_for_filtered_queryset(self):
+        qs = KaizenPost.objects.filter(category=self.categories[0])
+        self.assertEqual(metrics.overview(qs), legacy_overview(qs))
+
+    def test_empty_queryset(self):
+        qs = KaizenPost.objects.filter(pk=0)
+        self.assertEqual(metrics.overview(qs), legacy_overview(qs))
+
+    def test_single_aggregate_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            metrics.overview()
+        # Sprawdzenie świeżości faktów + jeden agregat po postach.
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+
+class GroupedMetricsTests(AnalyticsFixtureMixin, TestCase):
+    def test_departments_match_legacy_implementation(self):
+        result = metrics.departments()
+        self.assertEqual(result, legacy_departments())
+        self.assertEqual([r['department'] for r in result], ['Produkcja', 'Logistyka'])
+
+    def test_categories_match_legacy_implementation(self):
+        self.assertEqual(metrics.categories(), legacy_categories())
+
+    def test_filters_match_legacy_implementation(self):
+        today = timezone.localdate()
+        for filters in (
+            {'statuses': [Status.IMPLEMENTED, Status.IN_PROGRESS]},
+            {'date_from': today, 'date_to': today},
+            {'date_from': today + timedelta(days=1)},
+        ):
+            with self.subTest(**filters):
+                self.assertEqual(metrics.departments(**filters), legacy_departments(**filters))
+                self.assertEqual(metrics.categories(**filters), legacy_categories(**filters))
+
+    def test_constant_queries_regardless_of_group_count(self):
+        for i in range(5):
+            Category.objects.create(name=f'Dodatkowa {i}')
+            KaizenPost.objects.create(
+                author=self.authors[0], category=Category.objects.get(name=f'Dodatkowa {i}'),
+                title='T', content='C',
+            )
+        for fn in (metrics.departments, metrics.categories):
+            with CaptureQueriesContext(connection) as ctx:
+                fn(statuses=[Status.TO_VERIFY])
+            self.assertEqual(len(ctx.captured_queries), 2)
+
+    def test_api_applies_filters(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='szef', password='pass', is_staff=True))
+        response = client.get(reverse('analytics-categories'), {'status': 'IMPLEMENTED,IN_PROGRESS'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), legacy_categories(statuses=[Status.IMPLEMENTED, Status.IN_PROGRESS]))
+
+    def test_api_rejects_invalid_filters(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='szef', password='pass', is_staff=True))
+        for url, params, field in (
+            (reverse('analytics-categories'), {'status': 'NIEZNANY'}, 'status'),
+            (reverse('analytics-categories'), {'status': 'IMPLEMENTED,NIEZNANY'}, 'status'),
+            (reverse('analytics-departments'), {'from': 'zła-data'}, 'from'),
+            (reverse('analytics-departments'), {'to': '2026-02-30'}, 'to'),
+        ):
+            with self.subTest(**params):
+                response = client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(field, response.json())
+
+
+class DailyFactsTests(AnalyticsFixtureMixin, TestCase):
+    def _assert_matches_raw(self):
+        self.assertEqual(metrics.overview(), legacy_overview(KaizenPost.objects.all()))
+        self.assertEqual(metrics.departments(), legacy_departments())
+        self.assertEqual(metrics.categories(), legacy_categories())
+        statuses = [Status.IMPLEMENTED, Status.CANCELLED]
+        self.assertEqual(metrics.categories(statuses=statuses), legacy_categories(statuses=statuses))
+
+    def test_metrics_read_facts_when_fresh(self):
+        raw_trends = metrics.trends()
+        facts.refresh_all()
+        self.assertTrue(facts.is_fresh())
+        self.assertFalse(DirtyFactDay.objects.exists())
+        self._assert_matches_raw()
+        self.assertEqual(metrics.trends(), raw_trends)
+
+        # Fakty zamiast postów: usunięcie surowych wierszy bez sygnałów nie zmienia wyniku.
+        expected = metrics.categories()
+        KaizenPost.objects.filter(pk=self.posts[0].pk).update(status=Status.CANCELLED)
+        self.assertEqual(metrics.categories(), expected)
+
+    def test_stale_facts_fall_back_to_raw_tables(self):
+        facts.refresh_all()
+        FactsRefreshState.objects.update(refreshed_at=timezone.now() - facts.max_age() - timedelta(minutes=1))
+        KaizenPost.objects.filter(pk=self.posts[0].pk).update(status=Status.CANCELLED)
+        self.assertFalse(facts.is_fresh())
+        self._assert_matches_raw()
+
+    def test_changes_refresh_their_day_incrementally(self):
+        facts.refresh_all()
+        with self.captureOnCommitCallbacks(execute=True):
+            post = KaizenPost.objects.create(
+                author=self.authors[1], category=self.categories[0], title='Nowy', content='C',
+                status=Status.IMPLEMENTED, estimated_cost=Decimal('10.00'),
+            )
+            PostSurvey.objects.create(
+                post=post, frequency_value=1, frequency_unit=PostSurvey.FrequencyUnit.WEEK,
+                affected_people=1, time_lost_minutes=5,
+                estimated_time_savings_hours=3.5, estimated_financial_savings=Decimal('99.99'),
+            )
+            Comment.objects.create(post=post, author=self.authors[0], text='Super')
+            self.posts[2].delete()
+        # Zadanie `analytics.refresh_facts` (tryb sync) wyczyściło znaczniki.
+        self.assertFalse(DirtyFactDay.objects.exists())
+        self._assert_matches_raw()
+
+    @override_settings(JOB_QUEUE_MODE='worker')
+    def test_untracked_facts_are_not_marked(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.posts[0], author=self.authors[1], text='Nowy')
+            self.posts[1].save()
+        self.assertFalse(DirtyFactDay.objects.exists())
+        self.assertFalse(Job.objects.filter(name='analytics.refresh_facts').exists())
+
+    @override_settings(JOB_QUEUE_MODE='worker')
+    def test_pending_refresh_job_is_reused(self):
+        facts.refresh_all()
+        for n in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                Comment.objects.create(post=self.posts[n], author=self.authors[1], text='Nowy')
+        self.assertEqual(Job.objects.filter(name='analytics.refresh_facts').count(), 1)
+
+        Job.objects.filter(name='analytics.refresh_facts').update(status=Job.Status.RUNNING)
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.posts[0], author=self.authors[1], text='W trakcie')
+        # Uruchomione zadanie mogło już odczytać znaczniki — zlecamy kolejne.
+        self.assertEqual(Job.objects.filter(name='analytics.refresh_facts', status=Job.Status.PENDING).count(), 1)
+
+    def test_department_change_marks_authors_days(self):
+        facts.refresh_all()
+        author = self.authors[2]
+        author.department = self.departments[2]
+        with self.captureOnCommitCallbacks(execute=True):
+            author.save()
+            self.assertEqual(set(DirtyFactDay.objects.values_list('day', flat=True)), {timezone.localdate()})
+        self._assert_matches_raw()
+        self.assertIn('Pusty', [row['department'] for row in metrics.departments()])
+
+    def test_fresh_overview_cost_does_not_depend_on_history(self):
+        facts.refresh_all()
+        with CaptureQueriesContext(connection) as ctx:
+            metrics.overview()
+        # Stan świeżości, fakty, unikalni autorzy — bez skanu postów.
+        self.assertEqual(len(ctx.captured_queries), 3)
+        self.assertTrue(all('ideas_kaizenpost' not in q['sql'] for q in ctx.captured_queries))
+
+    def test_reads_do_not_drain_dirty_days(self):
+        facts.refresh_all()
+        expected = metrics.overview()
+        KaizenPost.objects.create(author=self.authors[0], category=self.categories[0], title='Nowy', content='C')
+        # Zadanie jeszcze nie ruszyło (brak commitu): odczyt podaje fakty sprzed zmiany.
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(metrics.overview(), expected)
+        self.assertTrue(all('analytics_dirtyfactday' not in q['sql'] for q in ctx.captured_queries))
+        self.assertTrue(DirtyFactDay.objects.exists())
+
+        tasks.refresh_facts()
+        self.assertEqual(metrics.overview(), legacy_overview(KaizenPost.objects.all()))
+
+    def test_author_facts_follow_deleted_first_posts(self):
+        facts.refresh_all()
+        author = self.authors[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            KaizenPost.objects.filter(author=author).delete()
+        self.assertFalse(PostAuthorFact.objects.filter(author=author).exists())
+        self.assertEqual(
+            metrics.overview()['engagement']['authors'],
+            KaizenPost.objects.values('author').distinct().count(),
+        )
+
+    def test_refresh_analytics_command(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command('refresh_analytics', stdout=out)
+        self.assertIn(f'Rebuilt {DailyPostFact.objects.count()} fact row(s).', out.getvalue())
+        self.assertTrue(facts.is_fresh())
+
+
+class MetricsCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+
+    def _counting(self, delay=0):
+        def compute(value=1):
+            self.calls.append(value)
+            time.sleep(delay)
+            return {'value': value, 'call': len(self.calls)}
+        return metrics_cache.cached(compute)
+
+    def test_hit_is_keyed_by_arguments(self):
+        fn = self._counting()
+        self.assertEqual(fn(1), fn(1))
+        fn(value=2)
+        self.assertEqual(self.calls, [1, 2])
+
+    @override_settings(ANALYTICS_CACHE_TIMEOUT=0)
+    def test_zero_timeout_disables_cache(self):
+        fn = self._counting()
+        fn(), fn()
+        self.assertEqual(len(self.calls), 2)
+
+    def test_unserializable_arguments_bypass_cache(self):
+        fn = self._counting()
+        fn(object()), fn(object())
+        self.assertEqual(len(self.calls), 2)
+
+    def test_invalidate_forces_recompute(self):
+        fn = self._counting()
+        fn()
+        metrics_cache.invalidate()
+        self.assertEqual(fn()['call'], 2)
+
+    def test_concurrent_misses_compute_once(self):
+        fn = self._counting(delay=0.3)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(fn())) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, [1])
+        self.assertEqual(results, [{'value': 1, 'call': 1}] * 4)
+
+    def test_expired_entry_is_served_while_another_request_recomputes(self):
+        fn = self._counting()
+        fn()
+        key = metrics_cache.cache_key(fn.__wrapped__, (), {})
+        entry = cache.get(key)
+        cache.set(key, {**entry, 'fresh_until': time.time() - 1})
+        cache.add(f'{key}:lock', 1)
+
+        self.assertEqual(fn(), {'value': 1, 'call': 1})
+        self.assertEqual(len(self.calls), 1)
+
+        # Bez cudzej blokady i bez workera (tryb sync) liczymy od razu i zwracamy świeży wynik.
+        cache.delete(f'{key}:lock')
+        self.assertEqual(fn(), {'value': 1, 'call': 2})
+        self.assertEqual(len(self.calls), 2)
+        self.assertIsNone(cache.get(f'{key}:lock'))
+        self.assertEqual(fn(), {'value': 1, 'call': 2})
+
+
+class MetricsCacheInvalidationTests(AnalyticsFixtureMixin, TestCase):
+    def test_status_change_invalidates_cached_overview(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='szef', password='pass', is_staff=True))
+        url = reverse('analytics-overview')
+        before = client.get(url).json()
+
+        post = self.posts[-1]
+        post.title = 'Bez zmiany statusu'
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertEqual(client.get(url).json(), before)
+
+        post.status = Status.IMPLEMENTED
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        after = client.get(url).json()
+        self.assertEqual(after['status_breakdown']['IMPLEMENTED'], before['status_breakdown']['IMPLEMENTED'] + 1)
+
+    @override_settings(JOB_QUEUE_MODE='worker')
+    def test_fact_refresh_job_invalidates_cached_overview(self):
+        facts.refresh_all()
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='szef', password='pass', is_staff=True))
+        url = reverse('analytics-overview')
+        before = client.get(url).json()
+
+        post = self.posts[-1]
+        post.status = Status.IMPLEMENTED
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        # Zadanie jeszcze nie ruszyło: odczyt liczy (i cache'uje) ze starych faktów.
+        self.assertEqual(client.get(url).json()['status_breakdown'], before['status_breakdown'])
+
+        job = Job.objects.get(name='analytics.refresh_facts')
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks.refresh_facts(**job.payload)
+        after = client.get(url).json()
+        self.assertEqual(after['status_breakdown']['IMPLEMENTED'], before['status_breakdown']['IMPLEMENTED'] + 1)
+        self.assertEqual(after, legacy_overview(KaizenPost.objects.all()))
+
+
+    def test_save_without_status_skips_status_lookup(self):
+        post = self.posts[-1]
+        with self.assertNumQueries(0):
+            handlers._stash_status(KaizenPost, post, update_fields=frozenset({'title'}))
+        self.assertFalse(hasattr(post, '_analytics_old_status'))
+
+    @override_settings(JOB_QUEUE_MODE='worker')
+    def test_stale_entry_recomputed_by_worker_job(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        fn = metrics_cache.cached(compute)
+        fn()
+        key = metrics_cache.cache_key(compute, (), {})
+        cache.set(key, {**cache.get(key), 'fresh_until': time.time() - 1})
+
+        self.assertEqual((fn(), fn()), (1, 1))
+        self.assertEqual(len(calls), 1)
+        job = Job.objects.get(name='analytics.refresh_metric')
+        tasks.refresh_metric(**job.payload)
+        self.assertEqual(fn(), 2)
+
+
+class ExportTests(AnalyticsFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='szef', password='pass', is_staff=True))
+
+    def _export(self, report, fmt):
+        return self.client.get(reverse('analytics-export'), {'report': report, 'fmt': fmt})
+
+    def test_posts_csv_is_streamed_row_per_post(self):
+        response = self._export('posts', 'csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        rows = list(csv.reader(io.StringIO(content), delimiter=';'))
+
+        self.assertEqual(rows[0], exporters.POST_HEADERS)
+        self.assertEqual([int(row[0]) for row in rows[1:]], [post.pk for post in self.posts])
+        first = dict(zip(rows[0], rows[1]))
+        self.assertEqual(first['Oszczędności (zł)'], '1200.50')
+        self.assertEqual(first['Kierownik'], 'kierownik')
+        self.assertEqual(first['Decyzja kierownika'], PostApproval.Decision.APPROVED)
+        self.assertEqual(first['Dział'], 'Produkcja')
+        self.assertEqual(dict(zip(rows[0], rows[4]))['Oszczędności (zł)'], '')
+
+    def test_posts_text_cells_cannot_start_formulas(self):
+        from openpyxl import load_workbook
+
+        KaizenPost.objects.filter(pk=self.posts[0].pk).update(title='=HYPERLINK("http://x","y")')
+        User.objects.filter(pk=self.authors[0].pk).update(username='@autor')
+        content = b''.join(self._export('posts', 'csv').streaming_content).decode('utf-8-sig')
+        first = dict(zip(*list(csv.reader(io.StringIO(content), delimiter=';'))[:2]))
+        self.assertEqual(first['Tytuł'], '\'=HYPERLINK("http://x","y")')
+        self.assertEqual(first['Autor'], "'@autor")
+
+        response = self._export('posts', 'xlsx')
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        self.assertEqual(sheet['B2'].value, '\'=HYPERLINK("http://x","y")')
+        self.assertEqual(sheet['B2'].data_type, 's')
+
+    def test_posts_rows_come_from_one_chunked_query(self):
+        headers, rows = exporters._report_rows('posts')
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(len(list(rows)), len(self.posts))
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_csv_is_yielded_in_chunks(self):
+        original = exporters.CSV_CHUNK_ROWS
+        exporters.CSV_CHUNK_ROWS = 2
+        self.addCleanup(setattr, exporters, 'CSV_CHUNK_ROWS', original)
+        chunks = list(exporters.stream_csv('posts'))
+        # Nagłówek + 7 wierszy po 2.
+        self.assertEqual(len(chunks), 5)
+
+    async def test_asgi_export_pulls_one_chunk_at_a_time(self):
+        pulled = []
+        post_rows = exporters._post_rows
+
+        def counting_rows():
+            for row in post_rows():
+                pulled.append(row[0])
+                yield row
+
+        original = exporters.CSV_CHUNK_ROWS
+        exporters.CSV_CHUNK_ROWS = 2
+        self.addCleanup(setattr, exporters, 'CSV_CHUNK_ROWS', original)
+        self.addCleanup(setattr, exporters, '_post_rows', post_rows)
+        exporters._post_rows = counting_rows
+
+        token = await sync_to_async(lambda: str(AccessToken.for_user(User.objects.get(username='szef'))))()
+        response = await AsyncClient().get(
+            reverse('analytics-export'), {'report': 'posts', 'fmt': 'csv'},
+            headers={'Authorization': f'Bearer {token}'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        stream = aiter(response.streaming_content)
+        header = await anext(stream)
+        self.assertTrue(header.decode('utf-8-sig').startswith('ID;'))
+        self.assertEqual(pulled, [])
+        await anext(stream)
+        self.assertEqual(len(pulled), 2)
+        rest = [chunk async for chunk in stream]
+        self.assertEqual(len(rest), 3)
+        self.assertEqual(len(pulled), len(self.posts))
+
+    async def test_asgi_xlsx_export_is_async(self):
+        from openpyxl import load_workbook
+
+        token = await sync_to_async(lambda: str(AccessToken.for_user(User.objects.get(username='szef'))))()
+        response = await AsyncClient().get(
+            reverse('analytics-export'), {'report': 'posts', 'fmt': 'xlsx'},
+            headers={'Authorization': f'Bearer {token}'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        rows = list(load_workbook(io.BytesIO(content), read_only=True).active.iter_rows(values_only=True))
+        self.assertEqual(len(rows), len(self.posts) + 1)
+
+    def test_posts_xlsx_uses_file_response(self):
+        from openpyxl import load_workbook
+
+        response = self._export('posts', 'xlsx')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('kaizen-posts.xlsx', response['Content-Disposition'])
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True).active
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(list(rows[0]), exporters.POST_HEADERS)
+        self.assertEqual(len(rows), len(self.posts) + 1)
+        self.assertEqual(rows[1][1], 'Pomysł 0')
+
+    def test_aggregate_report_keeps_format(self):
+        response = self._export('overview', 'csv')
+        content = b''.join(response.streaming_content)
+        self.assertTrue(content.startswith('\ufeffMetryka;Wartość'.encode('utf-8')))
+        self.assertIn(f'Wszystkie pomysły;{len(self.posts)}'.encode('utf-8'), content)
+
+    def test_unknown_report(self):
+        for fmt in ('csv', 'xlsx'):
+            response = self._export('nieznany', fmt)
+            self.assertEqual(response.status_code, 400)
@@ -1,31 +1,65 @@
-from django.http import HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from .permissions import IsManagement, is_management
-from .services import exporters, metrics
+from .services import exporters, metrics, metrics_cache
+
+
+def _post_filters(request):
+    """Filtry zestawień: `?from=RRRR-MM-DD&to=RRRR-MM-DD&status=A,B`.
+
+    Nieprawidłowa data albo nieznany status to 400 — przemilczany filtr
+    dawałby zestawienie całego programu pod etykietą zawężonego.
+    """
+    params = request.query_params
+    errors = {}
+
+    def _date(name):
+        value = params.get(name)
+        if not value:
+            return None
+        try:
+            parsed = parse_date(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            errors[name] = f'Nieprawidłowa data: {value!r} (oczekiwano RRRR-MM-DD).'
+        return parsed
+
+    date_from, date_to = _date('from'), _date('to')
+    statuses = [s for s in (params.get('status') or '').split(',') if s]
+    unknown = [s for s in statuses if s not in metrics.Status.values]
+    if unknown:
+        errors['status'] = f'Nieznane statusy: {", ".join(unknown)}.'
+    if errors:
+        raise ValidationError(errors)
+    return {'date_from': date_from, 'date_to': date_to, 'statuses': statuses or None}
 
 
 class OverviewView(APIView):
     permission_classes = [IsAuthenticated, IsManagement]
 
     def get(self, request):
-        return Response(metrics.overview())
+        return Response(metrics_cache.overview())
 
 
 class DepartmentsView(APIView):
     permission_classes = [IsAuthenticated, IsManagement]
 
     def get(self, request):
-        return Response(metrics.departments())
+        return Response(metrics_cache.departments(**_post_filters(request)))
 
 
 class CategoriesView(APIView):
     permission_classes = [IsAuthenticated, IsManagement]
 
     def get(self, request):
-        return Response(metrics.categories())
+        return Response(metrics_cache.categories(**_post_filters(request)))
 
 
 class TrendsView(APIView):
@@ -35,7 +69,7 @@ class TrendsView(APIView):
         granularity = request.query_params.get('granularity', 'month')
         if granularity not in ('month', 'quarter'):
             granularity = 'month'
-        return Response(metrics.trends(granularity=granularity))
+        return Response(metrics_cache.trends(granularity=granularity))
 
 
 class HeatmapView(APIView):
@@ -87,15 +121,27 @@ class ExportView(APIView):
         fmt = request.query_params.get('fmt', 'csv')
         if fmt not in self.CONTENT_TYPES:
             return Response({'detail': 'Parametr fmt: csv lub xlsx.'}, status=400)
+        # Pod ASGI synchroniczny iterator zostałby wczytany w całości przed
+        # wysłaniem — podajemy wtedy asynchroniczny, po kawałku.
+        is_asgi = isinstance(request._request, ASGIRequest)
         try:
             if fmt == 'csv':
-                payload = exporters.to_csv(report)
+                chunks = exporters.stream_csv(report)
+                if is_asgi:
+                    chunks = exporters.aiter_chunks(chunks)
+                resp = StreamingHttpResponse(chunks, content_type=self.CONTENT_TYPES[fmt])
+            elif is_asgi:
+                resp = StreamingHttpResponse(
+                    exporters.aiter_chunks(exporters.file_chunks(exporters.xlsx_file(report))),
+                    content_type=self.CONTENT_TYPES[fmt],
+                )
             else:
-                payload = exporters.to_xlsx(report)
+                resp = FileResponse(
+                    exporters.xlsx_file(report), content_type=self.CONTENT_TYPES[fmt]
+                )
         except ValueError as err:
             return Response({'detail': str(err)}, status=400)
 
-        resp = HttpResponse(payload, content_type=self.CONTENT_TYPES[fmt])
         resp['Content-Disposition'] = (
             f'attachment; filename="kaizen-{report}.{fmt}"'
         )
@@ -0,0 +1,51 @@
+"""
+Warunkowe GET-y (ETag / Last-Modified) dla endpointów API.
+
+Walidator liczymy z tanich danych (znaczniki czasu, liczniki, wersje) zamiast
+z ciała odpowiedzi, więc przy `If-None-Match` / `If-Modified-Since` zgodnym
+z aktualnym stanem zwracamy 304 bez uruchamiania serializera.
+"""
+import hashlib
+import json
+from datetime import datetime
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """Silny ETag (w cudzysłowie) z dowolnych wartości dających się zserializować do JSON-a."""
+    payload = json.dumps(parts, default=str, sort_keys=True, separators=(',', ':'))
+    return '"%s"' % hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _timestamp(value):
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return value
+
+
+def _set_validators(response, etag, last_modified):
+    if etag:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Odpowiedzi zależą od zalogowanego użytkownika — klient ma je rewalidować.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional(request, build_response, *, etag=None, last_modified=None):
+    """Zwraca 304, jeśli walidatory klienta pasują, w przeciwnym razie `build_response()`.
+
+    `build_response` jest wywoływane tylko wtedy, gdy trzeba wysłać pełną odpowiedź.
+    """
+    last_modified = _timestamp(last_modified)
+    if request.method in ('GET', 'HEAD'):
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return _set_validators(not_modified, etag, last_modified)
+    response = build_response()
+    if 200 <= response.status_code < 300:
+        _set_validators(response, etag, last_modified)
+    return response
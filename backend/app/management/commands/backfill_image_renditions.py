@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+
+from ideas.models import PostImage
+from users.images import refresh_renditions
+
+
+class Command(BaseCommand):
+    help = 'Generates WebP/JPEG renditions for existing post images and avatars.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Wygeneruj ponownie także aktualne rendycje.')
+        parser.add_argument('--chunk-size', type=int, default=200,
+                            help='Liczba rekordów pobieranych z bazy naraz.')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        targets = (
+            ('post images', PostImage.objects.exclude(image=''), 'image', 'renditions'),
+            ('avatars', User.objects.exclude(avatar='').exclude(avatar__isnull=True), 'avatar', 'avatar_renditions'),
+        )
+        for label, queryset, file_attr, renditions_attr in targets:
+            done = 0
+            queryset = queryset.only('pk', file_attr, renditions_attr).order_by('pk')
+            for instance in queryset.iterator(chunk_size=options['chunk_size']):
+                if refresh_renditions(instance, file_attr, renditions_attr, force=options['force']):
+                    done += 1
+            self.stdout.write(self.style.SUCCESS(f'{label}: generated renditions for {done} file(s).'))
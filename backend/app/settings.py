@@ -38,6 +38,8 @@ MEDIA_URL = '/kaizen_attachments/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 DATA_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv('DATA_UPLOAD_MAX_MEMORY_SIZE', 20 * 1024 * 1024))
 FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv('FILE_UPLOAD_MAX_MEMORY_SIZE', 20 * 1024 * 1024))
+# Limit pojedynczego zdjęcia w uploadzie multipart (/api/uploads/), pliki idą prosto na dysk.
+MAX_IMAGE_UPLOAD_SIZE = int(os.getenv('MAX_IMAGE_UPLOAD_SIZE', 25 * 1024 * 1024))
 
 ALLOWED_HOSTS = [host.strip() for host in os.getenv('DJANGO_ALLOWED_HOSTS', '').split(',') if host.strip()]
 if DEBUG:
@@ -61,6 +63,8 @@ INSTALLED_APPS = [
     'access_control',
     'gamification',
     'analytics',
+    'jobs',
+    'realtime',
     'app',
 ]
 
@@ -215,6 +219,65 @@ DATABASES = {
     }
 }
 
+# Cache
+# Domyślnie pamięć procesu; na produkcji np. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# i CACHE_LOCATION=redis://redis:6379/1 (albo FileBasedCache + katalog).
+# Przy JOB_QUEUE_MODE=worker cache musi być wspólny (check realtime.E002) — docker-compose ustawia Redis.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'kaizen'),
+        'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', 'kaizen'),
+    }
+}
+
+# TTL stron publicznego feedu postów w sekundach (0 = cache wyłączony).
+FEED_CACHE_TIMEOUT = int(os.getenv('FEED_CACHE_TIMEOUT', 60))
+
+# Zadania w tle (jobs): sync = w requeście, on_commit = po commicie w tym samym procesie,
+# worker = kolejka w bazie obsługiwana przez `manage.py run_worker`.
+JOB_QUEUE_MODE = os.getenv('JOB_QUEUE_MODE', 'sync')
+JOB_RETRY_BASE_SECONDS = int(os.getenv('JOB_RETRY_BASE_SECONDS', 10))
+JOB_RETRY_MAX_SECONDS = int(os.getenv('JOB_RETRY_MAX_SECONDS', 3600))
+# Zadanie dłużej w stanie RUNNING uznajemy za porzucone i zlecamy ponownie (zadania muszą
+# być idempotentne); dłuższe zadania podają własny limit: `@task(..., lock_timeout=...)`.
+JOB_LOCK_TIMEOUT_SECONDS = int(os.getenv('JOB_LOCK_TIMEOUT_SECONDS', 600))
+
+# Gamifikacja: profil aktualizowany przyrostowo (F() + blokada wiersza) zamiast sumowania
+# całego ledgera przy każdym naliczeniu; pełne przeliczenie — `report_profile_drift --fix`.
+GAMIFICATION_INCREMENTAL_SYNC = os.getenv('GAMIFICATION_INCREMENTAL_SYNC', 'True') == 'True'
+# Reguły, poziomy i odznaki trzymane w pamięci procesu; co tyle sekund proces sprawdza
+# wersję konfiguracji we wspólnym cache (zmiany z innych procesów). 0 = przy każdym odczycie.
+GAMIFICATION_CONFIG_CHECK_SECONDS = int(os.getenv('GAMIFICATION_CONFIG_CHECK_SECONDS', 5))
+# Co ile sekund odbudowywany jest posortowany indeks pozycji w rankingach (wspólny cache).
+LEADERBOARD_RANK_CACHE_SECONDS = int(os.getenv('LEADERBOARD_RANK_CACHE_SECONDS', 60))
+# Najdłuższe czekanie na indeks odbudowywany przez inny proces (i czas życia blokady).
+LEADERBOARD_RANK_LOCK_SECONDS = int(os.getenv('LEADERBOARD_RANK_LOCK_SECONDS', 30))
+
+# Analityka czyta dzienne fakty, jeśli pełne `manage.py refresh_analytics` (co noc)
+# było nie dawniej niż tyle godzin temu; inaczej liczy z surowych tabel.
+ANALYTICS_FACTS_MAX_AGE_HOURS = int(os.getenv('ANALYTICS_FACTS_MAX_AGE_HOURS', 36))
+# Cache wyników dashboardu: świeże przez TIMEOUT s (0 = wyłączony), potem jeszcze przez
+# STALE s serwowane, gdy jeden request przelicza; na przeliczenie czeka się max LOCK s.
+ANALYTICS_CACHE_TIMEOUT = int(os.getenv('ANALYTICS_CACHE_TIMEOUT', 300))
+ANALYTICS_CACHE_STALE_SECONDS = int(os.getenv('ANALYTICS_CACHE_STALE_SECONDS', 600))
+ANALYTICS_CACHE_LOCK_SECONDS = int(os.getenv('ANALYTICS_CACHE_LOCK_SECONDS', 30))
+
+# Zdarzenia na żywo (SSE `/api/realtime/events/`, WebSocket `/ws/`; wymagają serwera ASGI).
+# InMemoryHub działa w obrębie jednego procesu; przy kilku procesach ASGI albo
+# JOB_QUEUE_MODE=worker potrzebny jest realtime.hub.RedisHub (check realtime.E001).
+REALTIME_HUB = os.getenv('REALTIME_HUB', 'realtime.hub.InMemoryHub')
+REALTIME_HUB_OPTIONS = (
+    {'url': os.getenv('REALTIME_REDIS_URL', 'redis://localhost:6379/0')}
+    if REALTIME_HUB.endswith('RedisHub') else {}
+)
+REALTIME_HEARTBEAT_SECONDS = int(os.getenv('REALTIME_HEARTBEAT_SECONDS', 25))
+# Ważność jednorazowego biletu `?ticket=` dla SSE / WebSocket.
+REALTIME_TICKET_SECONDS = int(os.getenv('REALTIME_TICKET_SECONDS', 30))
+# Zmiana rankingu rozgłaszana najwyżej raz na tyle sekund.
+REALTIME_LEADERBOARD_THROTTLE_SECONDS = int(os.getenv('REALTIME_LEADERBOARD_THROTTLE_SECONDS', 10))
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -23,11 +23,12 @@ from rest_framework_simplejwt.views import (
 )
 from django.conf import settings
 from django.conf.urls.static import static
+from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
 # Importujemy widok z folderu 'ideas'
 # Python znajdzie to, bo folder 'ideas' jest obok folderu 'app'
-from ideas.views import PostViewSet, CommentViewSet, LikeViewSet, NotificationViewSet, CategoryViewSet
+from ideas.views import PostViewSet, CommentViewSet, LikeViewSet, NotificationViewSet, CategoryViewSet, UploadView
 from users.views import UserViewSet
 
 
@@ -55,6 +56,8 @@ api_urlpatterns = [
     path('access/', include('access_control.urls')),
     path('gamification/', include('gamification.urls')),
     path('analytics/', include('analytics.urls')),
+    path('realtime/', include('realtime.urls')),
+    path('uploads/', UploadView.as_view(), name='upload'),
     path('', include(router.urls)),  # Router should usually come last
 ]
 
@@ -68,4 +71,6 @@ urlpatterns = [
 ]
 
 if settings.DEBUG:
+    # Serwer ASGI (uvicorn) nie serwuje plików statycznych jak runserver.
+    urlpatterns += staticfiles_urlpatterns()
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
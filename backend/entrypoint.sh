@@ -24,5 +24,6 @@ else
   echo "Skipping seeders (set SEED_DB=true to enable)."
 fi
 
+# ASGI (uvicorn), nie runserver: strumień SSE i WebSocket `/ws/` wymagają ASGI.
 echo "Starting server..."
-python manage.py runserver 0.0.0.0:8000
+exec uvicorn app.asgi:application --host 0.0.0.0 --port 8000 --reload
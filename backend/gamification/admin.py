@@ -10,6 +10,7 @@ from .models import (
     RewardRedemption,
     UserBadge,
     UserGamificationProfile,
+    UserStats,
 )
 from .services.rewards import set_status
 
@@ -48,6 +49,13 @@ class ProfileAdmin(admin.ModelAdmin):
     readonly_fields = ('total_points', 'level', 'current_streak', 'longest_streak', 'last_activity_date')
 
 
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'posts_count', 'implemented_count', 'likes_received', 'comments_count', 'reviews_count')
+    search_fields = ('user__username', 'user__nickname')
+    readonly_fields = ('posts_count', 'implemented_count', 'likes_received', 'comments_count', 'reviews_count', 'updated_at')
+
+
 @admin.register(PointTransaction)
 class PointTransactionAdmin(admin.ModelAdmin):
     list_display = ('user', 'action', 'points', 'created_at')
@@ -4,13 +4,60 @@ Odsprzęgnięte obserwowanie domeny `ideas`.
 Kierunek zależności: gamification → ideas (dozwolony).
 `ideas` nie wie nic o gamifikacji. Wszystkie naliczenia idą przez engine.award,
 z `dedupe_key` zapewniającym idempotencję (retry sygnału nie podwaja punktów).
+
+Handlery tylko zlecają zadanie `gamification.award` (jobs) — przeliczenie
+profilu i odznak nie wlicza się do czasu odpowiedzi na zapis posta/lajka.
+Wyjątkiem są liczniki `UserStats` (`services.stats`): to pojedynczy UPDATE,
+więc zmieniamy je od razu — i przed zleceniem naliczenia, żeby odznaki
+liczone w trybie synchronicznym widziały już nową wartość.
+
+Zmiany konfiguracji (reguły, poziomy, odznaki) unieważniają migawkę
+`services.config` we wszystkich procesach, a każda transakcja punktowa
+trafia do dziennego kubełka rankingów (`services.daily_points`).
 """
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
 from ideas.models import Comment, KaizenPost, Like, PostApproval
-from .models import Action
-from .services import engine
+from jobs.services import enqueue
+from .models import Action, Badge, Level, PointRule, PointTransaction
+from .services import config, daily_points, stats
+
+
+def _invalidate_config(sender, **kwargs):
+    # Także przy `loaddata` (raw) — fikstury konfiguracji to wciąż zmiana konfiguracji.
+    config.invalidate()
+
+
+for _model in (PointRule, Level, Badge):
+    post_save.connect(_invalidate_config, sender=_model, dispatch_uid=f'gamification_config_save_{_model.__name__}')
+    post_delete.connect(_invalidate_config, sender=_model, dispatch_uid=f'gamification_config_delete_{_model.__name__}')
+
+
+@receiver(post_save, sender=PointTransaction)
+def _bucket_transaction(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        daily_points.add(instance.user_id, instance.points, daily_points.day_of(instance.created_at))
+
+
+@receiver(post_delete, sender=PointTransaction)
+def _unbucket_transaction(sender, instance, **kwargs):
+    daily_points.add(instance.user_id, -instance.points, daily_points.day_of(instance.created_at), create=False)
+
+
+def _award_later(user_id, action, *, source, dedupe_key, metadata=None):
+    enqueue(
+        'gamification.award',
+        {
+            'user_id': user_id,
+            'action': action,
+            'dedupe_key': dedupe_key,
+            'source_model': source._meta.label,
+            'source_pk': source.pk,
+            'metadata': metadata,
+        },
+        key=f'award:{dedupe_key}',
+    )
 
 
 @receiver(pre_save, sender=KaizenPost)
@@ -22,11 +69,93 @@ def _stash_old_status(sender, instance, **kwargs):
     instance._old_status = old
 
 
+@receiver(pre_save, sender=PostApproval)
+def _stash_old_decision(sender, instance, **kwargs):
+    if not instance.pk:
+        instance._old_decision = None
+        instance._old_approver_id = None
+        return
+    old = sender.objects.filter(pk=instance.pk).values_list('decision', 'approver_id').first()
+    instance._old_decision, instance._old_approver_id = old or (None, None)
+
+
+# --- UserStats -------------------------------------------------------------
+
+def _implemented(status):
+    return 1 if status == KaizenPost.Status.IMPLEMENTED else 0
+
+
+@receiver(post_save, sender=KaizenPost)
+def _count_post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        stats.adjust(instance.author_id, posts_count=1, implemented_count=_implemented(instance.status))
+        return
+    old_status = getattr(instance, '_old_status', None)
+    delta = _implemented(instance.status) - _implemented(old_status)
+    stats.adjust(instance.author_id, implemented_count=delta)
+
+
+@receiver(post_delete, sender=KaizenPost)
+def _count_post_deleted(sender, instance, **kwargs):
+    stats.adjust(instance.author_id, posts_count=-1, implemented_count=-_implemented(instance.status))
+
+
+def _post_author_id(post_id):
+    return KaizenPost.objects.filter(pk=post_id).values_list('author_id', flat=True).first()
+
+
+@receiver(post_save, sender=Like)
+def _count_like_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.adjust(_post_author_id(instance.post_id), likes_received=1)
+
+
+@receiver(post_delete, sender=Like)
+def _count_like_deleted(sender, instance, **kwargs):
+    stats.adjust(_post_author_id(instance.post_id), likes_received=-1)
+
+
+@receiver(post_save, sender=Comment)
+def _count_comment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.adjust(instance.author_id, comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def _count_comment_deleted(sender, instance, **kwargs):
+    stats.adjust(instance.author_id, comments_count=-1)
+
+
+@receiver(post_save, sender=PostApproval)
+def _count_review_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_approver = getattr(instance, '_old_approver_id', None)
+    was = stats.is_counted_review(getattr(instance, '_old_decision', None), old_approver)
+    now = stats.is_counted_review(instance.decision, instance.approver_id)
+    if was and now and old_approver == instance.approver_id:
+        return
+    if was:
+        stats.adjust(old_approver, reviews_count=-1)
+    if now:
+        stats.adjust(instance.approver_id, reviews_count=1)
+
+
+@receiver(post_delete, sender=PostApproval)
+def _count_review_deleted(sender, instance, **kwargs):
+    if stats.is_counted_review(instance.decision, instance.approver_id):
+        stats.adjust(instance.approver_id, reviews_count=-1)
+
+
+# --- Naliczenia ------------------------------------------------------------
+
 @receiver(post_save, sender=KaizenPost)
 def _on_post_saved(sender, instance, created, **kwargs):
     if created:
-        engine.award(
-            instance.author,
+        _award_later(
+            instance.author_id,
             Action.IDEA_CREATED,
             source=instance,
             dedupe_key=f'idea_created:{instance.pk}',
@@ -38,15 +167,15 @@ def _on_post_saved(sender, instance, created, **kwargs):
         return
 
     if instance.status == KaizenPost.Status.SUBMITTED:
-        engine.award(
-            instance.author,
+        _award_later(
+            instance.author_id,
             Action.IDEA_APPROVED,
             source=instance,
             dedupe_key=f'idea_approved:{instance.pk}',
         )
     elif instance.status == KaizenPost.Status.IMPLEMENTED:
-        engine.award(
-            instance.author,
+        _award_later(
+            instance.author_id,
             Action.IDEA_IMPLEMENTED,
             source=instance,
             dedupe_key=f'idea_implemented:{instance.pk}',
@@ -57,10 +186,10 @@ def _on_post_saved(sender, instance, created, **kwargs):
 def _on_like_created(sender, instance, created, **kwargs):
     if not created:
         return
-    author = instance.post.author
-    if author and author.id != instance.user_id:
-        engine.award(
-            author,
+    author_id = instance.post.author_id
+    if author_id and author_id != instance.user_id:
+        _award_later(
+            author_id,
             Action.LIKE_RECEIVED,
             source=instance.post,
             dedupe_key=f'like:{instance.post_id}:{instance.user_id}',
@@ -72,33 +201,21 @@ def _on_like_created(sender, instance, created, **kwargs):
 def _on_comment_created(sender, instance, created, **kwargs):
     if not created:
         return
-    engine.award(
-        instance.author,
+    _award_later(
+        instance.author_id,
         Action.COMMENT_MADE,
         source=instance,
         dedupe_key=f'comment:{instance.pk}',
     )
 
 
-@receiver(pre_save, sender=PostApproval)
-def _stash_old_decision(sender, instance, **kwargs):
-    if not instance.pk:
-        instance._old_decision = None
-        return
-    instance._old_decision = (
-        sender.objects.filter(pk=instance.pk)
-        .values_list('decision', flat=True)
-        .first()
-    )
-
-
 @receiver(post_save, sender=PostApproval)
 def _on_approval_decided(sender, instance, created, **kwargs):
     decided = {PostApproval.Decision.APPROVED, PostApproval.Decision.REJECTED}
     old = getattr(instance, '_old_decision', None)
     if instance.decision in decided and old not in decided and instance.approver_id:
-        engine.award(
-            instance.approver,
+        _award_later(
+            instance.approver_id,
             Action.REVIEW_COMPLETED,
             source=instance,
             dedupe_key=f'review:{instance.pk}',
@@ -0,0 +1,83 @@
+"""
+Przepustowość naliczeń z dziennym limitem: `COUNT` dzisiejszych transakcji
+(dotychczasowe sprawdzanie limitu) vs licznik `DailyActionCounter`.
+
+Dla każdego rozmiaru historii z `--history` tworzy w transakcji użytkownika
+z tyloma transakcjami rozłożonymi na ostatni rok, mierzy samo sprawdzenie
+limitu obiema metodami oraz pełne `engine.award` (`--awards` naliczeń),
+a na końcu wycofuje transakcję — baza zostaje nietknięta.
+
+    python manage.py benchmark_awards --history 10000 100000 --awards 500
+"""
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from gamification.models import Action, PointRule, PointTransaction
+from gamification.services import caps, engine
+
+ACTION = Action.LIKE_RECEIVED
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks capped award throughput (COUNT-based cap check vs daily counters).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history', type=int, nargs='+', default=[10000, 100000])
+        parser.add_argument('--awards', type=int, default=500)
+
+    def handle(self, *args, **options):
+        for size in options['history']:
+            try:
+                with transaction.atomic():
+                    self._run(size, options['awards'])
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+    def _run(self, size, awards):
+        User = get_user_model()
+        user = User.objects.create_user(username='__award_benchmark__', nickname='__award_benchmark__')
+        PointRule.objects.update_or_create(
+            action=ACTION, defaults={'points': 1, 'daily_cap': 10 ** 9, 'is_active': True},
+        )
+
+        now = timezone.now()
+        history = [
+            PointTransaction(user=user, action=ACTION, points=1, dedupe_key=f'bench:{i}')
+            for i in range(size)
+        ]
+        PointTransaction.objects.bulk_create(history, batch_size=5000)
+        # auto_now_add nadpisuje daty przy zapisie — rozkładamy je na rok osobno.
+        for day in range(365):
+            PointTransaction.objects.filter(
+                user=user, dedupe_key__in=[f'bench:{i}' for i in range(day, size, 365)],
+            ).update(created_at=now - timedelta(days=day))
+
+        today = now.date()
+        legacy = self._throughput(awards, lambda i: PointTransaction.objects.filter(
+            user=user, action=ACTION, created_at__date=today,
+        ).count())
+        counter = self._throughput(awards, lambda i: caps.claim(user.pk, ACTION, 10 ** 9))
+        full = self._throughput(awards, lambda i: engine.award(user, ACTION, dedupe_key=f'bench:new:{i}'))
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{size} transactions in history ({connection.vendor}), {awards} awards'
+        ))
+        for label, rate in (('COUNT cap check', legacy), ('counter claim', counter), ('award, capped', full)):
+            self.stdout.write(f'  {label:<16} {rate:10.0f} /s')
+
+    @staticmethod
+    def _throughput(n, fn):
+        start = time.perf_counter()
+        for i in range(n):
+            fn(i)
+        return n / (time.perf_counter() - start)
@@ -66,6 +66,10 @@ REWARDS = [
 DEPARTMENTS = ['Produkcja', 'Logistyka', 'Jakość', 'IT', 'BHP', 'Administracja']
 
 
+def _award(user_id, action, source, dedupe_key):
+    return {'user_id': user_id, 'action': action, 'source': source, 'dedupe_key': dedupe_key}
+
+
 class Command(BaseCommand):
     help = 'Seeds gamification config and backfills points from existing data.'
 
@@ -143,45 +147,39 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING('Ledger not empty — skipping backfill (use --reset).'))
             return
 
-        User = get_user_model()
         users = set()
 
-        for post in KaizenPost.objects.all():
-            engine.award(post.author, Action.IDEA_CREATED, source=post,
-                         dedupe_key=f'idea_created:{post.pk}')
-            users.add(post.author_id)
-            if post.status == KaizenPost.Status.SUBMITTED:
-                engine.award(post.author, Action.IDEA_APPROVED, source=post,
-                             dedupe_key=f'idea_approved:{post.pk}')
-            elif post.status == KaizenPost.Status.IMPLEMENTED:
-                engine.award(post.author, Action.IDEA_APPROVED, source=post,
-                             dedupe_key=f'idea_approved:{post.pk}')
-                engine.award(post.author, Action.IDEA_IMPLEMENTED, source=post,
-                             dedupe_key=f'idea_implemented:{post.pk}')
-
-        for like in Like.objects.select_related('post'):
-            author = like.post.author
-            if author and author.id != like.user_id:
-                engine.award(author, Action.LIKE_RECEIVED, source=like.post,
-                             dedupe_key=f'like:{like.post_id}:{like.user_id}')
-                users.add(author.id)
-
-        for c in Comment.objects.all():
-            engine.award(c.author, Action.COMMENT_MADE, source=c,
-                         dedupe_key=f'comment:{c.pk}')
-            users.add(c.author_id)
-
-        for a in PostApproval.objects.exclude(
-            decision=PostApproval.Decision.PENDING
-        ).exclude(decision=PostApproval.Decision.SKIPPED):
-            if a.approver_id:
-                engine.award(a.approver, Action.REVIEW_COMPLETED, source=a,
-                             dedupe_key=f'review:{a.pk}')
-                users.add(a.approver_id)
+        def awards():
+            for post in KaizenPost.objects.all():
+                yield _award(post.author_id, Action.IDEA_CREATED, post, f'idea_created:{post.pk}')
+                users.add(post.author_id)
+                if post.status in (KaizenPost.Status.SUBMITTED, KaizenPost.Status.IMPLEMENTED):
+                    yield _award(post.author_id, Action.IDEA_APPROVED, post, f'idea_approved:{post.pk}')
+                if post.status == KaizenPost.Status.IMPLEMENTED:
+                    yield _award(post.author_id, Action.IDEA_IMPLEMENTED, post, f'idea_implemented:{post.pk}')
+
+            for like in Like.objects.select_related('post'):
+                author_id = like.post.author_id
+                if author_id and author_id != like.user_id:
+                    yield _award(author_id, Action.LIKE_RECEIVED, like.post,
+                                 f'like:{like.post_id}:{like.user_id}')
+                    users.add(author_id)
+
+            for c in Comment.objects.all():
+                yield _award(c.author_id, Action.COMMENT_MADE, c, f'comment:{c.pk}')
+                users.add(c.author_id)
+
+            for a in PostApproval.objects.exclude(
+                decision=PostApproval.Decision.PENDING
+            ).exclude(decision=PostApproval.Decision.SKIPPED):
+                if a.approver_id:
+                    yield _award(a.approver_id, Action.REVIEW_COMPLETED, a, f'review:{a.pk}')
+                    users.add(a.approver_id)
+
+        engine.award_many(awards(), sync_profiles=False)
 
         # Pełne przeliczenie profili (punkty, poziom, passa, odznaki)
-        for uid in users:
-            engine.recompute_profile(User.objects.get(id=uid))
+        engine.recompute_profiles(users)
 
         self.stdout.write(self.style.SUCCESS(
             f'Backfill: {PointTransaction.objects.count()} transactions, '
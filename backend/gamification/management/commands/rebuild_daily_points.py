@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from gamification.services import daily_points, ranks
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds daily per-user point buckets used by week/month leaderboards from the point ledger.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Odbuduj tylko ostatnie N dni (domyślnie całą historię).')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['days'] is not None:
+            since = timezone.localdate() - timedelta(days=options['days'])
+        count = daily_points.rebuild(since=since)
+        ranks.invalidate()
+        scope = 'all days' if since is None else f'since {since.isoformat()}'
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} daily bucket(s) ({scope}).'))
@@ -0,0 +1,58 @@
+"""
+Pełne przeliczenie wszystkich profili gamifikacji (punkty, poziom, passa, odznaki).
+
+Id użytkowników czytane są strumieniowo i dzielone na paczki po `--chunk-size`;
+z `--processes N` paczki przeliczane są równolegle w puli procesów.
+
+    python manage.py recompute_all_profiles --chunk-size 500 --processes 4
+"""
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from gamification.services import engine, ranks
+
+
+def _init_worker():
+    # Przy `spawn` proces potomny startuje bez skonfigurowanego Django.
+    import django
+    django.setup()
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = 'Recomputes every gamification profile from the point ledger, in chunks and optionally in parallel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Liczba użytkowników w jednej paczce.')
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Liczba procesów roboczych (1 = w bieżącym procesie).')
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        user_ids = engine.users_with_points().iterator(chunk_size=chunk_size)
+        chunks = _chunks(user_ids, chunk_size)
+
+        done = 0
+        if options['processes'] <= 1:
+            for chunk in chunks:
+                done += engine.recompute_profiles(chunk)
+                self.stdout.write(f'  {done} profile(s) recomputed')
+        else:
+            # Id zbieramy przed forkiem — potomkowie nie mogą dzielić połączenia z rodzicem.
+            chunks = list(chunks)
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['processes'], initializer=_init_worker) as pool:
+                for count in pool.map(engine.recompute_profiles, chunks):
+                    done += count
+                    self.stdout.write(f'  {done} profile(s) recomputed')
+        ranks.invalidate()
+        self.stdout.write(self.style.SUCCESS(f'Recomputed {done} profile(s).'))
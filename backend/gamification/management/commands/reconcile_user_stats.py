@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from gamification.services import stats
+
+
+class Command(BaseCommand):
+    help = 'Recomputes denormalized per-user statistics (badge metrics, my impact) and fixes any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Tylko raportuj rozjazdy, bez zapisu.')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        drifts = stats.reconcile(dry_run=dry_run)
+        for user_id, field, stored, actual in drifts:
+            self.stdout.write(f'  user {user_id}: {field} {stored} -> {actual}')
+        verb = 'Found' if dry_run else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(drifts)} drifted counter(s).'))
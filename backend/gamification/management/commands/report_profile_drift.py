@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from gamification.services import engine
+
+
+class Command(BaseCommand):
+    help = 'Compares gamification profiles with the point ledger and optionally recomputes drifted ones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Przelicz od zera profile z rozjazdem (punkty, poziom, passa, odznaki).')
+
+    def handle(self, *args, **options):
+        drift = engine.profile_drift()
+        for user_id, stored, ledger in drift:
+            stored_label = 'no profile' if stored is None else stored
+            self.stdout.write(f'  user {user_id}: profile {stored_label}, ledger {ledger}')
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('No drift found.'))
+            return
+        if not options['fix']:
+            self.stdout.write(self.style.WARNING(f'{len(drift)} profile(s) drifted (run with --fix).'))
+            return
+
+        User = get_user_model()
+        for user in User.objects.filter(pk__in=[user_id for user_id, _, _ in drift]):
+            engine.recompute_profile(user)
+        self.stdout.write(self.style.SUCCESS(f'Recomputed {len(drift)} profile(s).'))
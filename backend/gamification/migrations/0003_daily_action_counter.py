@@ -0,0 +1,55 @@
+# Generated by Django 6.0 on 2026-10-18 14:20
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_recent_counters(apps, schema_editor):
+    """Liczniki dla ostatnich dwóch dni — starsze nie wpływają już na limity."""
+    PointTransaction = apps.get_model('gamification', 'PointTransaction')
+    DailyActionCounter = apps.get_model('gamification', 'DailyActionCounter')
+    since = timezone.localdate() - timedelta(days=1)
+    rows = (
+        PointTransaction.objects.annotate(day=TruncDate('created_at'))
+        .filter(day__gte=since)
+        .values('user_id', 'action', 'day')
+        .annotate(n=Count('id'))
+        .order_by()
+    )
+    DailyActionCounter.objects.bulk_create([
+        DailyActionCounter(user_id=row['user_id'], action=row['action'], day=row['day'], count=row['n'])
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0002_userstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActionCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('IDEA_CREATED', 'Zgłoszenie pomysłu'), ('IDEA_APPROVED', 'Pomysł zatwierdzony'), ('IDEA_IMPLEMENTED', 'Pomysł wdrożony'), ('LIKE_RECEIVED', 'Otrzymany lajk'), ('COMMENT_MADE', 'Dodany komentarz'), ('REVIEW_COMPLETED', 'Wykonana weryfikacja'), ('REWARD_REDEEMED', 'Wymiana nagrody')], max_length=32)),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Dzienny licznik akcji',
+                'verbose_name_plural': 'Dzienne liczniki akcji',
+                'constraints': [models.UniqueConstraint(fields=('user', 'action', 'day'), name='uniq_daily_action_counter')],
+            },
+        ),
+        migrations.RunPython(backfill_recent_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.0 on 2026-10-18 14:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_points(apps, schema_editor):
+    PointTransaction = apps.get_model('gamification', 'PointTransaction')
+    UserDailyPoints = apps.get_model('gamification', 'UserDailyPoints')
+    rows = (
+        PointTransaction.objects.annotate(day=TruncDate('created_at'))
+        .values('user_id', 'day')
+        .annotate(points=Sum('points'))
+        .order_by()
+    )
+    UserDailyPoints.objects.bulk_create(
+        (UserDailyPoints(user_id=row['user_id'], day=row['day'], points=row['points']) for row in rows),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0003_daily_action_counter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDailyPoints',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('points', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Dzienne punkty użytkownika',
+                'verbose_name_plural': 'Dzienne punkty użytkowników',
+                'indexes': [models.Index(fields=['day'], name='gamif_daily_points_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'day'), name='uniq_user_daily_points')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_points, migrations.RunPython.noop),
+    ]
@@ -76,6 +76,52 @@ class PointTransaction(models.Model):
         return f'{self.user_id}: {self.action} {self.points:+d}'
 
 
+class UserDailyPoints(models.Model):
+    """Suma punktów użytkownika z jednego dnia (strefa `TIME_ZONE`) — rankingi okresowe.
+
+    Pochodna ledgera `PointTransaction`; odbudowa: `manage.py rebuild_daily_points`.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+',
+    )
+    day = models.DateField()
+    points = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Dzienne punkty użytkownika'
+        verbose_name_plural = 'Dzienne punkty użytkowników'
+        indexes = [models.Index(fields=['day'], name='gamif_daily_points_day_idx')]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='uniq_user_daily_points'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.day} {self.points:+d}'
+
+
+class DailyActionCounter(models.Model):
+    """Liczba naliczeń akcji przez użytkownika w danym dniu (dzienne limity `PointRule`).
+
+    Dzień liczony w strefie `TIME_ZONE`; nowy dzień to po prostu nowy wiersz.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+',
+    )
+    action = models.CharField(max_length=32, choices=Action.choices)
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Dzienny licznik akcji'
+        verbose_name_plural = 'Dzienne liczniki akcji'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'action', 'day'], name='uniq_daily_action_counter'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.action} {self.day} × {self.count}'
+
+
 class Level(models.Model):
     """Progi poziomów. Config-driven."""
     name = models.CharField(max_length=80)
@@ -216,3 +262,27 @@ class RewardRedemption(models.Model):
 
     def __str__(self):
         return f'{self.user_id} → {self.reward.name} ({self.status})'
+
+
+class UserStats(models.Model):
+    """Zdenormalizowane liczniki aktywności użytkownika (metryki odznak, „mój wpływ”).
+
+    Utrzymywane przyrostowo przez `gamification.handlers`; brak wiersza
+    oznacza „jeszcze nie policzone” — `services.stats.get_stats` liczy go wtedy od zera.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    implemented_count = models.PositiveIntegerField(default=0)
+    likes_received = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    reviews_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Statystyki użytkownika'
+        verbose_name_plural = 'Statystyki użytkowników'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.posts_count} pomysłów, {self.likes_received} lajków'
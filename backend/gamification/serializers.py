@@ -52,6 +52,13 @@ class LeaderboardUserSerializer(serializers.Serializer):
     streak = serializers.IntegerField(allow_null=True)
 
 
+class LeaderboardNeighbourSerializer(serializers.Serializer):
+    rank = serializers.IntegerField()
+    user = UserPublicSerializer()
+    points = serializers.IntegerField()
+    is_me = serializers.BooleanField()
+
+
 class LeaderboardCategorySerializer(serializers.Serializer):
     category = serializers.CharField()
     points = serializers.IntegerField()
@@ -1,37 +1,15 @@
 """Ewaluacja odznak — strategia pluggable (criteria_type → funkcja licząca metrykę)."""
-from ..models import Badge, UserBadge
+from collections import defaultdict
 
+from ..models import Action, Badge, UserBadge
+from . import config, stats
 
-def _post_count_safe(user):
-    from ideas.models import KaizenPost
-    return KaizenPost.objects.filter(author=user).count()
 
-
-def _likes_received(user, profile):
-    # Suma lajków na postach autora
-    from ideas.models import Like
-    return Like.objects.filter(post__author=user).count()
-
-
-def _implemented_count(user, profile):
-    from ideas.models import KaizenPost
-    return KaizenPost.objects.filter(
-        author=user, status=KaizenPost.Status.IMPLEMENTED
-    ).count()
-
-
-def _review_count(user, profile):
-    from ideas.models import PostApproval
-    return PostApproval.objects.filter(
-        approver=user
-    ).exclude(decision=PostApproval.Decision.PENDING).exclude(
-        decision=PostApproval.Decision.SKIPPED
-    ).count()
-
-
-def _comment_count(user, profile):
-    from ideas.models import Comment
-    return Comment.objects.filter(author=user).count()
+def _stat(field):
+    """Resolver czytający licznik z `UserStats` (jeden wiersz na użytkownika)."""
+    def resolve(user, profile):
+        return getattr(stats.get_stats(user), field)
+    return resolve
 
 
 def _streak(user, profile):
@@ -43,16 +21,31 @@ def _points(user, profile):
 
 
 METRIC_RESOLVERS = {
-    Badge.Criteria.POST_COUNT: lambda u, p: _post_count_safe(u),
-    Badge.Criteria.LIKES_RECEIVED: _likes_received,
-    Badge.Criteria.IMPLEMENTED_COUNT: _implemented_count,
-    Badge.Criteria.REVIEW_COUNT: _review_count,
-    Badge.Criteria.COMMENT_COUNT: _comment_count,
+    Badge.Criteria.POST_COUNT: _stat('posts_count'),
+    Badge.Criteria.LIKES_RECEIVED: _stat('likes_received'),
+    Badge.Criteria.IMPLEMENTED_COUNT: _stat('implemented_count'),
+    Badge.Criteria.REVIEW_COUNT: _stat('reviews_count'),
+    Badge.Criteria.COMMENT_COUNT: _stat('comments_count'),
     Badge.Criteria.STREAK: _streak,
     Badge.Criteria.POINTS: _points,
 }
 
 
+# Które kryteria może zmienić dana akcja. Każde naliczenie zmienia punkty
+# i (potencjalnie) passę; pozostałe metryki zależą od konkretnej akcji.
+_ALWAYS = (Badge.Criteria.POINTS, Badge.Criteria.STREAK)
+ACTION_CRITERIA = {
+    Action.IDEA_CREATED: (Badge.Criteria.POST_COUNT, *_ALWAYS),
+    Action.IDEA_APPROVED: _ALWAYS,
+    Action.IDEA_IMPLEMENTED: (Badge.Criteria.IMPLEMENTED_COUNT, *_ALWAYS),
+    Action.LIKE_RECEIVED: (Badge.Criteria.LIKES_RECEIVED, *_ALWAYS),
+    Action.COMMENT_MADE: (Badge.Criteria.COMMENT_COUNT, *_ALWAYS),
+    Action.REVIEW_COMPLETED: (Badge.Criteria.REVIEW_COUNT, *_ALWAYS),
+    # Wymiana odejmuje punkty, ale zwrot (odrzucona wymiana) je dodaje.
+    Action.REWARD_REDEEMED: (Badge.Criteria.POINTS,),
+}
+
+
 def metric_value(criteria_type, user, profile):
     resolver = METRIC_RESOLVERS.get(criteria_type)
     if resolver is None:
@@ -63,20 +56,55 @@ def metric_value(criteria_type, user, profile):
         return 0
 
 
-def evaluate_badges(user, profile):
+class _Metrics:
+    """Memo metryk jednego użytkownika w obrębie jednej ewaluacji."""
+
+    def __init__(self, user, profile):
+        self.user = user
+        self.profile = profile
+        self._values = {}
+
+    def __getitem__(self, criteria_type):
+        if criteria_type not in self._values:
+            self._values[criteria_type] = metric_value(criteria_type, self.user, self.profile)
+        return self._values[criteria_type]
+
+
+def evaluate_badges(user, profile, action=None):
     """Przyznaje nowe odznaki, których próg user właśnie osiągnął.
 
+    Z `action` sprawdzane są tylko kryteria, które ta akcja mogła zmienić
+    (`ACTION_CRITERIA`); bez niej — wszystkie. Odznaki pochodzą z migawki
+    konfiguracji (`config`), posiadane odpadają po jednym zapytaniu o UserBadge,
+    a każda metryka liczona jest raz dla wszystkich progów.
+
     Zwraca listę nowo przyznanych obiektów UserBadge.
     """
-    owned = set(
+    if action is not None:
+        criteria = ACTION_CRITERIA.get(action, ())
+        if not criteria:
+            return []
+        candidates = [b for b in config.get().badges if b.criteria_type in criteria]
+    else:
+        candidates = config.get().badges
+    if not candidates:
+        return []
+
+    owned_ids = set(
         UserBadge.objects.filter(user=user).values_list('badge_id', flat=True)
     )
+    by_criteria = defaultdict(list)
+    for badge in candidates:
+        if badge.id not in owned_ids:
+            by_criteria[badge.criteria_type].append(badge)
+
+    metrics = _Metrics(user, profile)
     newly = []
-    for badge in Badge.objects.filter(is_active=True):
-        if badge.id in owned:
-            continue
-        value = metric_value(badge.criteria_type, user, profile)
-        if value >= badge.threshold:
+    for criteria_type, pending in by_criteria.items():
+        value = metrics[criteria_type]
+        for badge in pending:
+            if value < badge.threshold:
+                continue
             ub, created = UserBadge.objects.get_or_create(user=user, badge=badge)
             if created:
                 newly.append(ub)
@@ -88,9 +116,10 @@ def badge_progress(user, profile):
     owned_ids = set(
         UserBadge.objects.filter(user=user).values_list('badge_id', flat=True)
     )
+    metrics = _Metrics(user, profile)
     out = []
-    for badge in Badge.objects.filter(is_active=True):
-        value = metric_value(badge.criteria_type, user, profile)
+    for badge in config.get().badges:
+        value = metrics[badge.criteria_type]
         earned = badge.id in owned_ids
         out.append({
             'badge': badge,
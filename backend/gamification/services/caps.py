@@ -0,0 +1,59 @@
+"""
+Dzienne limity naliczeń (`PointRule.daily_cap`) na licznikach `DailyActionCounter`.
+
+Zamiast liczyć dzisiejsze transakcje (`COUNT` z `created_at__date`, który omija
+indeks `(user, created_at)`) każde naliczenie rezerwuje miejsce warunkowym
+`UPDATE … SET count = count + 1 WHERE count < cap`. Baza blokuje wiersz na czas
+aktualizacji, więc równoległe lajki nie przekroczą limitu. Dzień to
+`timezone.localdate()` — po północy w strefie `TIME_ZONE` zaczyna się nowy wiersz.
+"""
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import DailyActionCounter
+
+
+def today():
+    return timezone.localdate()
+
+
+def claim(user_id, action, cap, day=None):
+    """Rezerwuje jedno naliczenie w limicie dnia; False, gdy limit wyczerpany."""
+    day = day or today()
+    counter = DailyActionCounter.objects.filter(user_id=user_id, action=action, day=day, count__lt=cap)
+    if counter.update(count=F('count') + 1):
+        return True
+    # Brak wiersza (pierwsze naliczenie dnia) albo limit osiągnięty — wiersz
+    # zakładamy bez ryzyka konfliktu i próbujemy jeszcze raz.
+    DailyActionCounter.objects.bulk_create(
+        [DailyActionCounter(user_id=user_id, action=action, day=day)], ignore_conflicts=True,
+    )
+    return bool(counter.update(count=F('count') + 1))
+
+
+def release(user_id, action, day=None):
+    """Oddaje zarezerwowane miejsce (naliczenie ostatecznie się nie odbyło)."""
+    DailyActionCounter.objects.filter(
+        user_id=user_id, action=action, day=day or today(), count__gt=0,
+    ).update(count=F('count') - 1)
+
+
+def usage(user_ids, actions, day=None):
+    """`{(user_id, akcja): liczba}` dla podanego dnia — jedno zapytanie."""
+    rows = DailyActionCounter.objects.filter(
+        user_id__in=user_ids, action__in=actions, day=day or today(),
+    ).values_list('user_id', 'action', 'count')
+    return {(user_id, action): count for user_id, action, count in rows}
+
+
+def add(counts, day=None):
+    """Dolicza `{(user_id, akcja): n}` (naliczenia hurtowe, limity sprawdzone w pamięci)."""
+    day = day or today()
+    DailyActionCounter.objects.bulk_create(
+        [DailyActionCounter(user_id=user_id, action=action, day=day) for user_id, action in counts],
+        ignore_conflicts=True,
+    )
+    for (user_id, action), n in counts.items():
+        DailyActionCounter.objects.filter(user_id=user_id, action=action, day=day).update(
+            count=F('count') + n,
+        )
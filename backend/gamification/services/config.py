@@ -0,0 +1,117 @@
+"""
+Konfiguracja gamifikacji (reguły punktowe, poziomy, odznaki) w pamięci procesu.
+
+Tabele zmieniają się kilka razy w roku (admin, `init_gamification`), a czytane
+są przy każdym naliczeniu i każdym `GET /gamification/me/`. Trzymamy więc
+migawkę w pamięci procesu, oznaczoną wersją ze wspólnego cache:
+
+- zapis/usunięcie `PointRule` / `Level` / `Badge` (sygnał w `handlers`) od razu
+  czyści migawkę tego procesu, a po commicie podbija `VERSION_KEY`;
+- pozostałe procesy porównują wersję najwyżej co
+  `GAMIFICATION_CONFIG_CHECK_SECONDS` i przy różnicy ładują migawkę od nowa;
+- dopóki zmiana w bieżącej transakcji nie jest zatwierdzona, ten wątek czyta
+  konfigurację prosto z bazy (i niczego nie zapamiętuje).
+
+„Wspólny” znaczy wspólny dla serwera WWW i workera zadań — przy
+`JOB_QUEUE_MODE=worker` cache nie może być `LocMemCache` (check `realtime.E002`).
+"""
+import threading
+import time
+from bisect import bisect_right
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from ..models import Badge, Level, PointRule
+
+VERSION_KEY = 'gamification:config:version'
+
+_local = {'snapshot': None, 'version': None, 'checked_at': 0.0}
+_pending = threading.local()
+
+
+class Snapshot:
+    """Niezmienna (umownie) kopia konfiguracji z gotowymi strukturami wyszukiwania."""
+
+    def __init__(self, rules, levels, badges):
+        self.rules = {rule.action: rule for rule in rules}
+        self.levels = sorted(levels, key=lambda level: level.min_points)
+        self.thresholds = [level.min_points for level in self.levels]
+        self.badges = list(badges)
+
+    def level_for_points(self, points):
+        index = bisect_right(self.thresholds, points)
+        return self.levels[index - 1] if index else None
+
+    def next_level_after(self, points):
+        index = bisect_right(self.thresholds, points)
+        return self.levels[index] if index < len(self.levels) else None
+
+
+def check_seconds():
+    return getattr(settings, 'GAMIFICATION_CONFIG_CHECK_SECONDS', 5)
+
+
+def load():
+    """Migawka prosto z bazy (trzy zapytania)."""
+    return Snapshot(
+        rules=PointRule.objects.filter(is_active=True),
+        levels=Level.objects.all(),
+        badges=Badge.objects.filter(is_active=True),
+    )
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get():
+    """Aktualna migawka konfiguracji."""
+    if _has_pending_write():
+        return load()
+    snapshot = _local['snapshot']
+    now = time.monotonic()
+    if snapshot is not None and now - _local['checked_at'] < check_seconds():
+        return snapshot
+    version = current_version()
+    if snapshot is None or version != _local['version']:
+        snapshot = load()
+        _local.update(snapshot=snapshot, version=version)
+    _local['checked_at'] = now
+    return snapshot
+
+
+def invalidate():
+    """Konfiguracja się zmieniła: ten proces od razu, pozostałe po commicie."""
+    _local['snapshot'] = None
+
+    def publish():
+        _pending.callback = None
+        _local['snapshot'] = None
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.add(VERSION_KEY, time.time_ns(), None)
+
+    _pending.callback = publish
+    transaction.on_commit(publish)
+
+
+def _has_pending_write():
+    callback = getattr(_pending, 'callback', None)
+    if callback is None:
+        return False
+    # Wycofana transakcja zabiera swoje callbacki — wtedy nic się nie zmieniło.
+    if any(entry[1] is callback for entry in transaction.get_connection().run_on_commit):
+        return True
+    _pending.callback = None
+    return False
+
+
+def rule_for(action):
+    return get().rules.get(action)
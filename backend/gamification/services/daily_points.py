@@ -0,0 +1,123 @@
+"""
+Dzienne kubełki punktów (`UserDailyPoints`) dla rankingów tygodnia i miesiąca.
+
+Każda transakcja punktowa dopisuje się do kubełka (użytkownik, dzień w strefie
+`TIME_ZONE`) — sygnałem w `gamification.handlers`, a przy `award_many`
+jawnie przez `add_many`. Okno kroczące `[start, teraz]` to suma pełnych dni
+z kubełków plus niepełny pierwszy dzień policzony z ledgera (mały zakres
+`created_at`), więc wynik jest identyczny jak suma po samych transakcjach.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import connections, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ..models import PointTransaction, UserDailyPoints
+
+
+def day_of(moment):
+    return timezone.localdate(moment)
+
+
+def add(user_id, points, day, create=True):
+    """Atomowo dolicza punkty do kubełka; pierwszy zapis dnia zakłada wiersz.
+
+    `create=False` przy usuwaniu transakcji — kaskada usuwanego użytkownika
+    nie może zakładać mu nowych kubełków.
+    """
+    if not points:
+        return
+    bucket = UserDailyPoints.objects.filter(user_id=user_id, day=day)
+    if bucket.update(points=F('points') + points) or not create:
+        return
+    UserDailyPoints.objects.bulk_create(
+        [UserDailyPoints(user_id=user_id, day=day)], ignore_conflicts=True,
+    )
+    bucket.update(points=F('points') + points)
+
+
+def add_many(transactions):
+    """Dolicza zapisane hurtowo transakcje (po jednym UPDATE na kubełek)."""
+    totals = defaultdict(int)
+    for txn in transactions:
+        totals[(txn.user_id, day_of(txn.created_at))] += txn.points
+    for (user_id, day), points in totals.items():
+        add(user_id, points, day)
+
+
+@transaction.atomic
+def rebuild(since=None):
+    """Odbudowuje kubełki z ledgera (od dnia `since` włącznie albo wszystkie).
+
+    Zwraca liczbę zapisanych kubełków.
+    """
+    buckets = UserDailyPoints.objects.all()
+    txns = PointTransaction.objects.annotate(day=TruncDate('created_at'))
+    if since is not None:
+        buckets = buckets.filter(day__gte=since)
+        txns = txns.filter(day__gte=since)
+    buckets.delete()
+    rows = txns.values('user_id', 'day').annotate(points=Sum('points')).order_by()
+    created = UserDailyPoints.objects.bulk_create(
+        (UserDailyPoints(user_id=row['user_id'], day=row['day'], points=row['points']) for row in rows),
+        batch_size=1000,
+    )
+    return len(created)
+
+
+def _window_sources(start, user_id=None):
+    """Querysety (kubełki, niepełny pierwszy dzień z ledgera) składające się na okno."""
+    buckets = UserDailyPoints.objects.all()
+    if user_id is not None:
+        buckets = buckets.filter(user_id=user_id)
+    if start is None:
+        return [buckets]
+    first_full_day = day_of(start) + timedelta(days=1)
+    boundary = timezone.make_aware(datetime.combine(first_full_day, time.min))
+    ledger = PointTransaction.objects.filter(created_at__gte=start, created_at__lt=boundary)
+    if user_id is not None:
+        ledger = ledger.filter(user_id=user_id)
+    return [buckets.filter(day__gte=first_full_day), ledger]
+
+
+def window_totals(start, fields, user_id=None):
+    """`{wartości pól: punkty}` w oknie `[start, teraz]` (albo za cały czas, gdy `start` to None).
+
+    `fields` to ścieżki liczone od modelu z polem `user` (np. `('user',)`
+    albo `('user__department__id', 'user__department__name')`), wspólne dla
+    kubełków i ledgera. `user_id` zawęża sumę do jednego użytkownika.
+    """
+    totals = defaultdict(int)
+    for qs in _window_sources(start, user_id):
+        for row in qs.values(*fields).annotate(total=Sum('points')).order_by():
+            totals[tuple(row[field] for field in fields)] += row['total'] or 0
+    return totals
+
+
+def window_top(start, fields, limit, **filters):
+    """Najwyżej `limit` par `(wartości pól, punkty)` z okna, malejąco wg punktów.
+
+    Jedno zapytanie: kubełki i ledger łączone `UNION ALL`, a grupowanie,
+    sortowanie i limit po stronie bazy — wraca tylko `limit` wierszy.
+    `filters` zawężają oba źródła (np. `user__department__isnull=False`).
+    """
+    keys = [f'k{n}' for n in range(len(fields))]
+    parts, params = [], []
+    for qs in _window_sources(start):
+        rows = qs.filter(**filters).values(
+            **{key: F(field) for key, field in zip(keys, fields)}, total=F('points'),
+        ).order_by()
+        sql, part_params = rows.query.sql_with_params()
+        parts.append(sql)
+        params.extend(part_params)
+    columns = ', '.join(keys)
+    sql = (
+        f'SELECT {columns}, SUM(total) AS total FROM ({" UNION ALL ".join(parts)}) AS window_points '
+        f'GROUP BY {columns} ORDER BY total DESC, {columns} LIMIT %s'
+    )
+    with connections[UserDailyPoints.objects.db].cursor() as cursor:
+        cursor.execute(sql, [*params, limit])
+        return [(tuple(row[:-1]), row[-1] or 0) for row in cursor.fetchall()]
@@ -1,16 +1,21 @@
 """Centralny silnik gamifikacji — jedyny punkt naliczania punktów."""
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 from django.db import IntegrityError, transaction
-from django.db.models import Sum
-from django.utils import timezone
+from django.db.models import F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
 
 from ..models import (
     Action,
-    PointRule,
     PointTransaction,
     UserGamificationProfile,
 )
+from ..signals import points_bulk_awarded
 from . import badges as badges_service
+from . import caps, config, daily_points
 from . import levels as levels_service
 from . import streaks as streaks_service
 
@@ -21,19 +26,7 @@ def get_or_create_profile(user):
 
 
 def _rule_for(action):
-    return PointRule.objects.filter(action=action, is_active=True).first()
-
-
-def _within_daily_cap(user, action, cap):
-    if not cap:
-        return True
-    today = timezone.now().date()
-    count = PointTransaction.objects.filter(
-        user=user,
-        action=action,
-        created_at__date=today,
-    ).count()
-    return count < cap
+    return config.rule_for(action)
 
 
 @transaction.atomic
@@ -53,7 +46,9 @@ def award(user, action, *, source=None, dedupe_key='', metadata=None, points_ove
     points = points_override if points_override is not None else (rule.points if rule else None)
     if points is None:
         return None
-    if rule and not _within_daily_cap(user, action, rule.daily_cap):
+    cap_day = caps.today()
+    capped = bool(rule and rule.daily_cap)
+    if capped and not caps.claim(user.pk, action, rule.daily_cap, day=cap_day):
         return None
 
     ct = None
@@ -74,51 +69,304 @@ def award(user, action, *, source=None, dedupe_key='', metadata=None, points_ove
                 metadata=metadata or {},
             )
     except IntegrityError:
-        # Duplikat (ten sam dedupe_key) — akcja już naliczona.
+        # Duplikat (ten sam dedupe_key) — akcja już naliczona, miejsce w limicie wraca.
+        if capped:
+            caps.release(user.pk, action, day=cap_day)
         return None
 
-    _sync_profile(user, activity_date=txn.created_at.date())
+    _sync_profile(user, activity_date=txn.created_at.date(), delta=txn.points, action=action)
     return txn
 
 
-def _sync_profile(user, activity_date=None):
-    """Przelicza zdenormalizowany profil z ledgera + odznaki + passę."""
-    profile = get_or_create_profile(user)
-    total = (
-        PointTransaction.objects
-        .filter(user=user)
-        .aggregate(s=Sum('points'))
-        ['s'] or 0
-    )
-    profile.total_points = total
-    profile.level = levels_service.level_for_points(total)
+def _sync_profile(user, activity_date=None, delta=None, action=None):
+    """Aktualizuje zdenormalizowany profil (punkty, poziom, passa) + odznaki.
 
-    if activity_date is not None:
-        streaks_service.apply_activity(profile, activity_date)
-    profile.save()
+    Z `delta` (i włączonym `GAMIFICATION_INCREMENTAL_SYNC`) dopisuje tylko
+    punkty nowej transakcji — koszt nie rośnie z historią użytkownika.
+    Bez `delta` sumuje cały ledger (ścieżka pełna / kontrolna).
+    `action` zawęża ewaluację odznak do kryteriów, które mogła zmienić.
+    """
+    if delta is not None and getattr(settings, 'GAMIFICATION_INCREMENTAL_SYNC', True):
+        profile = _apply_delta(user, delta, activity_date)
+    else:
+        profile = _sync_profile_full(user, activity_date)
+    badges_service.evaluate_badges(user, profile, action=action)
+    return profile
 
-    badges_service.evaluate_badges(user, profile)
+
+def _apply_delta(user, delta, activity_date=None):
+    get_or_create_profile(user)
+    with transaction.atomic():
+        # Blokada wiersza serializuje równoległe naliczenia dla tego samego
+        # użytkownika (passa i poziom liczone są z aktualnego stanu).
+        profile = UserGamificationProfile.objects.select_for_update().get(user=user)
+        UserGamificationProfile.objects.filter(pk=profile.pk).update(
+            total_points=F('total_points') + delta,
+        )
+        profile.refresh_from_db(fields=['total_points'])
+        profile.level = levels_service.level_for_points(profile.total_points)
+        if activity_date is not None:
+            streaks_service.apply_activity(profile, activity_date)
+        profile.save(update_fields=[
+            'level', 'current_streak', 'longest_streak', 'last_activity_date', 'updated_at',
+        ])
+    return profile
+
+
+def _sync_profile_full(user, activity_date=None):
+    get_or_create_profile(user)
+    with transaction.atomic():
+        # Suma ledgera czytana pod blokadą profilu: równoległe `_apply_delta`
+        # albo już się zatwierdziło (i jest w sumie), albo doda deltę po nas.
+        profile = UserGamificationProfile.objects.select_for_update().get(user=user)
+        total = (
+            PointTransaction.objects
+            .filter(user=user)
+            .aggregate(s=Sum('points'))
+            ['s'] or 0
+        )
+        profile.total_points = total
+        profile.level = levels_service.level_for_points(total)
+
+        if activity_date is not None:
+            streaks_service.apply_activity(profile, activity_date)
+        profile.save()
     return profile
 
 
+def award_many(awards, *, batch_size=1000, sync_profiles=True):
+    """Nalicza wiele akcji naraz (backfille, importy).
+
+    `awards` to iterowalne słowniki jak payload zadania `gamification.award`:
+    `user_id`, `action`, opcjonalnie `dedupe_key`, `source`, `metadata`,
+    `points_override`. Reguły i dzienne limity sprawdzane są w pamięci,
+    transakcje zapisywane `bulk_create(ignore_conflicts=True)` paczkami po
+    `batch_size` (duplikaty `dedupe_key` — z bazy i z samego wejścia — odpadają),
+    a każdy dotknięty profil przeliczany jest raz, na końcu (chyba że
+    `sync_profiles=False` — np. gdy wołający i tak robi `recompute_profiles`).
+    Passy nie ruszamy: naliczenie hurtowe to nie dzisiejsza aktywność użytkownika.
+    Zamiast `post_save` każdej transakcji wysyła raz `points_bulk_awarded`.
+
+    Zwraca liczbę zapisanych transakcji.
+    """
+    rules = config.get().rules
+    cap_day = caps.today()
+    used_today = {}
+    seen = set()
+    affected = set()
+    created = 0
+
+    batch = []
+    for item in awards:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            created += _insert_batch(batch, rules, cap_day, used_today, seen, affected)
+            batch = []
+    if batch:
+        created += _insert_batch(batch, rules, cap_day, used_today, seen, affected)
+
+    if sync_profiles:
+        _sync_profiles(affected)
+    if affected:
+        points_bulk_awarded.send(sender=PointTransaction, user_ids=affected)
+    return created
+
+
+def _insert_batch(batch, rules, cap_day, used_today, seen, affected):
+    candidates = []
+    for item in batch:
+        rule = rules.get(item['action'])
+        override = item.get('points_override')
+        points = override if override is not None else (rule.points if rule else None)
+        if points is None or not item.get('user_id'):
+            continue
+        dedupe_key = item.get('dedupe_key') or ''
+        if dedupe_key:
+            key = (item['user_id'], item['action'], dedupe_key)
+            if key in seen:
+                continue
+            seen.add(key)
+        candidates.append((item, rule, points, dedupe_key))
+    if not candidates:
+        return 0
+
+    user_ids = {item['user_id'] for item, *_ in candidates}
+    existing = set(
+        PointTransaction.objects.filter(
+            user_id__in=user_ids,
+            dedupe_key__in={key for *_, key in candidates if key},
+        ).values_list('user_id', 'action', 'dedupe_key')
+    )
+    capped = {rule.action for _, rule, _, _ in candidates if rule and rule.daily_cap}
+    _load_daily_usage(used_today, user_ids, capped, cap_day)
+
+    rows = []
+    for item, rule, points, dedupe_key in candidates:
+        user_id, action = item['user_id'], item['action']
+        if dedupe_key and (user_id, action, dedupe_key) in existing:
+            continue
+        if rule and rule.daily_cap:
+            if used_today.get((user_id, action), 0) >= rule.daily_cap:
+                continue
+            used_today[(user_id, action)] = used_today.get((user_id, action), 0) + 1
+        source = item.get('source')
+        has_source = source is not None and getattr(source, 'pk', None) is not None
+        rows.append(PointTransaction(
+            user_id=user_id,
+            action=action,
+            points=points,
+            dedupe_key=dedupe_key,
+            content_type=ContentType.objects.get_for_model(source.__class__) if has_source else None,
+            object_id=source.pk if has_source else None,
+            metadata=item.get('metadata') or {},
+        ))
+
+    with transaction.atomic():
+        # Równoległe naliczenie z tym samym dedupe_key wygrywa — konflikt pomijamy,
+        # a limity i dzienne kubełki liczymy tylko z wierszy, które faktycznie trafiły do bazy.
+        PointTransaction.objects.bulk_create(rows, ignore_conflicts=True)
+        inserted, skipped = _split_inserted(rows)
+        claimed = {}
+        for row in inserted:
+            if row.action in capped:
+                claimed[(row.user_id, row.action)] = claimed.get((row.user_id, row.action), 0) + 1
+        caps.add(claimed, day=cap_day)
+        daily_points.add_many(inserted)
+    for row in skipped:
+        if row.action in capped:
+            used_today[(row.user_id, row.action)] -= 1
+    affected.update(row.user_id for row in inserted)
+    return len(inserted)
+
+
+def _split_inserted(rows):
+    """Dzieli wiersze po `bulk_create(ignore_conflicts=True)` na zapisane i pominięte.
+
+    Pominięte mogą być tylko wiersze z `dedupe_key`. Czytamy je ponownie po
+    kluczu: wiersz jest nasz, gdy `created_at` w bazie równa się temu, które
+    `auto_now_add` nadało obiektowi przed zapisem — wiersz równoległego
+    naliczenia ma własny znacznik czasu.
+    """
+    keyed = [row for row in rows if row.dedupe_key]
+    if not keyed:
+        return rows, []
+    stored = {
+        (user_id, action, dedupe_key): created_at
+        for user_id, action, dedupe_key, created_at in PointTransaction.objects.filter(
+            user_id__in={row.user_id for row in keyed},
+            dedupe_key__in={row.dedupe_key for row in keyed},
+        ).values_list('user_id', 'action', 'dedupe_key', 'created_at')
+    }
+    inserted, skipped = [], []
+    for row in rows:
+        mine = not row.dedupe_key or stored.get((row.user_id, row.action, row.dedupe_key)) == row.created_at
+        (inserted if mine else skipped).append(row)
+    return inserted, skipped
+
+
+def _load_daily_usage(used_today, user_ids, capped_actions, day):
+    """Dzisiejsze liczniki (user, akcja) dla akcji z limitem — jedno zapytanie na paczkę."""
+    missing = {
+        (user_id, action) for user_id in user_ids for action in capped_actions
+        if (user_id, action) not in used_today
+    }
+    if not missing:
+        return
+    loaded = caps.usage({user_id for user_id, _ in missing}, {action for _, action in missing}, day=day)
+    for key in missing:
+        used_today[key] = loaded.get(key, 0)
+
+
+def _sync_profiles(user_ids, activity_date=None):
+    users = get_user_model().objects.in_bulk(user_ids)
+    for user_id in sorted(users):
+        user = users[user_id]
+        profile = _sync_profile_full(user, activity_date)
+        badges_service.evaluate_badges(user, profile)
+
+
+def profile_drift(user_ids=None):
+    """Profile, których `total_points` różni się od sumy ledgera.
+
+    Zwraca listę `(user_id, zapisane, z_ledgera)`; użytkownicy z transakcjami,
+    ale bez profilu, mają `zapisane = None`.
+    """
+    ledger = (
+        PointTransaction.objects.filter(user=OuterRef('user'))
+        .order_by()
+        .values('user')
+        .annotate(s=Sum('points'))
+        .values('s')
+    )
+    profiles = UserGamificationProfile.objects.annotate(
+        ledger_total=Coalesce(Subquery(ledger, output_field=IntegerField()), Value(0)),
+    ).exclude(total_points=F('ledger_total'))
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=user_ids)
+    drift = [
+        (row['user_id'], row['total_points'], row['ledger_total'])
+        for row in profiles.values('user_id', 'total_points', 'ledger_total').order_by('user_id')
+    ]
+
+    orphans = (
+        PointTransaction.objects.filter(user__gamification__isnull=True)
+        .order_by()
+        .values('user_id')
+        .annotate(s=Sum('points'))
+    )
+    if user_ids is not None:
+        orphans = orphans.filter(user_id__in=user_ids)
+    drift.extend((row['user_id'], None, row['s']) for row in orphans)
+    return drift
+
+
 def recompute_profile(user):
-    """Pełne przeliczenie profilu (np. po backfillu / migracji danych)."""
+    """Pełne przeliczenie profilu (np. po backfillu / migracji danych).
+
+    Punkty to agregat ledgera, a passa odtwarzana jest z listy dni z dodatnią
+    transakcją — bez ładowania transakcji do pamięci.
+    """
     profile = get_or_create_profile(user)
-    txns = list(
-        PointTransaction.objects.filter(user=user).order_by('created_at')
-    )
-    profile.total_points = sum(t.points for t in txns)
+    txns = PointTransaction.objects.filter(user=user)
+    profile.total_points = txns.aggregate(s=Sum('points'))['s'] or 0
     profile.level = levels_service.level_for_points(profile.total_points)
 
     # Odtwórz passę z dni aktywności
     profile.current_streak = 0
     profile.longest_streak = 0
     profile.last_activity_date = None
-    for t in txns:
-        if t.points <= 0:
-            continue
-        streaks_service.apply_activity(profile, t.created_at.date())
+    days = (
+        txns.filter(points__gt=0)
+        .annotate(day=TruncDate('created_at', tzinfo=dt_timezone.utc))
+        .order_by('day')
+        .values_list('day', flat=True)
+        .distinct()
+    )
+    for day in days:
+        streaks_service.apply_activity(profile, day)
     profile.save()
 
     badges_service.evaluate_badges(user, profile)
     return profile
+
+
+def recompute_profiles(user_ids):
+    """`recompute_profile` dla paczki użytkowników; zwraca liczbę przeliczonych.
+
+    Funkcja modułu (nie metoda), żeby dało się ją wysłać do puli procesów.
+    """
+    users = get_user_model().objects.in_bulk(list(user_ids))
+    for user_id in sorted(users):
+        recompute_profile(users[user_id])
+    return len(users)
+
+
+def users_with_points():
+    """Id użytkowników z profilem albo transakcjami, rosnąco (do przeliczeń paczkami)."""
+    return (
+        get_user_model().objects
+        .filter(Q(gamification__isnull=False) | Q(point_transactions__isnull=False))
+        .order_by('pk')
+        .values_list('pk', flat=True)
+        .distinct()
+    )
@@ -1,10 +1,16 @@
-"""Rankingi: osoby / kategorie / działy, w oknach czasowych."""
+"""Rankingi: osoby / kategorie / działy, w oknach czasowych.
+
+Okna tygodnia i miesiąca (oraz działy) liczone są z dziennych kubełków
+punktów (`daily_points`), a nie z całego ledgera — sumowane, sortowane
+i przycinane do `limit` w jednym zapytaniu.
+"""
 from datetime import timedelta
 
-from django.db.models import Sum
+from django.db.models import OuterRef, Subquery, Sum
 from django.utils import timezone
 
 from ..models import PointTransaction, UserGamificationProfile
+from . import daily_points
 
 PERIOD_ALL = 'all'
 PERIOD_MONTH = 'month'
@@ -37,30 +43,27 @@ def top_users(period=PERIOD_ALL, limit=20):
             for p in qs
         ]
 
-    start = _period_start(period)
-    rows = (
-        PointTransaction.objects
-        .filter(created_at__gte=start)
-        .values('user')
-        .annotate(points=Sum('points'))
-        .order_by('-points')[:limit]
-    )
+    rows = daily_points.window_top(_period_start(period), ('user',), limit)
     from django.contrib.auth import get_user_model
     User = get_user_model()
     user_map = {u.id: u for u in User.objects.filter(
-        id__in=[r['user'] for r in rows]
+        id__in=[user_id for (user_id,), _ in rows]
     ).select_related('department')}
     result = []
-    for r in rows:
-        u = user_map.get(r['user'])
+    for (user_id,), points in rows:
+        u = user_map.get(user_id)
         if not u:
             continue
-        result.append({'user': u, 'points': r['points'] or 0, 'level': None, 'streak': None})
+        result.append({'user': u, 'points': points, 'level': None, 'streak': None})
     return result
 
 
 def top_categories(period=PERIOD_ALL, limit=20):
-    """Suma punktów wg kategorii postów, których dotyczyły transakcje powiązane z postem."""
+    """Suma punktów wg kategorii postów, których dotyczyły transakcje powiązane z postem.
+
+    Jedno zapytanie: kategoria dociągana podzapytaniem po `object_id`,
+    grupowanie i limit po stronie bazy.
+    """
     from django.contrib.contenttypes.models import ContentType
     from ideas.models import KaizenPost
 
@@ -70,52 +73,35 @@ def top_categories(period=PERIOD_ALL, limit=20):
     if start is not None:
         qs = qs.filter(created_at__gte=start)
 
-    rows = qs.values('object_id', 'points')
-    cat_points = {}
-    post_ids = {r['object_id'] for r in rows if r['object_id']}
-    post_cat = dict(
-        KaizenPost.objects.filter(id__in=post_ids)
-        .values_list('id', 'category__name')
+    category = KaizenPost.objects.filter(pk=OuterRef('object_id')).values('category__name')[:1]
+    rows = (
+        qs.annotate(category=Subquery(category))
+        .exclude(category__isnull=True)
+        .exclude(category='')
+        .values('category')
+        .annotate(points=Sum('points'))
+        .order_by('-points', 'category')[:limit]
     )
-    for r in rows:
-        cat = post_cat.get(r['object_id'])
-        if not cat:
-            continue
-        cat_points[cat] = cat_points.get(cat, 0) + (r['points'] or 0)
-
-    ranked = sorted(cat_points.items(), key=lambda kv: kv[1], reverse=True)[:limit]
-    return [{'category': name, 'points': pts} for name, pts in ranked]
+    return [{'category': r['category'], 'points': r['points'] or 0} for r in rows]
 
 
 def top_departments(period=PERIOD_ALL, limit=20):
-    """Suma punktów członków wg działu użytkownika."""
-    qs = PointTransaction.objects.select_related('user__department')
-    start = _period_start(period)
-    if start is not None:
-        qs = qs.filter(created_at__gte=start)
-
-    rows = (
-        qs.exclude(user__department__isnull=True)
-        .values('user__department__id', 'user__department__name')
-        .annotate(points=Sum('points'))
-        .order_by('-points')[:limit]
+    """Suma punktów członków wg działu użytkownika (z dziennych kubełków)."""
+    rows = daily_points.window_top(
+        _period_start(period), ('user__department__id', 'user__department__name'), limit,
+        user__department__isnull=False,
     )
     return [
         {
-            'department_id': r['user__department__id'],
-            'department': r['user__department__name'],
-            'points': r['points'] or 0,
+            'department_id': department_id,
+            'department': name,
+            'points': points,
         }
-        for r in rows
+        for (department_id, name), points in rows
     ]
 
 
-def user_rank(user):
-    """Pozycja użytkownika w rankingu all-time (1-indexed) lub None."""
-    profile = getattr(user, 'gamification', None)
-    if profile is None:
-        return None
-    higher = UserGamificationProfile.objects.filter(
-        total_points__gt=profile.total_points
-    ).count()
-    return higher + 1
+def user_rank(user, period=PERIOD_ALL):
+    """Pozycja użytkownika w rankingu (1-indexed) lub None — patrz `ranks`."""
+    from .ranks import user_rank as indexed_rank
+    return indexed_rank(user, period)
@@ -1,28 +1,21 @@
-from ..models import Level
+from . import config
 
 
 def level_for_points(points):
-    """Najwyższy poziom, którego próg <= points."""
-    return (
-        Level.objects.filter(min_points__lte=points)
-        .order_by('-min_points')
-        .first()
-    )
+    """Najwyższy poziom, którego próg <= points (bisect po progach z `config`)."""
+    return config.get().level_for_points(points)
 
 
 def next_level_after(points):
     """Najbliższy poziom powyżej obecnych punktów (lub None gdy max)."""
-    return (
-        Level.objects.filter(min_points__gt=points)
-        .order_by('min_points')
-        .first()
-    )
+    return config.get().next_level_after(points)
 
 
 def level_progress(points):
     """Zwraca dict z postępem do następnego poziomu (0..1)."""
-    current = level_for_points(points)
-    nxt = next_level_after(points)
+    snapshot = config.get()
+    current = snapshot.level_for_points(points)
+    nxt = snapshot.next_level_after(points)
     if not nxt:
         return {'current': current, 'next': None, 'progress': 1.0, 'to_next': 0}
     base = current.min_points if current else 0
@@ -0,0 +1,183 @@
+"""
+Pozycja w rankingu i „sąsiedzi” w czasie O(log n).
+
+Dla każdego okresu (`all` / `month` / `week`) budujemy posortowaną listę
+kluczy `(-punkty, user_id)` i mapę punktów. Pozycja to `bisect` po tej
+liście, a sąsiedzi — wycinek wokół punktu wstawienia. Punkty samego
+pytającego są zawsze bieżące, więc własny awans widać od razu (także
+w pozycjach sąsiadów), a pozycje innych — z opóźnieniem najwyżej TTL.
+
+Indeks żyje w dwóch miejscach:
+
+- we wspólnym cache, pod kluczem z wersją, którą wskazuje
+  `gamification:ranks:<okres>:version` (wygasa po `LEADERBOARD_RANK_CACHE_SECONDS`);
+- w pamięci procesu, oznaczony tą wersją — dopóki wersja się nie zmieni,
+  odczyt to jedno `cache.get` małej liczby, bez odpakowywania całego indeksu.
+
+Po wygaśnięciu indeks odbudowuje tylko ten, kto zdobędzie blokadę
+(`cache.add`); pozostali korzystają z poprzedniej kopii procesu, a gdy jej
+nie mają — czekają najwyżej `LEADERBOARD_RANK_LOCK_SECONDS` s.
+
+Pozycja jak w `leaderboard.user_rank`: 1 + liczba osób z większą liczbą punktów.
+"""
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+
+from ..models import UserGamificationProfile
+from . import daily_points
+from .leaderboard import PERIOD_ALL, PERIOD_MONTH, PERIOD_WEEK, _period_start
+
+PERIODS = (PERIOD_ALL, PERIOD_MONTH, PERIOD_WEEK)
+KEY_PREFIX = 'gamification:ranks'
+POLL_SECONDS = 0.05
+
+_local = {}  # okres -> (wersja, RankIndex)
+
+
+class RankIndex:
+    def __init__(self, scores):
+        self.scores = scores
+        self.keys = sorted((-points, user_id) for user_id, points in scores.items())
+
+    def rank(self, user_id, points, mover=None):
+        """1 + liczba innych użytkowników z większą liczbą punktów niż `points`.
+
+        `mover` to opcjonalna para `(user_id, bieżące punkty)` kogoś, czyj wpis
+        w indeksie może być nieaktualny (pytający w `around`).
+        """
+        higher = bisect_left(self.keys, (-points, -1))
+        stale = self.scores.get(user_id)
+        if stale is not None and stale > points:
+            higher -= 1  # własny, nieaktualny wpis nad bieżącym wynikiem
+        if mover is not None and mover[0] != user_id:
+            mover_id, mover_points = mover
+            stale = self.scores.get(mover_id)
+            if stale is not None and stale > points:
+                higher -= 1
+            if mover_points > points:
+                higher += 1
+        return higher + 1
+
+    def around(self, user_id, points, radius):
+        """`radius` osób nad i pod użytkownikiem: lista `(user_id, punkty)` z nim w środku."""
+        position = bisect_left(self.keys, (-points, user_id))
+        above = [key for key in self.keys[max(0, position - radius - 1):position] if key[1] != user_id]
+        below = [key for key in self.keys[position:position + radius + 1] if key[1] != user_id]
+        window = above[-radius:] if radius else []
+        window.append((-points, user_id))
+        window.extend(below[:radius])
+        return [(uid, -neg_points) for neg_points, uid in window]
+
+
+def timeout():
+    return getattr(settings, 'LEADERBOARD_RANK_CACHE_SECONDS', 60)
+
+
+def lock_seconds():
+    return getattr(settings, 'LEADERBOARD_RANK_LOCK_SECONDS', 30)
+
+
+def _scores(period):
+    if period == PERIOD_ALL:
+        return dict(UserGamificationProfile.objects.values_list('user_id', 'total_points'))
+    totals = daily_points.window_totals(_period_start(period), ('user',))
+    return {user_id: points for (user_id,), points in totals.items()}
+
+
+def _version_key(period):
+    return f'{KEY_PREFIX}:{period}:version'
+
+
+def _shared(period, version):
+    """Indeks w wersji `version`: kopia procesu albo (raz na wersję) ze wspólnego cache."""
+    local = _local.get(period)
+    if local is not None and local[0] == version:
+        return local[1]
+    index = cache.get(f'{KEY_PREFIX}:{period}:{version}')
+    if index is not None:
+        _local[period] = (version, index)
+    return index
+
+
+def _build(period):
+    version = time.time_ns()
+    index = RankIndex(_scores(period))
+    # Indeks przed wersją i dłużej od niej — kto zobaczy wersję, znajdzie indeks.
+    cache.set(f'{KEY_PREFIX}:{period}:{version}', index, timeout() + lock_seconds())
+    cache.set(_version_key(period), version, timeout())
+    _local[period] = (version, index)
+    return index
+
+
+def _wait_for(period, lock_key):
+    deadline = time.monotonic() + lock_seconds()
+    while time.monotonic() < deadline:
+        time.sleep(POLL_SECONDS)
+        version = cache.get(_version_key(period))
+        if version is not None:
+            index = _shared(period, version)
+            if index is not None:
+                return index
+        if cache.get(lock_key) is None:
+            break
+    return None
+
+
+def get_index(period=PERIOD_ALL):
+    version = cache.get(_version_key(period))
+    if version is not None:
+        index = _shared(period, version)
+        if index is not None:
+            return index
+
+    lock_key = f'{KEY_PREFIX}:{period}:lock'
+    if cache.add(lock_key, 1, lock_seconds()):
+        try:
+            return _build(period)
+        finally:
+            cache.delete(lock_key)
+
+    local = _local.get(period)
+    if local is not None:
+        return local[1]  # odbudowa trwa w innym procesie
+    index = _wait_for(period, lock_key)
+    return index if index is not None else RankIndex(_scores(period))
+
+
+def invalidate():
+    cache.delete_many([_version_key(period) for period in PERIODS])
+
+
+def current_points(user, period=PERIOD_ALL):
+    """Bieżące punkty użytkownika w okresie albo None (brak profilu w rankingu all-time)."""
+    if period == PERIOD_ALL:
+        return UserGamificationProfile.objects.filter(user=user).values_list('total_points', flat=True).first()
+    totals = daily_points.window_totals(_period_start(period), ('user',), user_id=user.pk)
+    return totals.get((user.pk,), 0)
+
+
+def user_rank(user, period=PERIOD_ALL):
+    points = current_points(user, period)
+    if points is None:
+        return None
+    return get_index(period).rank(user.pk, points)
+
+
+def around(user, period=PERIOD_ALL, radius=5):
+    """Pozycje wokół użytkownika: lista `{'rank', 'user_id', 'points', 'is_me'}`."""
+    points = current_points(user, period)
+    if points is None:
+        return []
+    index = get_index(period)
+    return [
+        {
+            'rank': index.rank(user_id, user_points, mover=(user.pk, points)),
+            'user_id': user_id,
+            'points': user_points,
+            'is_me': user_id == user.pk,
+        }
+        for user_id, user_points in index.around(user.pk, points, radius)
+    ]
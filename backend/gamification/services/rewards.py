@@ -31,7 +31,7 @@ def redeem(user, reward_id):
         reward.stock -= 1
         reward.save(update_fields=['stock'])
 
-    PointTransaction.objects.create(
+    txn = PointTransaction.objects.create(
         user=user,
         action=Action.REWARD_REDEEMED,
         points=-reward.cost_points,
@@ -44,7 +44,7 @@ def redeem(user, reward_id):
         status=RewardRedemption.Status.PENDING,
     )
 
-    _sync_profile(user)
+    _sync_profile(user, delta=txn.points, action=Action.REWARD_REDEEMED)
     return redemption
 
 
@@ -59,7 +59,7 @@ def set_status(redemption_id, status, handler, note=''):
         return redemption
 
     if status == RewardRedemption.Status.REJECTED and redemption.status != RewardRedemption.Status.REJECTED:
-        PointTransaction.objects.create(
+        refund = PointTransaction.objects.create(
             user=redemption.user,
             action=Action.REWARD_REDEEMED,
             points=redemption.points_spent,
@@ -68,7 +68,7 @@ def set_status(redemption_id, status, handler, note=''):
         if redemption.reward.stock is not None:
             redemption.reward.stock += 1
             redemption.reward.save(update_fields=['stock'])
-        _sync_profile(redemption.user)
+        _sync_profile(redemption.user, delta=refund.points, action=Action.REWARD_REDEEMED)
 
     redemption.status = status
     redemption.handled_by = handler
@@ -0,0 +1,120 @@
+"""
+Zdenormalizowane statystyki użytkownika (`UserStats`).
+
+Metryki odznak i „mój wpływ” czytają jeden wiersz zamiast liczyć posty,
+lajki, komentarze i weryfikacje przy każdym żądaniu. Wiersz zmieniamy
+atomowo wyrażeniem `F()` w sygnałach (`gamification.handlers`), także przy
+usunięciach i cofnięciu statusu/decyzji.
+
+Brak wiersza to „jeszcze nie policzone”: `adjust` go wtedy nie tworzy,
+a `get_stats` liczy go od zera przy pierwszym odczycie. Ścieżki omijające
+sygnały (`bulk_create`, `QuerySet.update`) wyrównuje `reconcile`, wywoływane
+komendą `manage.py reconcile_user_stats`.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, Now
+
+from ideas.models import Comment, KaizenPost, Like, PostApproval
+from ..models import UserStats
+
+# Weryfikacja „się liczy”, gdy etap ma decyzję inną niż oczekująca/pominięta.
+UNCOUNTED_DECISIONS = (PostApproval.Decision.PENDING, PostApproval.Decision.SKIPPED)
+
+
+def _sources():
+    """Pole → (queryset źródłowy, ścieżka do użytkownika)."""
+    return {
+        'posts_count': (KaizenPost.objects.all(), 'author'),
+        'implemented_count': (KaizenPost.objects.filter(status=KaizenPost.Status.IMPLEMENTED), 'author'),
+        'likes_received': (Like.objects.all(), 'post__author'),
+        'comments_count': (Comment.objects.all(), 'author'),
+        'reviews_count': (PostApproval.objects.exclude(decision__in=UNCOUNTED_DECISIONS), 'approver'),
+    }
+
+
+FIELDS = ('posts_count', 'implemented_count', 'likes_received', 'comments_count', 'reviews_count')
+
+
+def is_counted_review(decision, approver_id):
+    return bool(approver_id) and decision not in UNCOUNTED_DECISIONS
+
+
+def adjust(user_id, **deltas):
+    """Atomowo zmienia liczniki użytkownika (nigdy poniżej zera) i podbija `updated_at`."""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not user_id or not deltas:
+        return
+    UserStats.objects.filter(user_id=user_id).update(
+        **{field: Greatest(F(field) + delta, Value(0)) for field, delta in deltas.items()},
+        updated_at=Now(),
+    )
+
+
+def compute(user_id):
+    """Liczniki policzone od zera z tabel źródłowych."""
+    return {
+        field: qs.filter(**{path: user_id}).count()
+        for field, (qs, path) in _sources().items()
+    }
+
+
+def get_stats(user):
+    """Wiersz `UserStats` użytkownika; przy pierwszym odczycie liczony od zera.
+
+    Wynik zostaje w cache relacji `user.stats`, więc kolejne odczyty w tym
+    samym żądaniu nie pytają bazy.
+    """
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        pass
+    try:
+        with transaction.atomic():
+            stats = UserStats.objects.create(user=user, **compute(user.pk))
+    except IntegrityError:
+        stats = UserStats.objects.get(user=user)
+    user.stats = stats
+    return stats
+
+
+def _actual(field):
+    qs, path = _sources()[field]
+    return Coalesce(
+        Subquery(
+            qs.filter(**{path: OuterRef('user')})
+            .order_by()
+            .values(path)
+            .annotate(n=Count('pk'))
+            .values('n'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def reconcile(dry_run=False, user_ids=None):
+    """Porównuje zapisane liczniki z tabelami źródłowymi i naprawia rozjazdy.
+
+    Zwraca listę `(user_id, pole, zapisane, rzeczywiste)` dla rozjechanych liczników.
+    """
+    qs = UserStats.objects.all()
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=user_ids)
+    qs = qs.annotate(**{f'_actual_{field}': _actual(field) for field in FIELDS})
+    drift_filter = Q()
+    for field in FIELDS:
+        drift_filter |= ~Q(**{field: F(f'_actual_{field}')})
+
+    drifts = []
+    values = ['user_id', *FIELDS, *(f'_actual_{field}' for field in FIELDS)]
+    for row in qs.filter(drift_filter).order_by('user_id').values(*values).iterator(chunk_size=1000):
+        fixes = {}
+        for field in FIELDS:
+            stored, actual = row[field], row[f'_actual_{field}']
+            if stored != actual:
+                drifts.append((row['user_id'], field, stored, actual))
+                fixes[field] = actual
+        if fixes and not dry_run:
+            UserStats.objects.filter(user_id=row['user_id']).update(**fixes, updated_at=Now())
+    return drifts
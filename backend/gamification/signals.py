@@ -0,0 +1,6 @@
+"""Sygnały gamifikacji dla innych aplikacji (np. `realtime`)."""
+from django.dispatch import Signal
+
+# Hurtowe naliczenie (`engine.award_many`; `bulk_create` nie wysyła `post_save`).
+# Argument: `user_ids` — użytkownicy z co najmniej jedną zapisaną transakcją.
+points_bulk_awarded = Signal()
@@ -0,0 +1,18 @@
+from django.apps import apps
+from django.contrib.auth import get_user_model
+
+from jobs.registry import task
+
+from .services import engine
+
+
+@task('gamification.award')
+def award(user_id, action, dedupe_key, source_model=None, source_pk=None, metadata=None):
+    user = get_user_model().objects.filter(pk=user_id).first()
+    if user is None:
+        return
+    source = None
+    if source_model and source_pk is not None:
+        # Źródło mogło zostać usunięte zanim zadanie ruszyło — akcja i tak się wydarzyła.
+        source = apps.get_model(source_model)._default_manager.filter(pk=source_pk).first()
+    engine.award(user, action, source=source, dedupe_key=dedupe_key, metadata=metadata)
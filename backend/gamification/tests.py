@@ -0,0 +1,554 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from gamification.models import (
+    Action,
+    Badge,
+    DailyActionCounter,
+    Level,
+    PointRule,
+    PointTransaction,
+    UserBadge,
+    UserDailyPoints,
+    UserGamificationProfile,
+    UserStats,
+)
+from gamification.services import badges as badges_service
+from gamification.services import caps
+from gamification.services import config as config_service
+from gamification.services import daily_points
+from gamification.services import engine
+from gamification.services import leaderboard
+from gamification.services import levels as levels_service
+from gamification.services import ranks
+from gamification.services import stats as stats_service
+from ideas.models import Category, Comment, KaizenPost, Like, PostApproval
+from users.models import Department
+
+User = get_user_model()
+
+
+class IncrementalProfileSyncTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='gracz', password='x', nickname='Gracz')
+        PointRule.objects.create(action=Action.COMMENT_MADE, points=5)
+        Level.objects.create(name='Start', min_points=0, order=1)
+        self.silver = Level.objects.create(name='Srebro', min_points=10, order=2)
+
+    def _profile(self):
+        return UserGamificationProfile.objects.get(user=self.user)
+
+    def test_award_applies_delta_without_reading_ledger(self):
+        # Stara transakcja spoza engine — przyrostowa ścieżka jej nie widzi.
+        PointTransaction.objects.create(user=self.user, action=Action.COMMENT_MADE, points=100)
+        engine.award(self.user, Action.COMMENT_MADE, dedupe_key='c:1')
+        engine.award(self.user, Action.COMMENT_MADE, dedupe_key='c:2')
+        engine.award(self.user, Action.COMMENT_MADE, dedupe_key='c:2')  # duplikat
+
+        profile = self._profile()
+        self.assertEqual(profile.total_points, 10)
+        self.assertEqual(profile.level, self.silver)
+        self.assertEqual(profile.current_streak, 1)
+
+    @override_settings(GAMIFICATION_INCREMENTAL_SYNC=False)
+    def test_full_mode_sums_ledger(self):
+        PointTransaction.objects.create(user=self.user, action=Action.COMMENT_MADE, points=100)
+        engine.award(self.user, Action.COMMENT_MADE, dedupe_key='c:1')
+        self.assertEqual(self._profile().total_points, 105)
+
+    def test_drift_report_and_fix(self):
+        engine.award(self.user, Action.COMMENT_MADE, dedupe_key='c:1')
+        self.assertEqual(engine.profile_drift(), [])
+
+        PointTransaction.objects.create(user=self.user, action=Action.COMMENT_MADE, points=7)
+        other = User.objects.create_user(username='bez-profilu', password='x', nickname='Bez')
+        PointTransaction.objects.create(user=other, action=Action.COMMENT_MADE, points=3)
+        self.assertEqual(engine.profile_drift(), [(self.user.pk, 5, 12), (other.pk, None, 3)])
+
+        out = StringIO()
+        call_command('report_profile_drift', '--fix', stdout=out)
+        self.assertIn('Recomputed 2', out.getvalue())
+        self.assertEqual(engine.profile_drift(), [])
+        self.assertEqual(self._profile().total_points, 12)
+
+
+class BadgeEvaluationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='autor', password='x', nickname='Autor')
+        post = KaizenPost.objects.bulk_create([KaizenPost(
+            author=self.user, category=Category.objects.create(name='Proces'), title='T', content='C',
+        )])[0]
+        Comment.objects.bulk_create([Comment(post=post, author=self.user, text=str(i)) for i in range(3)])
+        stats_service.get_stats(self.user)
+        self.user = User.objects.get(pk=self.user.pk)  # bez zbuforowanego `user.stats`
+        self.profile = engine.get_or_create_profile(self.user)
+        self.post_badge = Badge.objects.create(
+            code='post-1', name='Pomysł', criteria_type=Badge.Criteria.POST_COUNT, threshold=1,
+        )
+        self.comment_badges = [
+            Badge.objects.create(
+                code=f'comment-{threshold}', name=f'Komentarze {threshold}',
+                criteria_type=Badge.Criteria.COMMENT_COUNT, threshold=threshold,
+            )
+            for threshold in (1, 2, 5)
+        ]
+
+    def _owned(self):
+        return set(UserBadge.objects.filter(user=self.user).values_list('badge__code', flat=True))
+
+    def test_action_evaluates_only_its_criteria_once(self):
+        with CaptureQueriesContext(connection) as ctx:
+            newly = badges_service.evaluate_badges(self.user, self.profile, action=Action.COMMENT_MADE)
+        self.assertEqual({ub.badge.code for ub in newly}, {'comment-1', 'comment-2'})
+        sql = [q['sql'] for q in ctx.captured_queries]
+        self.assertEqual(sum('FROM "gamification_userstats"' in q for q in sql), 1)
+        self.assertFalse(any('FROM "ideas_kaizenpost"' in q for q in sql))
+
+        # Posiadane odznaki nie są ponownie liczone; pełna ewaluacja łapie resztę.
+        self.assertEqual(badges_service.evaluate_badges(self.user, self.profile, action=Action.COMMENT_MADE), [])
+        badges_service.evaluate_badges(self.user, self.profile)
+        self.assertEqual(self._owned(), {'post-1', 'comment-1', 'comment-2'})
+
+    def test_action_without_affected_criteria_skips_queries(self):
+        with self.assertNumQueries(0):
+            badges_service.evaluate_badges(self.user, self.profile, action='UNKNOWN')
+
+
+class UserStatsTests(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='autor', password='x', nickname='Autor')
+        self.fan = User.objects.create_user(username='fan', password='x', nickname='Fan')
+        self.category = Category.objects.create(name='Proces')
+
+    def _stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def _post(self, **kwargs):
+        return KaizenPost.objects.create(
+            author=self.author, category=self.category, title='T', content='C', **kwargs,
+        )
+
+    def test_counters_follow_saves_deletes_and_undo(self):
+        stats_service.get_stats(self.author)
+        stats_service.get_stats(self.fan)
+        post = self._post()
+        like = Like.objects.create(user=self.fan, post=post)
+        Comment.objects.create(post=post, author=self.fan, text='Super')
+        post.status = KaizenPost.Status.IMPLEMENTED
+        post.save()
+
+        author = self._stats(self.author)
+        self.assertEqual((author.posts_count, author.implemented_count, author.likes_received), (1, 1, 1))
+        self.assertEqual(self._stats(self.fan).comments_count, 1)
+
+        like.delete()
+        post.status = KaizenPost.Status.IN_PROGRESS
+        post.save()
+        author = self._stats(self.author)
+        self.assertEqual((author.implemented_count, author.likes_received), (0, 0))
+
+        post.delete()
+        self.assertEqual(self._stats(self.author).posts_count, 0)
+        self.assertEqual(self._stats(self.fan).comments_count, 0)
+        self.assertEqual(stats_service.reconcile(dry_run=True), [])
+
+    def test_review_counted_once_per_decision(self):
+        stats_service.get_stats(self.fan)
+        stage = PostApproval.objects.create(
+            post=self._post(), stage=PostApproval.Stage.MANAGER, order=1, approver=self.fan,
+        )
+        self.assertEqual(self._stats(self.fan).reviews_count, 0)
+        for decision in (PostApproval.Decision.APPROVED, PostApproval.Decision.REJECTED):
+            stage.decision = decision
+            stage.save()
+            self.assertEqual(self._stats(self.fan).reviews_count, 1)
+        stage.decision = PostApproval.Decision.PENDING
+        stage.save()
+        self.assertEqual(self._stats(self.fan).reviews_count, 0)
+
+    def test_missing_row_is_computed_on_first_read(self):
+        KaizenPost.objects.bulk_create([
+            KaizenPost(author=self.author, category=self.category, title='T', content='C')
+        ])
+        self.assertFalse(UserStats.objects.filter(user=self.author).exists())
+        self.assertEqual(stats_service.get_stats(self.author).posts_count, 1)
+        with self.assertNumQueries(0):
+            stats_service.get_stats(self.author)
+
+    def test_reconcile_command_fixes_drift(self):
+        stats_service.get_stats(self.author)
+        KaizenPost.objects.bulk_create([
+            KaizenPost(author=self.author, category=self.category, title='T', content='C')
+        ])
+        out = StringIO()
+        call_command('reconcile_user_stats', stdout=out)
+        self.assertIn(f'user {self.author.pk}: posts_count 0 -> 1', out.getvalue())
+        self.assertEqual(self._stats(self.author).posts_count, 1)
+
+
+class ConfigCacheTests(TestCase):
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.start = Level.objects.create(name='Start', min_points=0, order=1)
+            self.silver = Level.objects.create(name='Srebro', min_points=100, order=2)
+            self.gold = Level.objects.create(name='Złoto', min_points=500, order=3)
+        # Zatwierdzona w teście migawka nie może przeżyć wycofania transakcji testu.
+        self.addCleanup(config_service.invalidate)
+
+    def test_levels_served_from_process_memory(self):
+        self.assertEqual(levels_service.level_for_points(100), self.silver)
+        with self.assertNumQueries(0):
+            self.assertEqual(levels_service.level_for_points(99), self.start)
+            self.assertEqual(levels_service.level_for_points(10_000), self.gold)
+            self.assertEqual(levels_service.next_level_after(100), self.gold)
+            self.assertIsNone(levels_service.next_level_after(500))
+            self.assertEqual(levels_service.level_progress(300)['progress'], 0.5)
+
+    def test_committed_admin_save_refreshes_snapshot(self):
+        levels_service.level_for_points(0)
+        self.silver.min_points = 50
+        with self.captureOnCommitCallbacks(execute=True):
+            self.silver.save()
+        self.assertEqual(levels_service.level_for_points(60), self.silver)
+
+    def test_uncommitted_change_is_read_from_database(self):
+        levels_service.level_for_points(0)
+        PointRule.objects.create(action=Action.COMMENT_MADE, points=5)
+        self.assertEqual(config_service.rule_for(Action.COMMENT_MADE).points, 5)
+        self.assertIsNot(config_service.get(), config_service.get())
+
+    @override_settings(GAMIFICATION_CONFIG_CHECK_SECONDS=0)
+    def test_version_bump_from_other_process_is_picked_up(self):
+        levels_service.level_for_points(0)
+        Level.objects.filter(pk=self.silver.pk).update(min_points=50)  # bez sygnału
+        self.assertEqual(levels_service.level_for_points(60), self.start)
+
+        cache.incr(config_service.VERSION_KEY)
+        self.assertEqual(levels_service.level_for_points(60).pk, self.silver.pk)
+
+
+class MeGamificationViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='ja', password='x', nickname='Ja')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.level = Level.objects.create(name='Start', min_points=0, order=1)
+        self.addCleanup(config_service.invalidate)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('gamification-me')
+
+    def test_304_before_rank_and_badge_queries(self):
+        etag = self.client.get(self.url)['ETag']
+        # Tylko profil z odznakami (UserStats siedzi w cache relacji tego samego
+        # obiektu użytkownika) — bez postępu odznak i przebudowy rankingu.
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_follows_config_version(self):
+        etag = self.client.get(self.url)['ETag']
+        self.level.name = 'Początek'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.level.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['level']['name'], 'Początek')
+
+
+class AwardManyTests(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='x', nickname='Alice')
+        self.bob = User.objects.create_user(username='bob', password='x', nickname='Bob')
+        PointRule.objects.create(action=Action.COMMENT_MADE, points=5, daily_cap=2)
+        PointRule.objects.create(action=Action.IDEA_CREATED, points=10)
+
+    def test_bulk_award_applies_caps_dedupe_and_syncs_profiles(self):
+        engine.award(self.alice, Action.IDEA_CREATED, dedupe_key='idea:1')
+        awards = [
+            {'user_id': self.alice.pk, 'action': Action.IDEA_CREATED, 'dedupe_key': 'idea:1'},  # już w bazie
+            {'user_id': self.alice.pk, 'action': Action.IDEA_CREATED, 'dedupe_key': 'idea:2'},
+            {'user_id': self.alice.pk, 'action': Action.IDEA_CREATED, 'dedupe_key': 'idea:2'},  # duplikat wejścia
+            *({'user_id': self.alice.pk, 'action': Action.COMMENT_MADE, 'dedupe_key': f'c:{i}'} for i in range(4)),
+            {'user_id': self.bob.pk, 'action': Action.COMMENT_MADE, 'dedupe_key': 'c:9'},
+            {'user_id': self.bob.pk, 'action': Action.REVIEW_COMPLETED},  # brak reguły
+            {'user_id': self.bob.pk, 'action': Action.REVIEW_COMPLETED, 'points_override': 7},
+        ]
+        self.assertEqual(engine.award_many(awards, batch_size=3), 5)
+
+        self.assertEqual(PointTransaction.objects.filter(user=self.alice).count(), 4)
+        self.assertEqual(UserGamificationProfile.objects.get(user=self.alice).total_points, 30)
+        bob = UserGamificationProfile.objects.get(user=self.bob)
+        # Backfill nie jest aktywnością z dzisiaj — passa bez zmian.
+        self.assertEqual((bob.total_points, bob.current_streak, bob.last_activity_date), (12, 0, None))
+        self.assertEqual(engine.profile_drift(), [])
+
+    def test_concurrent_duplicate_is_not_counted(self):
+        def concurrent_award(execute, sql, params, many, context):
+            # Równoległe naliczenie zapisuje ten sam klucz tuż przed naszym INSERT-em.
+            if sql.startswith('INSERT') and 'gamification_pointtransaction' in sql and not fired:
+                fired.append(True)
+                PointTransaction.objects.create(
+                    user=self.alice, action=Action.COMMENT_MADE, points=5, dedupe_key='c:1',
+                )
+            return execute(sql, params, many, context)
+
+        fired = []
+        awards = [
+            {'user_id': self.alice.pk, 'action': Action.COMMENT_MADE, 'dedupe_key': f'c:{i}'}
+            for i in range(2)
+        ]
+        with connection.execute_wrapper(concurrent_award):
+            self.assertEqual(engine.award_many(awards, sync_profiles=False), 1)
+
+        counter = DailyActionCounter.objects.get(user=self.alice, action=Action.COMMENT_MADE)
+        self.assertEqual(counter.count, 1)
+        self.assertEqual(PointTransaction.objects.filter(user=self.alice).count(), 2)
+        # Równoległe naliczenie dolicza swój wiersz samo — kubełek zgadza się z ledgerem.
+        self.assertEqual(UserDailyPoints.objects.get(user=self.alice).points, 10)
+
+    def test_recompute_all_profiles_in_chunks(self):
+        engine.award(self.alice, Action.IDEA_CREATED, dedupe_key='idea:1')
+        PointTransaction.objects.create(user=self.alice, action=Action.IDEA_CREATED, points=3)
+        PointTransaction.objects.create(user=self.bob, action=Action.IDEA_CREATED, points=4)
+
+        out = StringIO()
+        call_command('recompute_all_profiles', '--chunk-size', '1', stdout=out)
+        self.assertIn('Recomputed 2 profile(s).', out.getvalue())
+        self.assertEqual(engine.profile_drift(), [])
+        self.assertEqual(UserGamificationProfile.objects.get(user=self.bob).longest_streak, 1)
+
+
+class DailyCapTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='lajkowany', password='x', nickname='Lajkowany')
+        PointRule.objects.create(action=Action.LIKE_RECEIVED, points=1, daily_cap=2)
+
+    def test_cap_enforced_by_counter_without_counting_ledger(self):
+        self.assertIsNotNone(engine.award(self.user, Action.LIKE_RECEIVED, dedupe_key='l:1'))
+        # Duplikat nie zużywa miejsca w limicie.
+        self.assertIsNone(engine.award(self.user, Action.LIKE_RECEIVED, dedupe_key='l:1'))
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertIsNotNone(engine.award(self.user, Action.LIKE_RECEIVED, dedupe_key='l:2'))
+        self.assertFalse(any('COUNT(' in q['sql'] for q in ctx.captured_queries))
+        self.assertIsNone(engine.award(self.user, Action.LIKE_RECEIVED, dedupe_key='l:3'))
+
+        counter = DailyActionCounter.objects.get(user=self.user, action=Action.LIKE_RECEIVED)
+        self.assertEqual((counter.day, counter.count), (caps.today(), 2))
+        self.assertEqual(PointTransaction.objects.filter(user=self.user).count(), 2)
+
+    def test_new_day_starts_new_counter(self):
+        yesterday = caps.today() - timedelta(days=1)
+        self.assertTrue(caps.claim(self.user.pk, Action.LIKE_RECEIVED, 1, day=yesterday))
+        self.assertFalse(caps.claim(self.user.pk, Action.LIKE_RECEIVED, 1, day=yesterday))
+        self.assertTrue(caps.claim(self.user.pk, Action.LIKE_RECEIVED, 1))
+
+    def test_bulk_award_shares_counters(self):
+        engine.award(self.user, Action.LIKE_RECEIVED, dedupe_key='l:1')
+        awards = [{'user_id': self.user.pk, 'action': Action.LIKE_RECEIVED, 'dedupe_key': f'b:{i}'} for i in range(3)]
+        self.assertEqual(engine.award_many(awards), 1)
+        self.assertEqual(caps.usage([self.user.pk], [Action.LIKE_RECEIVED]), {(self.user.pk, Action.LIKE_RECEIVED): 2})
+
+
+class PeriodLeaderboardTests(TestCase):
+
+    def setUp(self):
+        self.it = Department.objects.create(name='IT')
+        self.users = [
+            User.objects.create_user(username=f'u{i}', password='x', nickname=f'U{i}', department=self.it if i else None)
+            for i in range(3)
+        ]
+        now = timezone.now()
+        # Transakcje co ~17 h wstecz: okna tygodnia i miesiąca zaczynają się w środku dnia.
+        for i in range(60):
+            txn = PointTransaction.objects.create(
+                user=self.users[i % 3], action=Action.COMMENT_MADE, points=(i % 7) - 1,
+            )
+            PointTransaction.objects.filter(pk=txn.pk).update(created_at=now - timedelta(hours=17 * i))
+        daily_points.rebuild()
+
+    def _live_users(self, period):
+        rows = (
+            PointTransaction.objects.filter(created_at__gte=leaderboard._period_start(period))
+            .values('user').annotate(points=Sum('points'))
+        )
+        return {row['user']: row['points'] for row in rows}
+
+    def test_windows_match_live_ledger(self):
+        for period in (leaderboard.PERIOD_WEEK, leaderboard.PERIOD_MONTH):
+            with self.subTest(period=period):
+                rows = leaderboard.top_users(period, limit=10)
+                self.assertEqual({r['user'].pk: r['points'] for r in rows}, self._live_users(period))
+                points = [r['points'] for r in rows]
+                self.assertEqual(points, sorted(points, reverse=True))
+
+                live_it = sum(p for uid, p in self._live_users(period).items() if uid != self.users[0].pk)
+                self.assertEqual(
+                    leaderboard.top_departments(period),
+                    [{'department_id': self.it.pk, 'department': 'IT', 'points': live_it}],
+                )
+
+    def test_window_top_limits_in_one_query(self):
+        for period in (leaderboard.PERIOD_WEEK, leaderboard.PERIOD_MONTH):
+            with self.subTest(period=period):
+                live = sorted(self._live_users(period).items(), key=lambda kv: (-kv[1], kv[0]))[:2]
+                with CaptureQueriesContext(connection) as ctx:
+                    rows = daily_points.window_top(leaderboard._period_start(period), ('user',), 2)
+                self.assertEqual(len(ctx.captured_queries), 1)
+                self.assertEqual([(user_id, points) for (user_id,), points in rows], live)
+
+    def test_buckets_follow_new_and_deleted_transactions(self):
+        user = self.users[1]
+        before = leaderboard.top_users(leaderboard.PERIOD_WEEK)
+        txn = PointTransaction.objects.create(user=user, action=Action.COMMENT_MADE, points=50)
+        after = {r['user'].pk: r['points'] for r in leaderboard.top_users(leaderboard.PERIOD_WEEK)}
+        self.assertEqual(after[user.pk], {r['user'].pk: r['points'] for r in before}.get(user.pk, 0) + 50)
+
+        txn.delete()
+        self.assertEqual(
+            {r['user'].pk: r['points'] for r in leaderboard.top_users(leaderboard.PERIOD_WEEK)},
+            self._live_users(leaderboard.PERIOD_WEEK),
+        )
+
+    def test_rebuild_command(self):
+        UserDailyPoints.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_daily_points', stdout=out)
+        self.assertIn('daily bucket(s) (all days)', out.getvalue())
+        self.assertEqual(
+            {r['user'].pk: r['points'] for r in leaderboard.top_users(leaderboard.PERIOD_MONTH)},
+            self._live_users(leaderboard.PERIOD_MONTH),
+        )
+
+
+class RankIndexTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.users = []
+        for i, points in enumerate((50, 30, 30, 10, 0)):
+            user = User.objects.create_user(username=f'r{i}', password='x', nickname=f'R{i}')
+            UserGamificationProfile.objects.create(user=user, total_points=points)
+            self.users.append(user)
+
+    def _legacy_rank(self, user):
+        points = UserGamificationProfile.objects.get(user=user).total_points
+        return UserGamificationProfile.objects.filter(total_points__gt=points).count() + 1
+
+    def test_rank_matches_count_and_uses_live_own_points(self):
+        self.assertEqual(
+            [leaderboard.user_rank(u) for u in self.users],
+            [self._legacy_rank(u) for u in self.users],
+        )
+        self.assertEqual([leaderboard.user_rank(u) for u in self.users], [1, 2, 2, 4, 5])
+
+        # Indeks jest już w cache — własny wynik i tak jest bieżący.
+        UserGamificationProfile.objects.filter(user=self.users[3]).update(total_points=40)
+        UserGamificationProfile.objects.filter(user=self.users[0]).update(total_points=5)
+        with self.assertNumQueries(1):
+            self.assertEqual(leaderboard.user_rank(self.users[3]), 2)
+        self.assertEqual(leaderboard.user_rank(self.users[0]), 4)  # 40, 30, 30 wyżej
+        self.assertIsNone(leaderboard.user_rank(User.objects.create_user(username='nowy', password='x', nickname='N')))
+
+    def test_period_rank_and_neighbours(self):
+        for user, points in zip(self.users, (5, 20, 15, 10, 0)):
+            PointTransaction.objects.create(user=user, action=Action.COMMENT_MADE, points=points)
+        self.assertEqual(leaderboard.user_rank(self.users[1], leaderboard.PERIOD_WEEK), 1)
+
+        client = APIClient()
+        client.force_authenticate(self.users[3])
+        res = client.get(reverse('gamification-leaderboard-around-me'), {'period': 'week', 'radius': 1})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            [(row['rank'], row['user']['id'], row['points'], row['is_me']) for row in res.data],
+            [(2, self.users[2].pk, 15, False), (3, self.users[3].pk, 10, True), (4, self.users[0].pk, 5, False)],
+        )
+
+    def test_neighbour_ranks_follow_live_own_points(self):
+        index = ranks.RankIndex({1: 50, 2: 30, 3: 20})
+        rows = [
+            (user_id, points, index.rank(user_id, points, mover=(3, 40)))
+            for user_id, points in index.around(3, 40, 1)
+        ]
+        self.assertEqual(rows, [(1, 50, 1), (3, 40, 2), (2, 30, 3)])
+
+        # Spadek pod sąsiada: on awansuje o jedno miejsce.
+        index = ranks.RankIndex({1: 50, 2: 30, 3: 40})
+        self.assertEqual(
+            [index.rank(user_id, points, mover=(3, 20)) for user_id, points in index.around(3, 20, 1)],
+            [2, 3],
+        )
+
+    def test_index_kept_in_process_until_version_changes(self):
+        index = ranks.get_index()
+        with self.assertNumQueries(0):
+            self.assertIs(ranks.get_index(), index)
+
+        # Inny proces odbudowuje indeks — do tego czasu poprzednia kopia, bez zapytań.
+        ranks.invalidate()
+        self.assertTrue(cache.add(f'{ranks.KEY_PREFIX}:{ranks.PERIOD_ALL}:lock', 1))
+        with self.assertNumQueries(0):
+            self.assertIs(ranks.get_index(), index)
+        cache.delete(f'{ranks.KEY_PREFIX}:{ranks.PERIOD_ALL}:lock')
+
+        self.assertIsNot(ranks.get_index(), index)
+
+
+class CategoryLeaderboardTests(TestCase):
+
+    def setUp(self):
+        author = User.objects.create_user(username='autor', password='x', nickname='Autor')
+        categories = [Category.objects.create(name=name) for name in ('Proces', 'BHP', 'Jakość', 'Puste')]
+        posts = KaizenPost.objects.bulk_create([
+            KaizenPost(author=author, category=categories[i % 3], title=f'P{i}', content='C')
+            for i in range(9)
+        ])
+        for i in range(40):
+            PointTransaction.objects.create(
+                user=author, action=Action.LIKE_RECEIVED, points=(i * 7) % 11, source=posts[i % 9],
+            )
+        PointTransaction.objects.create(user=author, action=Action.COMMENT_MADE, points=100)  # bez posta
+        PointTransaction.objects.create(user=author, action=Action.LIKE_RECEIVED, points=100, source=posts[0])
+        KaizenPost.objects.filter(pk=posts[0].pk).delete()  # transakcje zostają, kategorii już nie ma
+
+    def _legacy(self, limit):
+        post_ct = ContentType.objects.get_for_model(KaizenPost)
+        rows = PointTransaction.objects.filter(content_type=post_ct).values('object_id', 'points')
+        post_cat = dict(KaizenPost.objects.values_list('id', 'category__name'))
+        totals = {}
+        for r in rows:
+            cat = post_cat.get(r['object_id'])
+            if cat:
+                totals[cat] = totals.get(cat, 0) + r['points']
+        ranked = sorted(totals.items(), key=lambda kv: (-kv[1], kv[0]))[:limit]
+        return [{'category': name, 'points': pts} for name, pts in ranked]
+
+    def test_matches_python_aggregation_in_one_query(self):
+        for limit in (1, 2, 20):
+            with self.subTest(limit=limit):
+                with CaptureQueriesContext(connection) as ctx:
+                    rows = leaderboard.top_categories(leaderboard.PERIOD_ALL, limit)
+                self.assertEqual(rows, self._legacy(limit))
+                self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(
+            leaderboard.top_categories(leaderboard.PERIOD_WEEK), self._legacy(20),
+        )
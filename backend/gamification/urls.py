@@ -2,6 +2,7 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from .views import (
+    LeaderboardAroundMeView,
     LeaderboardView,
     MeGamificationView,
     MyTransactionsView,
@@ -14,6 +15,7 @@ router.register(r'rewards', RewardViewSet, basename='reward')
 urlpatterns = [
     path('me/', MeGamificationView.as_view(), name='gamification-me'),
     path('leaderboard/', LeaderboardView.as_view(), name='gamification-leaderboard'),
+    path('leaderboard/around-me/', LeaderboardAroundMeView.as_view(), name='gamification-leaderboard-around-me'),
     path('transactions/', MyTransactionsView.as_view(), name='gamification-transactions'),
     path('', include(router.urls)),
 ]
@@ -1,13 +1,19 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import Reward, RewardRedemption
+from app.conditional import conditional, make_etag
+
+from .models import Reward, RewardRedemption, UserBadge, UserGamificationProfile
 from .serializers import (
     LeaderboardCategorySerializer,
     LeaderboardDepartmentSerializer,
+    LeaderboardNeighbourSerializer,
     LeaderboardUserSerializer,
     MeGamificationSerializer,
     PointTransactionSerializer,
@@ -15,31 +21,67 @@ from .serializers import (
     RewardSerializer,
 )
 from .services import badges as badges_service
+from .services import config as config_service
 from .services import leaderboard as lb
 from .services import levels as levels_service
+from .services import ranks
+from .services import stats as stats_service
 from .services.engine import get_or_create_profile
 from .services.rewards import RewardError, redeem
 
 
+def _profile_with_badges(user):
+    """Profil z liczbą i datą ostatniej odznaki — jedno zapytanie dla walidatora."""
+    badges = UserBadge.objects.filter(user=OuterRef('user')).order_by().values('user')
+    profile = (
+        UserGamificationProfile.objects.filter(user=user)
+        .annotate(
+            badge_count=Coalesce(Subquery(badges.annotate(n=Count('id')).values('n')), Value(0)),
+            last_badge=Subquery(badges.annotate(last=Max('awarded_at')).values('last')),
+        )
+        .first()
+    )
+    if profile is None:
+        profile = get_or_create_profile(user)
+        aggregate = UserBadge.objects.filter(user=user).aggregate(count=Count('id'), last=Max('awarded_at'))
+        profile.badge_count, profile.last_badge = aggregate['count'], aggregate['last']
+    return profile
+
+
 class MeGamificationView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         user = request.user
-        profile = get_or_create_profile(user)
-        progress = levels_service.level_progress(profile.total_points)
-        data = {
-            'points': profile.total_points,
-            'rank': lb.user_rank(user),
-            'current_streak': profile.current_streak,
-            'longest_streak': profile.longest_streak,
-            'level': progress['current'],
-            'next_level': progress['next'],
-            'level_progress': progress['progress'],
-            'points_to_next': progress['to_next'],
-            'badges': badges_service.badge_progress(user, profile),
-        }
-        return Response(MeGamificationSerializer(data, context={'request': request}).data)
+        profile = _profile_with_badges(user)
+        user_stats = stats_service.get_stats(user)
+        # Indeks pozycji jest w pamięci procesu — bisect bez zapytań.
+        rank = ranks.get_index().rank(user.pk, profile.total_points)
+        # Walidator najpierw, z tanich składników: każda akcja punktowana zapisuje
+        # profil (updated_at), a liczniki metryk odznak — UserStats (także przy
+        # cofnięciach bez punktów); ranking zależy też od innych użytkowników,
+        # odznaki od UserBadge, a progi poziomów i odznak od wersji konfiguracji.
+        etag = make_etag(
+            'gamification-me', user.pk, profile.updated_at, user_stats.updated_at,
+            rank, profile.badge_count, profile.last_badge, config_service.current_version(),
+        )
+
+        def build_response():
+            progress = levels_service.level_progress(profile.total_points)
+            data = {
+                'points': profile.total_points,
+                'rank': rank,
+                'current_streak': profile.current_streak,
+                'longest_streak': profile.longest_streak,
+                'level': progress['current'],
+                'next_level': progress['next'],
+                'level_progress': progress['progress'],
+                'points_to_next': progress['to_next'],
+                'badges': badges_service.badge_progress(user, profile),
+            }
+            return Response(MeGamificationSerializer(data, context={'request': request}).data)
+
+        return conditional(request, build_response, etag=etag)
 
 
 class LeaderboardView(APIView):
@@ -66,6 +108,27 @@ class LeaderboardView(APIView):
         )
 
 
+class LeaderboardAroundMeView(APIView):
+    """Pozycje tuż nad i pod zalogowanym użytkownikiem w wybranym okresie."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        period = request.query_params.get('period', lb.PERIOD_ALL)
+        if period not in ranks.PERIODS:
+            period = lb.PERIOD_ALL
+        try:
+            radius = max(0, min(int(request.query_params.get('radius', 5)), 50))
+        except (TypeError, ValueError):
+            radius = 5
+
+        rows = ranks.around(request.user, period, radius)
+        users = get_user_model().objects.select_related('department').in_bulk([r['user_id'] for r in rows])
+        data = [{**row, 'user': users[row['user_id']]} for row in rows if row['user_id'] in users]
+        return Response(
+            LeaderboardNeighbourSerializer(data, many=True, context={'request': request}).data
+        )
+
+
 class RewardViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = RewardSerializer
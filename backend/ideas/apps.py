@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class IdeasConfig(AppConfig):
     name = 'ideas'
     verbose_name = 'System Kaizen'
+
+    def ready(self):
+        # Sygnały utrzymujące dane pochodne postów (indeks wyszukiwania, liczniki).
+        from . import signals  # noqa: F401
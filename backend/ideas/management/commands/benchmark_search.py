@@ -0,0 +1,107 @@
+"""
+Porównanie opóźnień wyszukiwania: dotychczasowe `icontains` vs indeks pełnotekstowy.
+
+Dla każdego rozmiaru z `--sizes` tworzy syntetyczne posty w transakcji,
+indeksuje je, mierzy oba warianty (mediana i p95 z `--repeat` pomiarów)
+i na końcu wycofuje transakcję — baza zostaje nietknięta.
+
+    python manage.py benchmark_search --sizes 10000 100000
+"""
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from ideas.models import Category, KaizenPost
+from ideas.services import search
+
+WORDS = (
+    'maszyna linia pakowanie paleta magazyn bezpieczeństwo oszczędność przezbrojenie '
+    'narzędzie stanowisko jakość kontrola dostawa wózek regał etykieta skaner odpad '
+    'energia sprężarka oświetlenie łożysko smarowanie przegląd procedura szkolenie '
+    'ergonomia hałas kurz transport zamówienie formularz raport harmonogram zmiana'
+).split()
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks post search latency (icontains vs full-text index) on synthetic data.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--query', default='przezbrojenie maszyny')
+
+    def handle(self, *args, **options):
+        if search.get_backend() is None:
+            raise CommandError('Search index is not available for this database.')
+
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    self._run(size, options['repeat'], options['query'])
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+    def _run(self, size, repeat, query):
+        User = get_user_model()
+        author = User.objects.create_user(username='__search_benchmark__', nickname='__search_benchmark__')
+        category = Category.objects.create(name='Benchmark')
+        rng = random.Random(size)
+
+        posts = []
+        for i in range(size):
+            posts.append(KaizenPost(
+                author=author,
+                category=category,
+                title=' '.join(rng.choices(WORDS, k=5)),
+                content=' '.join(rng.choices(WORDS, k=120)),
+                status=KaizenPost.Status.SUBMITTED,
+            ))
+            if len(posts) == 5000:
+                KaizenPost.objects.bulk_create(posts)
+                posts = []
+        KaizenPost.objects.bulk_create(posts)
+        search.rebuild()
+
+        base = KaizenPost.objects.filter(author=author).order_by('-created_at')
+        legacy = self._measure(
+            repeat,
+            lambda: list(base.filter(Q(title__icontains=query) | Q(content__icontains=query))
+                         .values_list('pk', flat=True)[:20]),
+        )
+        indexed = self._measure(
+            repeat,
+            lambda: list(search.filter_queryset(base, query).values_list('pk', flat=True)[:20]),
+        )
+        ranked = self._measure(repeat, lambda: search.ranked_post_ids(query, limit=20))
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{size} posts ({connection.vendor}), query "{query}"'))
+        for label, timings in (('icontains', legacy), ('fts filter', indexed), ('fts ranked', ranked)):
+            self.stdout.write(
+                f'  {label:<12} median {statistics.median(timings):8.2f} ms   '
+                f'p95 {self._p95(timings):8.2f} ms'
+            )
+
+    @staticmethod
+    def _measure(repeat, fn):
+        fn()  # rozgrzanie cache stron
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    @staticmethod
+    def _p95(timings):
+        ordered = sorted(timings)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
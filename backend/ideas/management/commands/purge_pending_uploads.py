@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ideas.models import PendingUpload
+
+
+class Command(BaseCommand):
+    help = 'Deletes uploads that were never attached to a post, together with their files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24,
+                            help='Usuń uploady starsze niż podana liczba godzin.')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        removed = 0
+        for upload in PendingUpload.objects.filter(created_at__lt=cutoff).iterator():
+            upload.file.delete(save=False)
+            upload.delete()
+            removed += 1
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} pending upload(s).'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from ideas.services import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index for posts from scratch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Liczba postów indeksowanych w jednej paczce.')
+
+    def handle(self, *args, **options):
+        if search.get_backend() is None:
+            raise CommandError(
+                'Search index is not available for this database (run migrations first).'
+            )
+        with transaction.atomic():
+            total = search.rebuild(batch_size=options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} posts.'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from ideas.services import counters
+
+
+class Command(BaseCommand):
+    help = 'Recomputes denormalized likes_count / comments_count on posts and fixes any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Tylko raportuj rozjazdy, bez zapisu.')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        drifts = counters.reconcile(dry_run=dry_run)
+        for post_id, field, stored, actual in drifts:
+            self.stdout.write(f'  post {post_id}: {field} {stored} -> {actual}')
+        verb = 'Found' if dry_run else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(drifts)} drifted counter(s).'))
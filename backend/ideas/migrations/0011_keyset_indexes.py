@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 14:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ideas', '0010_seed_approvals_for_existing'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='kaizenpost',
+            index=models.Index(fields=['-created_at', '-id'], name='ideas_post_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', '-created_at', '-id'], name='ideas_notif_recipient_keyset'),
+        ),
+    ]
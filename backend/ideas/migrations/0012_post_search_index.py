@@ -0,0 +1,46 @@
+"""
+Indeks pełnotekstowy postów (patrz `ideas.services.search`).
+
+SQLite: tabela wirtualna FTS5, PostgreSQL: tabela z `tsvector` + GIN.
+Na innych bazach migracja nic nie robi, a wyszukiwanie wraca do `icontains`.
+"""
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    from ideas.services import search
+
+    conn = schema_editor.connection
+    backend = search.backend_for(conn)
+    if backend is None:
+        return
+    backend.install(conn)
+
+    KaizenPost = apps.get_model('ideas', 'KaizenPost')
+    rows = KaizenPost.objects.order_by('pk').values_list('pk', 'title', 'content')
+    batch = []
+    for row in rows.iterator(chunk_size=1000):
+        batch.append(row)
+        if len(batch) >= 1000:
+            backend.index_rows(conn, batch)
+            batch = []
+    backend.index_rows(conn, batch)
+
+
+def drop_index(apps, schema_editor):
+    from ideas.services import search
+
+    backend = search.backend_for(schema_editor.connection)
+    if backend is not None:
+        backend.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ideas', '0011_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
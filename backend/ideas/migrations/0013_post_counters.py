@@ -0,0 +1,51 @@
+# Generated by Django 6.0 on 2026-10-18 12:40
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(post=OuterRef('pk'))
+            .order_by()
+            .values('post')
+            .annotate(n=Count('pk'))
+            .values('n'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def backfill_counters(apps, schema_editor):
+    KaizenPost = apps.get_model('ideas', 'KaizenPost')
+    Like = apps.get_model('ideas', 'Like')
+    Comment = apps.get_model('ideas', 'Comment')
+    KaizenPost.objects.update(likes_count=_count(Like), comments_count=_count(Comment))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ideas', '0012_post_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kaizenpost',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Liczba komentarzy'),
+        ),
+        migrations.AddField(
+            model_name='kaizenpost',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Liczba lajków'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='kaizenpost',
+            index=models.Index(fields=['-likes_count', '-created_at', '-id'], name='ideas_post_likes_idx'),
+        ),
+    ]
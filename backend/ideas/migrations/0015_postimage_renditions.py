@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 13:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ideas', '0014_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postimage',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-18 14:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ideas', '0015_postimage_renditions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='kaizen_attachments/%Y/%m/%d/')),
+                ('format', models.CharField(max_length=10)),
+                ('size', models.PositiveBigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('uploader', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Oczekujący upload',
+                'verbose_name_plural': 'Oczekujące uploady',
+                'indexes': [models.Index(fields=['created_at'], name='ideas_pendi_created_d821c2_idx')],
+            },
+        ),
+    ]
@@ -18,6 +18,12 @@ class KaizenPost(models.Model):
     class Meta:
         verbose_name = "Post"
         verbose_name_plural = "Posty"
+        indexes = [
+            # Paginacja kursorowa feedu: ORDER BY created_at DESC, id DESC.
+            models.Index(fields=['-created_at', '-id'], name='ideas_post_created_id_idx'),
+            # "Najczęściej lajkowane" (ordering=likes) jako skan indeksu.
+            models.Index(fields=['-likes_count', '-created_at', '-id'], name='ideas_post_likes_idx'),
+        ]
 
     class Status(models.TextChoices):
         TO_VERIFY = "TO_VERIFY", "Do weryfikacji"
@@ -88,20 +94,30 @@ class KaizenPost(models.Model):
         default=0,
         verbose_name="Postęp wdrożenia (%)",
     )
+    # Liczniki zdenormalizowane — utrzymywane przez ideas.signals (services.counters).
+    likes_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Liczba lajków")
+    comments_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Liczba komentarzy")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Podbijane też przy zmianach zdjęć / etapów / ankiety i liczników (ideas.signals)
+    # — to źródło walidatora ETag / Last-Modified dla szczegółów posta.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Zmieniane wyłącznie atomowo (`counters.adjust`, F()) — pełny zapis posta
+    # nie może nadpisać ich wartością wczytaną przed równoległym lajkiem/komentarzem.
+    COUNTER_FIELDS = ('likes_count', 'comments_count')
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         # Updated to show title and category in admin lists
         return f"[{self.category.name}] {self.title}"
 
-    @property
-    def likes_count(self):
-        return self.likes.count()
-
-    @property
-    def comments_count(self):
-        return self.comments.count()
-
 
 class PostImage(models.Model):
     """
@@ -129,6 +145,8 @@ class PostImage(models.Model):
         upload_to='kaizen_attachments/%Y/%m/%d/',
         verbose_name="Zdjęcie"
     )
+    # Miniatury WebP/JPEG w stałych szerokościach (users.images), generowane po zapisie.
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -139,6 +157,32 @@ class PostImage(models.Model):
         return f"Zdjęcie do postu: {self.post.title}"
 
 
+class PendingUpload(models.Model):
+    """
+    Zdjęcie wgrane multipartem (`POST /api/uploads/`), jeszcze nie podpięte do posta.
+
+    Po podpięciu plik przechodzi do `PostImage` bez kopiowania, a rekord znika;
+    porzucone uploady sprząta `purge_pending_uploads`.
+    """
+    uploader = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='pending_uploads',
+        on_delete=models.CASCADE,
+    )
+    file = models.FileField(upload_to='kaizen_attachments/%Y/%m/%d/')
+    format = models.CharField(max_length=10)
+    size = models.PositiveBigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Oczekujący upload"
+        verbose_name_plural = "Oczekujące uploady"
+        indexes = [models.Index(fields=['created_at'])]
+
+    def __str__(self):
+        return f"Upload {self.pk} ({self.uploader_id})"
+
+
 class PostSurvey(models.Model):
     class FrequencyUnit(models.TextChoices):
         DAY = "DAY", "Dzień"
@@ -191,6 +235,7 @@ class Comment(models.Model):
     )
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
 
 class Like(models.Model):
@@ -261,6 +306,7 @@ class Notification(models.Model):
         indexes = [
             models.Index(fields=['recipient', 'read_at']),
             models.Index(fields=['recipient', 'created_at']),
+            models.Index(fields=['recipient', '-created_at', '-id'], name='ideas_notif_recipient_keyset'),
         ]
 
     @property
@@ -1,7 +1,190 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.db import models
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class PostPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginacja kursorowa (keyset) po krotce pól sortowania, np. `(created_at, id)`.
+
+    Kursor to zakodowane wartości pól ostatniego elementu strony, a kolejna
+    strona to `WHERE (created_at, id) < (…)` — bez OFFSET i bez COUNT(*),
+    więc strona N kosztuje tyle co pierwsza, a nowe posty nie przesuwają
+    wyników (brak duplikatów przy infinite scrollu).
+
+    Ostatnie pole krotki musi być unikalne (zwykle `id`). Widok może podać
+    własną krotkę przez `get_keyset_ordering()`.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Nieprawidłowy kursor.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(view)
+        self.page_size = self.get_page_size(request)
+
+        position = self.decode_cursor(request, queryset.model)
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(position))
+
+        # Jeden wiersz nadmiarowy mówi, czy istnieje następna strona.
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_ordering(self, view):
+        get_ordering = getattr(view, 'get_keyset_ordering', None)
+        ordering = get_ordering() if get_ordering else None
+        return tuple(ordering or self.ordering)
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size,
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def _after(self, position):
+        """`(a, b, c) > (x, y, z)` w kierunku sortowania, rozpisane na OR-y."""
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def _position_of(self, instance):
+        return [getattr(instance, field.lstrip('-')) for field in self.ordering]
+
+    def encode_cursor(self, position):
+        values = [v.isoformat() if isinstance(v, datetime) else v for v in position]
+        token = urlsafe_b64encode(json.dumps(values).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            values = json.loads(urlsafe_b64decode(token.encode('ascii')))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        position = []
+        for field, value in zip(self.ordering, values):
+            if self._is_datetime(model, field.lstrip('-')):
+                value = parse_datetime(value) if isinstance(value, str) else None
+                if value is None:
+                    raise NotFound(self.invalid_cursor_message)
+            position.append(value)
+        return position
+
+    @staticmethod
+    def _is_datetime(model, name):
+        try:
+            return isinstance(model._meta.get_field(name), models.DateTimeField)
+        except Exception:
+            return False
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self._position_of(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class SelectablePagination(BasePagination):
+    """
+    Wybór paginacji per request: `?pagination=cursor` (albo sam `?cursor=`)
+    włącza paginację kursorową, w przeciwnym razie używana jest `fallback_class`
+    (None = brak paginacji, jak dotychczas).
+
+    Kursor działa tylko dla akcji, dla których widok zwraca krotkę z
+    `get_keyset_ordering()`; pozostałe zostają przy `fallback_class`.
+    """
+    fallback_class = None
+    keyset_class = KeysetPagination
+    mode_query_param = 'pagination'
+
+    def _wants_keyset(self, request, view):
+        params = request.query_params
+        if params.get(self.mode_query_param) != 'cursor' and self.keyset_class.cursor_query_param not in params:
+            return False
+        get_ordering = getattr(view, 'get_keyset_ordering', None)
+        return get_ordering is None or get_ordering() is not None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self._wants_keyset(request, view):
+            self.delegate = self.keyset_class()
+        elif self.fallback_class is not None:
+            self.delegate = self.fallback_class()
+        else:
+            self.delegate = None
+            return None
+        return self.delegate.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.delegate.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        if self.fallback_class is not None:
+            return self.fallback_class().get_paginated_response_schema(schema)
+        return schema
+
+    def get_schema_operation_parameters(self, view):
+        if self.fallback_class is not None:
+            return self.fallback_class().get_schema_operation_parameters(view)
+        return []
+
+
+class PostFeedPagination(SelectablePagination):
+    fallback_class = PostPagination
+
+
+class NotificationPagination(SelectablePagination):
+    fallback_class = None
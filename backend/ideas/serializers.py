@@ -1,8 +1,14 @@
+from django.db import models
 from rest_framework import serializers
-from .models import KaizenPost, Comment, Like, PostImage, PostSurvey, Notification, Category, Bookmark, PostApproval
+from .models import (
+    KaizenPost, Comment, Like, PostImage, PostSurvey, Notification, Category, Bookmark, PostApproval, PendingUpload,
+)
 from django.contrib.auth import get_user_model
 from users.fields import Base64ImageField
+from users.images import srcset
 from users.serializers import UserPublicSerializer
+from .services.feed import viewer_post_flags
+from .services.uploads import attach_uploads
 
 User = get_user_model()
 
@@ -34,8 +40,8 @@ class CommentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Comment
-        fields = ['id', 'post', 'author', 'parent', 'text', 'created_at']
-        read_only_fields = ['id', 'post', 'author', 'created_at']
+        fields = ['id', 'post', 'author', 'parent', 'text', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'post', 'author', 'created_at', 'updated_at']
 
     def validate_parent(self, value):
         if value is None:
@@ -46,6 +52,19 @@ class CommentSerializer(serializers.ModelSerializer):
         return value
 
 
+class PostListSerializer(serializers.ListSerializer):
+    """Dla całej strony ładuje flagi widza jednym zapytaniem i odkłada je w kontekście."""
+
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        request = self.context.get('request')
+        viewer = request.user if request else None
+        self.context.setdefault('viewer_flags', {}).update(
+            viewer_post_flags(viewer, [post.pk for post in posts])
+        )
+        return super().to_representation(posts)
+
+
 class PostSerializer(serializers.ModelSerializer):
     author = UserPublicSerializer(read_only=True)
     category_name = serializers.CharField(source='category.name', read_only=True)
@@ -65,6 +84,12 @@ class PostSerializer(serializers.ModelSerializer):
         write_only=True,
         required=False
     )
+    # Id uploadów z `POST /api/uploads/` do podpięcia jako zdjęcia posta.
+    upload_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        write_only=True,
+        required=False
+    )
     image_urls = serializers.SerializerMethodField(read_only=True)
     assigned_manager = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.filter(role='MANAGER'),
@@ -93,6 +118,7 @@ class PostSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = KaizenPost
+        list_serializer_class = PostListSerializer
         fields = [
             'id',
             'author',
@@ -102,12 +128,14 @@ class PostSerializer(serializers.ModelSerializer):
             'category_name',
             'status',
             'created_at',
+            'updated_at',
             'likes_count',
             'comments_count',
             'is_liked_by_me',
             'is_bookmarked_by_me',
             'images',
             'remove_images',
+            'upload_ids',
             'image_items',
             'image_urls',
             'survey',
@@ -132,20 +160,39 @@ class PostSerializer(serializers.ModelSerializer):
             'deadline',
         ]
 
-    def get_is_liked_by_me(self, obj):
+    def _viewer_flags(self, obj):
+        # Lista wypełnia `viewer_flags` dla całej strony (PostListSerializer);
+        # pojedynczy post (detail, akcje) dociąga swoje flagi jednym zapytaniem.
+        flags = self.context.setdefault('viewer_flags', {})
+        if obj.pk not in flags:
+            request = self.context.get('request')
+            flags.update(viewer_post_flags(request.user if request else None, [obj.pk]))
+        return flags[obj.pk]
+
+    def validate_upload_ids(self, value):
         request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.likes.filter(user=request.user).exists()
-        return False
+        user = request.user if request else None
+        owned = set(
+            PendingUpload.objects.filter(pk__in=value, uploader=user).values_list('pk', flat=True)
+        ) if user and user.is_authenticated else set()
+        missing = set(value) - owned
+        if missing:
+            raise serializers.ValidationError(f'Nieznane uploady: {sorted(missing)}.')
+        return value
+
+    def get_is_liked_by_me(self, obj):
+        return self._viewer_flags(obj)['liked']
 
     def get_is_bookmarked_by_me(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.bookmarks.filter(user=request.user).exists()
-        return False
+        return self._viewer_flags(obj)['bookmarked']
 
     def get_current_stage(self, obj):
-        pending = obj.approvals.filter(decision=PostApproval.Decision.PENDING).order_by('order').first()
+        # Iteracja po `all()` korzysta z prefetchu trybu feed (bez dodatkowego zapytania).
+        pending = min(
+            (a for a in obj.approvals.all() if a.decision == PostApproval.Decision.PENDING),
+            key=lambda a: a.order,
+            default=None,
+        )
         if not pending:
             return None
         return PostApprovalSerializer(pending).data
@@ -171,7 +218,11 @@ class PostSerializer(serializers.ModelSerializer):
             url = image.image.url
             if request:
                 url = request.build_absolute_uri(url)
-            items.append({'id': image.id, 'url': url})
+            items.append({
+                'id': image.id,
+                'url': url,
+                'srcset': srcset(image.renditions, image.image.storage, request),
+            })
         return items
 
     def get_survey(self, obj):
@@ -182,23 +233,44 @@ class PostSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         images = validated_data.pop('images', [])
+        upload_ids = validated_data.pop('upload_ids', [])
         validated_data.pop('remove_images', None)
         post = super().create(validated_data)
         for image in images:
             PostImage.objects.create(post=post, image=image)
+        if upload_ids:
+            attach_uploads(post, post.author, upload_ids)
         return post
 
     def update(self, instance, validated_data):
         images = validated_data.pop('images', None)
         remove_images = validated_data.pop('remove_images', [])
+        upload_ids = validated_data.pop('upload_ids', [])
         post = super().update(instance, validated_data)
         if remove_images:
             PostImage.objects.filter(post=post, id__in=remove_images).delete()
         if images:
             for image in images:
                 PostImage.objects.create(post=post, image=image)
+        if upload_ids:
+            attach_uploads(post, post.author, upload_ids)
         return post
 
+
+class PendingUploadSerializer(serializers.ModelSerializer):
+    url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PendingUpload
+        fields = ['id', 'url', 'format', 'size', 'created_at']
+        read_only_fields = fields
+
+    def get_url(self, obj):
+        request = self.context.get('request')
+        url = obj.file.url
+        return request.build_absolute_uri(url) if request else url
+
+
 class LikeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Like
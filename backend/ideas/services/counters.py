@@ -0,0 +1,69 @@
+"""
+Zdenormalizowane liczniki `KaizenPost.likes_count` / `comments_count`.
+
+Liczniki zmieniamy atomowo wyrażeniem `F()` w sygnałach `Like` / `Comment`
+(`ideas.signals`), więc równoległe lajki nie gubią aktualizacji. Ścieżki
+omijające sygnały (`bulk_create`, surowy SQL) wyrównuje `reconcile`,
+wywoływane komendą `manage.py reconcile_post_counters`.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Now
+
+from ..models import Comment, KaizenPost, Like
+from . import feed_cache
+
+COUNTERS = {
+    'likes_count': Like,
+    'comments_count': Comment,
+}
+
+
+def adjust(post_id, field, delta):
+    """Atomowo zmienia licznik o `delta` (nigdy poniżej zera) i podbija `updated_at`."""
+    qs = KaizenPost.objects.filter(pk=post_id)
+    if delta < 0:
+        qs = qs.filter(**{f'{field}__gte': -delta})
+    qs.update(**{field: F(field) + delta}, updated_at=Now())
+
+
+def _actual(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(post=OuterRef('pk'))
+            .order_by()
+            .values('post')
+            .annotate(n=Count('pk'))
+            .values('n'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def reconcile(dry_run=False, post_ids=None):
+    """Porównuje liczniki z rzeczywistymi wierszami i naprawia rozjazdy.
+
+    Zwraca listę `(post_id, pole, zapisane, rzeczywiste)` dla rozjechanych liczników.
+    """
+    qs = KaizenPost.objects.all()
+    if post_ids is not None:
+        qs = qs.filter(pk__in=post_ids)
+    qs = qs.annotate(**{f'_actual_{field}': _actual(model) for field, model in COUNTERS.items()})
+    drift_filter = Q()
+    for field in COUNTERS:
+        drift_filter |= ~Q(**{field: F(f'_actual_{field}')})
+
+    drifts = []
+    values = ['pk', *COUNTERS, *(f'_actual_{field}' for field in COUNTERS)]
+    for row in qs.filter(drift_filter).values(*values).iterator(chunk_size=1000):
+        fixes = {}
+        for field in COUNTERS:
+            stored, actual = row[field], row[f'_actual_{field}']
+            if stored != actual:
+                drifts.append((row['pk'], field, stored, actual))
+                fixes[field] = actual
+        if fixes and not dry_run:
+            KaizenPost.objects.filter(pk=row['pk']).update(**fixes, updated_at=Now())
+    if drifts and not dry_run:
+        feed_cache.invalidate()
+    return drifts
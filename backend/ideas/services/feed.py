@@ -0,0 +1,55 @@
+"""
+Tryb "feed" dla zapytań o posty.
+
+`PostSerializer` potrzebuje dla każdego posta autora, kategorii, ankiety,
+przypisanych osób, zdjęć i etapów akceptacji (liczniki lajków i komentarzy
+są kolumnami posta). `with_feed_data` dokleja to wszystko do querysetu tak,
+żeby strona postów kosztowała stałą liczbę zapytań niezależnie od jej rozmiaru.
+
+Flagi widza (`is_liked_by_me` / `is_bookmarked_by_me`) nie zależą od posta,
+tylko od pary (widz, post), więc liczy je osobno `viewer_post_flags` — jednym
+zapytaniem dla całej strony, niezależnie od tego, skąd pochodzą posty.
+"""
+from django.db.models import Prefetch, Value
+
+from ..models import Bookmark, Like, PostApproval, PostImage
+
+
+def with_feed_data(qs):
+    """Zwraca queryset postów z select_related / prefetch dla serializera."""
+    qs = qs.select_related(
+        'author',
+        'category',
+        'survey',
+        'assigned_manager',
+        'assigned_team_lead',
+        'assigned_director',
+    ).prefetch_related(
+        Prefetch('images', queryset=PostImage.objects.order_by('id')),
+        Prefetch(
+            'approvals',
+            queryset=PostApproval.objects.select_related('approver').order_by('order'),
+        ),
+    )
+    return qs
+
+
+def viewer_post_flags(viewer, post_ids):
+    """`{post_id: {'liked': bool, 'bookmarked': bool}}` dla podanych postów.
+
+    Lajki i zakładki widza pobieramy jednym `UNION ALL`; anonim dostaje same False.
+    """
+    post_ids = list(post_ids)
+    flags = {pk: {'liked': False, 'bookmarked': False} for pk in post_ids}
+    if not post_ids or viewer is None or not viewer.is_authenticated:
+        return flags
+
+    liked = Like.objects.filter(user=viewer, post_id__in=post_ids).order_by().values_list(
+        'post_id', Value('liked')
+    )
+    bookmarked = Bookmark.objects.filter(user=viewer, post_id__in=post_ids).order_by().values_list(
+        'post_id', Value('bookmarked')
+    )
+    for post_id, flag in liked.union(bookmarked, all=True):
+        flags[post_id][flag] = True
+    return flags
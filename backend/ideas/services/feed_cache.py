@@ -0,0 +1,116 @@
+"""
+Cache odpowiedzi publicznego feedu postów (`GET /api/posts/`).
+
+W cache trzymamy tylko część strony niezależną od widza — flagi
+`is_liked_by_me` / `is_bookmarked_by_me` są wycinane przed zapisem
+i doklejane po odczycie (`viewer_post_flags`, jedno zapytanie na stronę).
+
+Unieważnianie jest wersjonowane: klucz strony zawiera numer wersji, a sygnały
+zmian postów, lajków, komentarzy, zdjęć i etapów akceptacji (`ideas.signals`)
+podbijają wersję. Stare wpisy nie są kasowane, tylko przestają być trafiane
+i wygasają po `FEED_CACHE_TIMEOUT`. Zmiany spoza sygnałów (np. nick autora)
+są widoczne najpóźniej po TTL.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .feed import viewer_post_flags
+
+VERSION_KEY = 'ideas:feed:version'
+KEY_PREFIX = 'ideas:feed:page'
+
+# Parametry, od których zależy treść strony; pozostałe są ignorowane przy budowie klucza.
+CACHED_PARAMS = (
+    'author',
+    'category',
+    'cursor',
+    'ordering',
+    'page',
+    'page_size',
+    'pagination',
+    'search',
+    'status',
+)
+# `mine` zależy od widza — takie strony idą zawsze do bazy.
+UNCACHED_PARAMS = ('mine',)
+VIEWER_FIELDS = ('is_liked_by_me', 'is_bookmarked_by_me')
+
+
+def timeout():
+    return getattr(settings, 'FEED_CACHE_TIMEOUT', 0)
+
+
+def is_cacheable(request):
+    if request.method != 'GET' or timeout() <= 0:
+        return False
+    return not any(request.query_params.get(name) for name in UNCACHED_PARAMS)
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Start od znacznika czasu, a nie od 1: po wyrzuceniu klucza z cache
+        # nie wrócimy do wersji, pod którą mogą jeszcze leżeć stare strony.
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate():
+    """Podbija wersję — wszystkie zapisane strony feedu przestają być aktualne."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+
+
+def cache_key(request):
+    params = request.query_params
+    normalized = sorted(
+        (name, params.get(name).strip())
+        for name in CACHED_PARAMS
+        if params.get(name, '').strip()
+    )
+    # Linki `next`/`previous` są absolutne, więc host i schemat też wchodzą w klucz.
+    payload = json.dumps([request.scheme, request.get_host(), normalized])
+    digest = hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}:{current_version()}:{digest}'
+
+
+def _results(data):
+    return data['results'] if isinstance(data, dict) else data
+
+
+def _strip_viewer(data):
+    items = [
+        {key: value for key, value in item.items() if key not in VIEWER_FIELDS}
+        for item in _results(data)
+    ]
+    if isinstance(data, dict):
+        return {**data, 'results': items}
+    return items
+
+
+def get(request, key):
+    """Strona z cache z flagami bieżącego widza albo None."""
+    data = cache.get(key)
+    if data is None:
+        return None
+    flags = viewer_post_flags(request.user, [item['id'] for item in _results(data)])
+    for item in _results(data):
+        item['is_liked_by_me'] = flags[item['id']]['liked']
+        item['is_bookmarked_by_me'] = flags[item['id']]['bookmarked']
+    return data
+
+
+def store(key, data):
+    """Zapisuje stronę pod kluczem wyliczonym PRZED odczytem z bazy.
+
+    Klucz liczony po odczycie mógłby zawierać wersję podbitą przez zapis
+    zatwierdzony w międzyczasie — nieaktualna strona trafiłaby pod nową wersję.
+    """
+    cache.set(key, _strip_viewer(data), timeout())
@@ -0,0 +1,63 @@
+"""
+Tworzenie powiadomień (w tym o @wzmiankach w komentarzach).
+
+Pojedyncze powiadomienie to jeden INSERT i zostaje w requeście; rozsyłka
+wzmianek (zapytanie o użytkowników + INSERT na każdego) idzie przez kolejkę
+zadań — `notify_mentions_later` / zadanie `ideas.notify_mentions`.
+"""
+import re
+
+from django.contrib.auth import get_user_model
+
+from jobs.services import enqueue
+
+from ..models import Notification
+
+
+def create_notification(notification_type, recipient, actor, post, comment=None):
+    if not recipient or not actor or recipient == actor:
+        return None
+    return Notification.objects.create(
+        type=notification_type,
+        recipient=recipient,
+        actor=actor,
+        post=post,
+        comment=comment,
+    )
+
+
+MENTION_REGEX = re.compile(r'@([A-Za-z0-9_\-]{2,50})')
+
+
+def extract_mentions(text):
+    """Zwraca posortowany set nicków bez duplikatów."""
+    if not text:
+        return []
+    return list({match.group(1) for match in MENTION_REGEX.finditer(text)})
+
+
+def notify_mentions(text, *, actor, post, comment, exclude_user_ids=None):
+    nicks = extract_mentions(text)
+    if not nicks:
+        return
+    User = get_user_model()
+    excluded = set(exclude_user_ids or [])
+    excluded.add(actor.id)
+    mentioned = User.objects.filter(nickname__in=nicks).exclude(id__in=excluded)
+    seen = set()
+    for user in mentioned:
+        if user.id in seen:
+            continue
+        seen.add(user.id)
+        create_notification(Notification.Type.MENTION, user, actor, post, comment)
+
+
+def notify_mentions_later(comment, *, exclude_user_ids=None):
+    """Zleca rozsyłkę wzmianek z komentarza (bez zapytań, gdy tekst nie ma `@`)."""
+    if not extract_mentions(comment.text):
+        return
+    enqueue(
+        'ideas.notify_mentions',
+        {'comment_id': comment.pk, 'exclude_user_ids': sorted(exclude_user_ids or [])},
+        key=f'mentions:comment:{comment.pk}',
+    )
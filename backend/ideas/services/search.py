@@ -0,0 +1,359 @@
+"""
+Wyszukiwanie pełnotekstowe postów.
+
+Indeks żyje poza ORM (tabela zarządzana przez migrację `0012_post_search_index`):
+
+- SQLite: tabela wirtualna FTS5 `ideas_post_fts` (rowid = id posta), ranking bm25,
+- PostgreSQL: tabela `ideas_post_search` z kolumną `tsvector` i indeksem GIN,
+  ranking `ts_rank`.
+
+Polskie znaki: tekst (i zapytanie) normalizujemy w Pythonie — małe litery,
+bez diakrytyków, także `ł → l` (którego Unicode nie rozkłada), więc "łódź"
+znajduje "lodz" i odwrotnie. Słowa zapytania tracą typowe końcówki fleksyjne
+i są dopasowywane prefiksowo ("maszyny" → "maszyn*" znajduje "maszyna",
+"maszynie", "maszynach").
+
+Indeks aktualizują sygnały (`ideas.signals`); zmiany omijające sygnały
+(`bulk_create`, `QuerySet.update`) naprawia `manage.py rebuild_search_index`.
+"""
+import logging
+import re
+import unicodedata
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+from ..models import KaizenPost
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_EXTRA_FOLDS = str.maketrans({'ł': 'l', 'ß': 'ss', 'ø': 'o', 'đ': 'd'})
+
+# Końcówki fleksyjne (już po normalizacji: ów → ow, ą → a), od najdłuższej.
+# Temat po odcięciu musi mieć >= MIN_STEM znaków.
+_POLISH_SUFFIXES = tuple(sorted(
+    {
+        'osci', 'osc', 'ania', 'anie', 'aniu', 'enia', 'enie', 'eniu',
+        'iami', 'iach', 'owie', 'ami', 'ach', 'ych', 'ich', 'ego', 'emu', 'owi', 'iom',
+        'om', 'ow', 'em', 'ie', 'iu', 'ym', 'im', 'ej',
+        'y', 'i', 'a', 'e', 'o', 'u',
+    },
+    key=len,
+    reverse=True,
+))
+MIN_STEM = 3
+MAX_TERMS = 8
+
+
+def normalize_text(text):
+    """Małe litery, bez diakrytyków (ą→a, ł→l, ź→z)."""
+    if not text:
+        return ''
+    text = text.casefold().translate(_EXTRA_FOLDS)
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def stem(token):
+    """Lekki stemmer: odcina najdłuższą pasującą końcówkę fleksyjną."""
+    for suffix in _POLISH_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM:
+            return token[:-len(suffix)]
+    return token
+
+
+def query_terms(query):
+    """Słowa zapytania → lista unikalnych tematów (prefiksów) do dopasowania."""
+    terms = []
+    for token in _WORD_RE.findall(normalize_text(query)):
+        term = stem(token)
+        if len(term) < 2 or term in terms:
+            continue
+        terms.append(term)
+    return terms[:MAX_TERMS]
+
+
+class SqliteFtsBackend:
+    table = 'ideas_post_fts'
+
+    def install(self, conn):
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+                f"USING fts5(title, content, tokenize='unicode61 remove_diacritics 2')"
+            )
+
+    def uninstall(self, conn):
+        with conn.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    def is_installed(self, conn):
+        return self.table in conn.introspection.table_names()
+
+    def index_rows(self, conn, rows):
+        rows = [(pk, normalize_text(title), normalize_text(content)) for pk, title, content in rows]
+        if not rows:
+            return
+        with conn.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(r[0],) for r in rows])
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, title, content) VALUES (%s, %s, %s)', rows
+            )
+
+    def remove(self, conn, post_ids):
+        with conn.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(pk,) for pk in post_ids])
+
+    def clear(self, conn):
+        with conn.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    @staticmethod
+    def is_query_error(error):
+        """Czy błąd wynika ze składni zapytania MATCH (a nie z awarii bazy/indeksu)."""
+        message = str(error).lower()
+        return 'fts5: syntax error' in message or 'malformed match' in message
+
+    @staticmethod
+    def match_expression(terms):
+        return ' AND '.join(f'"{term}"*' for term in terms)
+
+    def match_ids_sql(self, terms):
+        return (
+            f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s',
+            [self.match_expression(terms)],
+        )
+
+    def ranked(self, conn, terms, limit, statuses=None):
+        posts = KaizenPost._meta.db_table
+        sql = (
+            f'SELECT {self.table}.rowid, -bm25({self.table}, 2.0, 1.0) AS score '
+            f'FROM {self.table} JOIN {posts} ON {posts}.id = {self.table}.rowid '
+            f'WHERE {self.table} MATCH %s'
+        )
+        params = [self.match_expression(terms)]
+        if statuses:
+            sql += f' AND {posts}.status IN ({", ".join(["%s"] * len(statuses))})'
+            params.extend(statuses)
+        sql += ' ORDER BY score DESC LIMIT %s'
+        params.append(limit)
+        with conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+
+class PostgresSearchBackend:
+    table = 'ideas_post_search'
+    config = 'simple'  # Bez słownika PL w standardowym PostgreSQL — normalizujemy sami.
+
+    def install(self, conn):
+        posts = KaizenPost._meta.db_table
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {self.table} ('
+                f'post_id bigint PRIMARY KEY REFERENCES {posts}(id) ON DELETE CASCADE, '
+                f'document tsvector NOT NULL)'
+            )
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {self.table}_document_gin '
+                f'ON {self.table} USING GIN (document)'
+            )
+
+    def uninstall(self, conn):
+        with conn.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    def is_installed(self, conn):
+        return self.table in conn.introspection.table_names()
+
+    def index_rows(self, conn, rows):
+        rows = [(pk, normalize_text(title), normalize_text(content)) for pk, title, content in rows]
+        if not rows:
+            return
+        with conn.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {self.table} (post_id, document) VALUES (%s, "
+                f"setweight(to_tsvector('{self.config}', %s), 'A') || "
+                f"setweight(to_tsvector('{self.config}', %s), 'B')) "
+                f"ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+    def remove(self, conn, post_ids):
+        with conn.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE post_id = ANY(%s)', [list(post_ids)])
+
+    def clear(self, conn):
+        with conn.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {self.table}')
+
+    @staticmethod
+    def is_query_error(error):
+        """Czy błąd wynika ze składni `tsquery` (a nie z awarii bazy/indeksu)."""
+        return 'syntax error in tsquery' in str(error).lower()
+
+    @staticmethod
+    def tsquery(terms):
+        return ' & '.join(f"'{term}':*" for term in terms)
+
+    def match_ids_sql(self, terms):
+        return (
+            f"SELECT post_id FROM {self.table} "
+            f"WHERE document @@ to_tsquery('{self.config}', %s)",
+            [self.tsquery(terms)],
+        )
+
+    def ranked(self, conn, terms, limit, statuses=None):
+        posts = KaizenPost._meta.db_table
+        sql = (
+            f"SELECT s.post_id, ts_rank(s.document, q) AS score "
+            f"FROM {self.table} s JOIN {posts} p ON p.id = s.post_id, "
+            f"to_tsquery('{self.config}', %s) q "
+            f"WHERE s.document @@ q"
+        )
+        params = [self.tsquery(terms)]
+        if statuses:
+            sql += ' AND p.status = ANY(%s)'
+            params.append(list(statuses))
+        sql += ' ORDER BY score DESC, s.post_id DESC LIMIT %s'
+        params.append(limit)
+        with conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+
+BACKENDS = {
+    'sqlite': SqliteFtsBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+# Aliasy połączeń, dla których tabela indeksu już istnieje (introspekcja raz na proces).
+_installed_aliases = set()
+
+
+def backend_for(conn):
+    backend_class = BACKENDS.get(conn.vendor)
+    return backend_class() if backend_class else None
+
+
+def get_backend(conn=None):
+    """Backend dla połączenia albo None (brak wsparcia / indeks niezainstalowany)."""
+    conn = conn or connection
+    backend = backend_for(conn)
+    if backend is None:
+        return None
+    if conn.alias not in _installed_aliases:
+        if not backend.is_installed(conn):
+            return None
+        _installed_aliases.add(conn.alias)
+    return backend
+
+
+def index_posts(posts):
+    backend = get_backend()
+    if backend is None:
+        return
+    backend.index_rows(connection, [(p.pk, p.title, p.content) for p in posts])
+
+
+def remove_posts(post_ids):
+    backend = get_backend()
+    if backend is None:
+        return
+    backend.remove(connection, list(post_ids))
+
+
+def rebuild(batch_size=1000, stdout=None):
+    """Buduje indeks od zera. Zwraca liczbę zaindeksowanych postów."""
+    backend = get_backend()
+    if backend is None:
+        return 0
+    backend.clear(connection)
+    total = 0
+    batch = []
+    rows = KaizenPost.objects.order_by('pk').values_list('pk', 'title', 'content')
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            backend.index_rows(connection, batch)
+            total += len(batch)
+            batch = []
+            if stdout is not None:
+                stdout.write(f'  {total} posts indexed')
+    backend.index_rows(connection, batch)
+    return total + len(batch)
+
+
+def filter_queryset(qs, query):
+    """Zawęża queryset postów do pasujących do `query` (fallback: icontains)."""
+    terms = query_terms(query)
+    backend = get_backend()
+    if backend is None or not terms:
+        return qs.filter(Q(title__icontains=query) | Q(content__icontains=query))
+    sql, params = backend.match_ids_sql(terms)
+    return qs.filter(pk__in=RawSQL(sql, params))
+
+
+def ranked_post_ids(query, limit=20, statuses=None):
+    """Lista `(post_id, score)` od najlepszego dopasowania."""
+    terms = query_terms(query)
+    backend = get_backend()
+    if not terms:
+        return []
+    if backend is None:
+        qs = filter_queryset(KaizenPost.objects.all(), query)
+        if statuses:
+            qs = qs.filter(status__in=statuses)
+        return [(pk, 0.0) for pk in qs.order_by('-created_at').values_list('pk', flat=True)[:limit]]
+    try:
+        # Savepoint: w PostgreSQL błąd zapytania psuje całą bieżącą transakcję.
+        with transaction.atomic():
+            rows = backend.ranked(connection, terms, limit, statuses)
+    except DatabaseError as error:
+        if not backend.is_query_error(error):
+            logger.exception('Full-text search failed for query %r', query)
+            raise
+        # Tylko zapytanie, którego silnik nie potrafi sparsować, znaczy "brak wyników".
+        logger.warning('Malformed full-text query %r: %s', query, error)
+        return []
+    return [(pk, float(score)) for pk, score in rows]
+
+
+def highlight(text, terms, max_words=None, tag='mark'):
+    """HTML z zaznaczonymi słowami pasującymi do `terms` (prefiksowo, bez diakrytyków).
+
+    Przy `max_words` zwraca fragment (snippet) wokół pierwszego trafienia.
+    """
+    if not text:
+        return ''
+    words = list(_WORD_RE.finditer(text))
+    hits = [
+        i for i, m in enumerate(words)
+        if any(normalize_text(m.group()).startswith(term) for term in terms)
+    ]
+    start_char, end_char = 0, len(text)
+    if max_words and len(words) > max_words:
+        first = hits[0] if hits else 0
+        lo = max(0, first - max_words // 3)
+        hi = min(len(words), lo + max_words)
+        lo = max(0, hi - max_words)
+        start_char = words[lo].start() if lo > 0 else 0
+        end_char = words[hi - 1].end() if hi < len(words) else len(text)
+
+    hit_set = set(hits)
+    out = ['…' if start_char > 0 else '']
+    cursor = start_char
+    for i, m in enumerate(words):
+        if m.start() < start_char or m.end() > end_char:
+            continue
+        if i in hit_set:
+            out.append(escape(text[cursor:m.start()]))
+            out.append(f'<{tag}>{escape(m.group())}</{tag}>')
+            cursor = m.end()
+    out.append(escape(text[cursor:end_char]))
+    if end_char < len(text):
+        out.append('…')
+    return ''.join(out)
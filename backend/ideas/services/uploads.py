@@ -0,0 +1,81 @@
+"""
+Upload zdjęć multipartem zamiast base64 w JSON-ie.
+
+Pliki trafiają na dysk strumieniowo (`TemporaryFileUploadHandler`), format
+rozpoznajemy po nagłówku, a `FileSystemStorage` przenosi plik tymczasowy
+zamiast go kopiować — zużycie pamięci nie zależy od liczby ani wielkości zdjęć.
+"""
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from users.images import sniff_file
+
+from ..models import PendingUpload, PostImage
+
+ALLOWED_FORMATS = {'jpg', 'png', 'gif', 'webp', 'heic'}
+
+
+def validate_upload(uploaded):
+    """Format pliku rozpoznany po nagłówku; ValidationError dla złego formatu/rozmiaru."""
+    image_format = sniff_file(uploaded)
+    if image_format not in ALLOWED_FORMATS:
+        raise ValidationError({'file': f'Nieobsługiwany format pliku: {uploaded.name}.'})
+    if uploaded.size > settings.MAX_IMAGE_UPLOAD_SIZE:
+        raise ValidationError({'file': f'Plik {uploaded.name} jest za duży.'})
+    return image_format
+
+
+def create_pending(user, uploaded, image_format=None):
+    if image_format is None:
+        image_format = validate_upload(uploaded)
+    # Nazwa z rozszerzeniem zgodnym z zawartością, nie z tym, co przysłał klient.
+    uploaded.name = f'{uuid.uuid4().hex[:12]}.{image_format}'
+    return PendingUpload.objects.create(
+        uploader=user,
+        file=uploaded,
+        format=image_format,
+        size=uploaded.size,
+    )
+
+
+def create_pending_many(user, files):
+    """Waliduje wszystkie pliki, zanim zapisze którykolwiek, i zapisuje je razem.
+
+    Wycofana transakcja nie kasuje plików z dysku — bez wiersza `PendingUpload`
+    nie sprzątnąłby ich `purge_pending_uploads`, więc usuwamy je sami.
+    """
+    formats = [validate_upload(uploaded) for uploaded in files]
+    uploads = []
+    try:
+        with transaction.atomic():
+            for uploaded, image_format in zip(files, formats):
+                uploads.append(create_pending(user, uploaded, image_format))
+    except Exception:
+        for upload in uploads:
+            upload.file.delete(save=False)
+        raise
+    return uploads
+
+
+@transaction.atomic
+def attach_uploads(post, user, upload_ids, image_type=PostImage.Type.GENERAL):
+    """Zamienia uploady użytkownika na `PostImage` posta (bez kopiowania plików)."""
+    upload_ids = set(upload_ids)
+    uploads = list(
+        PendingUpload.objects.select_for_update()
+        .filter(pk__in=upload_ids, uploader=user)
+        .order_by('pk')
+    )
+    missing = upload_ids - {upload.pk for upload in uploads}
+    if missing:
+        raise ValidationError({'upload_ids': f'Nieznane uploady: {sorted(missing)}.'})
+
+    images = [
+        PostImage.objects.create(post=post, image=upload.file.name, type=image_type)
+        for upload in uploads
+    ]
+    PendingUpload.objects.filter(pk__in=[upload.pk for upload in uploads]).delete()
+    return images
@@ -0,0 +1,98 @@
+"""
+Utrzymanie danych pochodnych postów (indeks wyszukiwania, liczniki lajków
+i komentarzy, miniatury zdjęć, `updated_at`, wersja cache feedu) na sygnałach modeli.
+
+Podłączane w `IdeasConfig.ready`.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from django.dispatch import Signal, receiver
+
+from users.images import delete_renditions_later, refresh_renditions_later
+
+from .models import Category, Comment, KaizenPost, Like, PostApproval, PostImage, PostSurvey
+from .services import counters, feed_cache, search
+
+_SEARCH_FIELDS = {'title', 'content'}
+
+# Hurtowe oznaczenie powiadomień jako przeczytane (`QuerySet.update` nie wysyła
+# `post_save`). Argument: `user_id`.
+notifications_read = Signal()
+
+
+@receiver(post_save, sender=KaizenPost)
+def _index_post(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not _SEARCH_FIELDS & set(update_fields):
+        return
+    search.index_posts([instance])
+
+
+@receiver(post_delete, sender=KaizenPost)
+def _unindex_post(sender, instance, **kwargs):
+    search.remove_posts([instance.pk])
+
+
+@receiver(post_save, sender=Like)
+def _count_like(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.adjust(instance.post_id, 'likes_count', 1)
+
+
+@receiver(post_delete, sender=Like)
+def _uncount_like(sender, instance, **kwargs):
+    # Przy kaskadzie (usunięcie posta/usera) sygnał przychodzi dla każdego lajka.
+    counters.adjust(instance.post_id, 'likes_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def _count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.adjust(instance.post_id, 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def _uncount_comment(sender, instance, **kwargs):
+    counters.adjust(instance.post_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=PostImage)
+def _render_post_image(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_renditions_later(instance, 'image', 'renditions')
+
+
+@receiver(post_delete, sender=PostImage)
+def _delete_post_image_renditions(sender, instance, **kwargs):
+    delete_renditions_later(instance, 'image', 'renditions')
+
+
+def _touch_post(sender, instance, raw=False, **kwargs):
+    # Zdjęcia, etapy i ankieta są częścią reprezentacji posta — ich zmiana zmienia jego ETag.
+    if raw:
+        return
+    KaizenPost.objects.filter(pk=instance.post_id).update(updated_at=timezone.now())
+
+
+for _model in (PostImage, PostApproval, PostSurvey):
+    post_save.connect(_touch_post, sender=_model, dispatch_uid=f'touch_post_save_{_model.__name__}')
+    post_delete.connect(_touch_post, sender=_model, dispatch_uid=f'touch_post_delete_{_model.__name__}')
+
+
+_FEED_MODELS = (KaizenPost, Like, Comment, PostImage, PostApproval, PostSurvey, Category)
+
+
+def _invalidate_feed_cache(sender, raw=False, **kwargs):
+    if raw:
+        return
+    # Od razu — żeby ta sama transakcja nie czytała starej strony, i po commicie —
+    # żeby równoległy odczyt sprzed commitu nie utrwalił starych danych pod nową wersją.
+    feed_cache.invalidate()
+    transaction.on_commit(feed_cache.invalidate)
+
+
+for _model in _FEED_MODELS:
+    post_save.connect(_invalidate_feed_cache, sender=_model, dispatch_uid=f'feed_cache_save_{_model.__name__}')
+    post_delete.connect(_invalidate_feed_cache, sender=_model, dispatch_uid=f'feed_cache_delete_{_model.__name__}')
@@ -0,0 +1,18 @@
+from jobs.registry import task
+
+from .models import Comment
+from .services.notifications import notify_mentions
+
+
+@task('ideas.notify_mentions')
+def notify_comment_mentions(comment_id, exclude_user_ids=()):
+    comment = Comment.objects.select_related('author', 'post').filter(pk=comment_id).first()
+    if comment is None:
+        return
+    notify_mentions(
+        comment.text,
+        actor=comment.author,
+        post=comment.post,
+        comment=comment,
+        exclude_user_ids=exclude_user_ids,
+    )
@@ -1,8 +1,36 @@
+import io
+import os
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connection
+from django.db.models.signals import pre_save
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.http import http_date
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
-from .models import KaizenPost, Comment, Like
+from PIL import Image
+from .models import (
+    Bookmark,
+    Category,
+    Comment,
+    KaizenPost,
+    Like,
+    Notification,
+    PendingUpload,
+    PostApproval,
+    PostImage,
+    PostSurvey,
+)
+from .services import counters, feed_cache, search
+from .views import PostViewSet
 
 User = get_user_model()
 
@@ -109,3 +137,606 @@ class KaizenTests(APITestCase):
         response_user2 = self.client.post(url, data, format='json')
         self.assertEqual(response_user2.status_code, status.HTTP_201_CREATED)
         self.assertEqual(post.likes.count(), 2)
+
+
+class PostFeedQueryCountTests(APITestCase):
+    """Liczba zapytań strony feedu nie może rosnąć z liczbą postów (N+1)."""
+
+    def setUp(self):
+        self.viewer = User.objects.create_user(username='viewer', password='x', nickname='Viewer')
+        self.manager = User.objects.create_user(
+            username='manager', password='x', nickname='Manager', role='MANAGER'
+        )
+        category = Category.objects.create(name='BHP')
+        posts = KaizenPost.objects.bulk_create([
+            KaizenPost(
+                author=self.manager if i % 2 else self.viewer,
+                title=f'Pomysł {i}',
+                content='Treść',
+                category=category,
+                status=KaizenPost.Status.SUBMITTED,
+                assigned_manager=self.manager,
+            )
+            for i in range(100)
+        ])
+        PostImage.objects.bulk_create([
+            PostImage(post=post, image=f'kaizen_attachments/{post.pk}.jpg') for post in posts
+        ])
+        PostApproval.objects.bulk_create([
+            PostApproval(
+                post=post,
+                stage=PostApproval.Stage.MANAGER,
+                order=1,
+                approver=self.manager,
+                decision=PostApproval.Decision.APPROVED,
+            )
+            for post in posts
+        ])
+        PostSurvey.objects.bulk_create([
+            PostSurvey(
+                post=post,
+                frequency_value=1,
+                frequency_unit=PostSurvey.FrequencyUnit.DAY,
+                affected_people=2,
+                time_lost_minutes=10,
+                estimated_time_savings_hours=1.0,
+                estimated_financial_savings='10.00',
+            )
+            for post in posts[::2]
+        ])
+        Like.objects.bulk_create([Like(post=post, user=self.viewer) for post in posts[::3]])
+        Bookmark.objects.bulk_create([Bookmark(post=post, user=self.viewer) for post in posts[::4]])
+        Comment.objects.bulk_create([
+            Comment(post=post, author=self.manager, text='Komentarz') for post in posts[::5]
+        ])
+        # bulk_create omija sygnały — liczniki wyrównujemy jak komenda reconcile.
+        counters.reconcile()
+        self.client.force_authenticate(user=self.viewer)
+
+    def _count_queries(self, page_size, **params):
+        url = reverse('post-list')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {'page_size': page_size, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), page_size)
+        return len(ctx.captured_queries), response
+
+    def test_feed_query_count_is_constant(self):
+        small, _ = self._count_queries(20)
+        large, response = self._count_queries(100)
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 5)
+
+        first = response.data['results'][0]
+        post = KaizenPost.objects.get(pk=first['id'])
+        self.assertEqual(first['likes_count'], post.likes.count())
+        self.assertEqual(first['comments_count'], post.comments.count())
+        self.assertEqual(first['is_liked_by_me'], post.likes.filter(user=self.viewer).exists())
+        self.assertEqual(
+            first['is_bookmarked_by_me'], post.bookmarks.filter(user=self.viewer).exists()
+        )
+
+    def test_feed_query_count_is_constant_when_ordered_by_likes(self):
+        small, _ = self._count_queries(20, ordering='likes')
+        large, _ = self._count_queries(100, ordering='likes')
+        self.assertEqual(small, large)
+
+    def test_viewer_flags_on_bookmarked_and_detail(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('post-bookmarked'), {'page_size': 25})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 25)
+        self.assertLessEqual(len(ctx.captured_queries), 5)
+        liked = set(Like.objects.filter(user=self.viewer).values_list('post_id', flat=True))
+        for item in response.data['results']:
+            self.assertTrue(item['is_bookmarked_by_me'])
+            self.assertEqual(item['is_liked_by_me'], item['id'] in liked)
+
+        post = Like.objects.filter(user=self.viewer).first().post
+        response = self.client.get(reverse('post-detail', args=[post.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['is_liked_by_me'])
+
+        self.client.force_authenticate(user=None)
+        response = self.client.get(reverse('post-detail', args=[post.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['is_liked_by_me'])
+
+
+class PostCounterTests(APITestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='autor', password='x', nickname='Autor')
+        self.fan = User.objects.create_user(username='fan', password='x', nickname='Fan')
+        self.post = KaizenPost.objects.create(
+            author=self.author,
+            category=Category.objects.create(name='Proces'),
+            title='Licznik',
+            content='Treść',
+            status=KaizenPost.Status.SUBMITTED,
+        )
+        self.client.force_authenticate(user=self.fan)
+
+    def test_like_toggle_maintains_counter(self):
+        url = reverse('post-like', args=[self.post.pk])
+        response = self.client.post(url)
+        self.assertEqual(response.data['likes_count'], 1)
+        Like.objects.create(post=self.post, user=self.author)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 2)
+
+        response = self.client.post(url)
+        self.assertEqual(response.data['likes_count'], 1)
+
+    def test_comment_delete_and_cascade_maintain_counter(self):
+        parent = Comment.objects.create(post=self.post, author=self.fan, text='A')
+        Comment.objects.create(post=self.post, author=self.author, text='B', parent=parent)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 2)
+
+        parent.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, Comment.objects.filter(post=self.post).count())
+
+    def test_post_edit_keeps_concurrent_like(self):
+        post = KaizenPost.objects.get(pk=self.post.pk)
+        Like.objects.create(post=self.post, user=self.fan)
+
+        post.title = 'Nowy tytuł'
+        post.save()
+
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.title, self.post.likes_count), ('Nowy tytuł', 1))
+
+    def test_api_edit_keeps_concurrent_comment(self):
+        self.post.status = KaizenPost.Status.TO_VERIFY
+        self.post.save()
+        self.client.force_authenticate(user=self.author)
+        comment_during_update = []
+
+        def add_comment(sender, instance, **kwargs):
+            if not comment_during_update:
+                comment_during_update.append(Comment.objects.create(post=instance, author=self.fan, text='W trakcie'))
+
+        pre_save.connect(add_comment, sender=KaizenPost, dispatch_uid='test_concurrent_comment')
+        self.addCleanup(pre_save.disconnect, sender=KaizenPost, dispatch_uid='test_concurrent_comment')
+        response = self.client.patch(reverse('post-detail', args=[self.post.pk]), {'title': 'Po edycji'})
+
+        self.assertEqual(response.status_code, 200)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.title, self.post.comments_count), ('Po edycji', 1))
+
+    def test_reconcile_fixes_drift(self):
+        Like.objects.bulk_create([Like(post=self.post, user=self.fan)])
+        KaizenPost.objects.filter(pk=self.post.pk).update(comments_count=7)
+
+        drifts = counters.reconcile(dry_run=True)
+        self.assertEqual(
+            sorted(drifts),
+            [(self.post.pk, 'comments_count', 7, 0), (self.post.pk, 'likes_count', 0, 1)],
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+
+        counters.reconcile()
+        self.assertEqual(counters.reconcile(dry_run=True), [])
+
+
+class FeedCacheTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='autor', password='x', nickname='Autor')
+        self.viewer = User.objects.create_user(username='widz', password='x', nickname='Widz')
+        category = Category.objects.create(name='Proces')
+        self.posts = [
+            KaizenPost.objects.create(
+                author=self.author,
+                category=category,
+                title=f'Post {i}',
+                content='Treść',
+                status=KaizenPost.Status.SUBMITTED,
+            )
+            for i in range(3)
+        ]
+        Like.objects.create(post=self.posts[0], user=self.viewer)
+
+    def _get(self, user=None, **params):
+        self.client.force_authenticate(user=user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('post-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        by_id = {item['id']: item for item in response.data['results']}
+        return by_id, len(ctx.captured_queries)
+
+    def test_cached_page_merges_flags_of_current_viewer(self):
+        first, cold = self._get(self.viewer)
+        second, warm = self._get(self.viewer)
+        self.assertLess(warm, cold)
+        self.assertEqual(first, second)
+        self.assertTrue(second[self.posts[0].pk]['is_liked_by_me'])
+
+        anonymous, _ = self._get(None)
+        self.assertFalse(anonymous[self.posts[0].pk]['is_liked_by_me'])
+
+    def test_like_and_comment_invalidate_cached_pages(self):
+        self._get(None, ordering='likes')
+        Like.objects.create(post=self.posts[1], user=self.author)
+        Comment.objects.create(post=self.posts[1], author=self.viewer, text='Hej')
+
+        page, _ = self._get(None, ordering='likes')
+        self.assertEqual(page[self.posts[1].pk]['likes_count'], 1)
+        self.assertEqual(page[self.posts[1].pk]['comments_count'], 1)
+
+    def test_page_read_during_write_is_not_stored_under_new_version(self):
+        paginate = PostViewSet.paginate_queryset
+
+        def paginate_then_commit_write(viewset, queryset):
+            page = paginate(viewset, queryset)
+            # Zapis zatwierdzony po odczycie strony, przed jej zapisem do cache.
+            feed_cache.invalidate()
+            return page
+
+        with mock.patch.object(PostViewSet, 'paginate_queryset', paginate_then_commit_write):
+            _, racing = self._get(None)
+        _, after = self._get(None)
+        self.assertEqual(after, racing)
+
+    def test_mine_is_not_cached(self):
+        self._get(self.author, mine='1')
+        _, again = self._get(self.author, mine='1')
+        _, cold = self._get(self.author)
+        self.assertEqual(again, cold)
+
+
+class ConditionalGetTests(APITestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='autor', password='x', nickname='Autor')
+        self.viewer = User.objects.create_user(username='widz', password='x', nickname='Widz')
+        self.post = KaizenPost.objects.create(
+            author=self.author,
+            category=Category.objects.create(name='Proces'),
+            title='Warunkowy GET',
+            content='Treść',
+            status=KaizenPost.Status.SUBMITTED,
+        )
+        self.client.force_authenticate(user=self.viewer)
+
+    def _revalidate(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', first)
+        return first['ETag']
+
+    def test_post_detail_answers_304_until_it_changes(self):
+        url = reverse('post-detail', args=[self.post.pk])
+        etag = self._revalidate(url)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Lajk innej osoby zmienia licznik, zakładka widza — jego flagę.
+        Like.objects.create(post=self.post, user=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['likes_count'], 1)
+
+        etag = response['ETag']
+        Bookmark.objects.create(post=self.post, user=self.viewer)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['is_bookmarked_by_me'])
+
+    def test_post_detail_etag_follows_author_and_category(self):
+        url = reverse('post-detail', args=[self.post.pk])
+        etag = self._revalidate(url)
+        self.assertNotIn('Last-Modified', self.client.get(url))
+
+        User.objects.filter(pk=self.author.pk).update(nickname='NowyNick')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['author']['nickname'], 'NowyNick')
+
+        etag = response['ETag']
+        Category.objects.filter(pk=self.post.category_id).update(name='Jakość')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['category_name'], 'Jakość')
+
+    def test_comments_etag_follows_new_and_deleted_comments(self):
+        url = reverse('post-comments', args=[self.post.pk])
+        etag = self._revalidate(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        comment = Comment.objects.create(post=self.post, author=self.author, text='Nowy')
+        etag = self._revalidate(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        comment.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_comments_ignore_if_modified_since_after_delete(self):
+        url = reverse('post-comments', args=[self.post.pk])
+        comment = Comment.objects.create(post=self.post, author=self.author, text='Nowy')
+        first = self.client.get(url)
+        self.assertNotIn('Last-Modified', first)
+        since = http_date(time.time() + 60)
+        comment.delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [])
+
+    def test_unread_count_etag(self):
+        url = reverse('notification-unread-count')
+        etag = self._revalidate(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Notification.objects.create(
+            recipient=self.viewer, actor=self.author, post=self.post, type=Notification.Type.LIKE,
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImageRenditionTests(APITestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='autor', password='x', nickname='Autor')
+        self.post = KaizenPost.objects.create(
+            author=self.author,
+            category=Category.objects.create(name='Proces'),
+            title='Zdjęcie',
+            content='Treść',
+            status=KaizenPost.Status.SUBMITTED,
+        )
+
+    @staticmethod
+    def _photo(width, height, orientation=None):
+        image = Image.new('RGB', (width, height), (200, 30, 30))
+        exif = Image.Exif()
+        exif[0x010F] = 'Aparat'  # Make
+        if orientation:
+            exif[0x0112] = orientation
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', exif=exif)
+        return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_post_image_renditions_are_rotated_and_stripped(self):
+        # Orientacja 6 = obrót o 90° — po poprawce zdjęcie jest pionowe.
+        image = PostImage.objects.create(post=self.post, image=self._photo(1000, 500, orientation=6))
+        image.refresh_from_db()
+
+        items = image.renditions['items']
+        self.assertEqual(image.renditions['source'], image.image.name)
+        self.assertEqual(sorted({i['width'] for i in items}), [320])
+        self.assertEqual({i['format'] for i in items}, {'webp', 'jpeg'})
+        for item in items:
+            with image.image.storage.open(item['name']) as fh:
+                rendition = Image.open(fh)
+                self.assertEqual(rendition.size, (320, 640))
+                self.assertFalse(rendition.getexif())
+
+        response = self.client.get(reverse('post-detail', args=[self.post.pk]))
+        srcset = response.data['image_items'][0]['srcset']
+        self.assertIn(' 320w', srcset['webp'])
+        self.assertTrue(srcset['jpeg'].startswith('http://testserver/'))
+
+    def test_avatar_renditions_follow_avatar_changes(self):
+        self.author.avatar = self._photo(1500, 1500)
+        self.author.save()
+        self.author.refresh_from_db()
+        self.assertEqual(
+            sorted({i['width'] for i in self.author.avatar_renditions['items']}), [320, 640, 1280]
+        )
+
+        storage = self.author.avatar.storage
+        first = [item['name'] for item in self.author.avatar_renditions['items']]
+        self.author.avatar = self._photo(800, 800)
+        self.author.save()
+        self.author.refresh_from_db()
+        self.assertTrue(self.author.avatar_renditions['items'])
+        self.assertFalse(any(storage.exists(name) for name in first))
+
+        second = [item['name'] for item in self.author.avatar_renditions['items']]
+        self.author.avatar = None
+        self.author.save()
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.avatar_renditions, {})
+        self.assertFalse(any(storage.exists(name) for name in second))
+
+    def test_deleting_post_image_removes_renditions(self):
+        image = PostImage.objects.create(post=self.post, image=self._photo(700, 500))
+        image.refresh_from_db()
+        storage = image.image.storage
+        names = [item['name'] for item in image.renditions['items']]
+        self.assertTrue(names and all(storage.exists(name) for name in names))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        self.assertFalse(any(storage.exists(name) for name in names))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class MultipartUploadTests(APITestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='autor', password='x', nickname='Autor')
+        self.other = User.objects.create_user(username='inny', password='x', nickname='Inny')
+        self.post = KaizenPost.objects.create(
+            author=self.author,
+            category=Category.objects.create(name='Proces'),
+            title='Upload',
+            content='Treść',
+            status=KaizenPost.Status.TO_VERIFY,
+        )
+        self.client.force_authenticate(user=self.author)
+
+    @staticmethod
+    def _png(name='zdjecie.jpg'):
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 30), (10, 120, 10)).save(buffer, format='PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+    def _upload(self, *files):
+        return self.client.post(reverse('upload'), {'file': list(files)}, format='multipart')
+
+    def test_upload_sniffs_format_and_attaches_to_post(self):
+        response = self._upload(self._png(), self._png())
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # Rozszerzenie wynika z nagłówka pliku, nie z nazwy przysłanej przez klienta.
+        self.assertEqual([item['format'] for item in response.data], ['png', 'png'])
+        upload_ids = [item['id'] for item in response.data]
+
+        response = self.client.post(
+            reverse('post-attachments', args=[self.post.pk]),
+            {'upload_ids': upload_ids, 'type': PostImage.Type.BEFORE},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['image_items']), 2)
+        self.assertFalse(PendingUpload.objects.exists())
+        self.assertTrue(all(
+            image.image.name.endswith('.png') and image.type == PostImage.Type.BEFORE
+            for image in self.post.images.all()
+        ))
+
+    def test_rejects_non_images_and_foreign_uploads(self):
+        response = self._upload(SimpleUploadedFile('x.jpg', b'not an image at all', content_type='image/jpeg'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=self.other)
+        upload_id = self._upload(self._png()).data[0]['id']
+        self.client.force_authenticate(user=self.author)
+        response = self.client.post(
+            reverse('post-attachments', args=[self.post.pk]), {'upload_ids': [upload_id]}, format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post.images.count(), 0)
+
+    def test_attachments_follow_edit_rules(self):
+        upload_id = self._upload(self._png()).data[0]['id']
+        KaizenPost.objects.filter(pk=self.post.pk).update(status=KaizenPost.Status.SUBMITTED)
+        response = self.client.post(
+            reverse('post-attachments', args=[self.post.pk]), {'upload_ids': [upload_id]}, format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.post.images.count(), 0)
+        self.assertTrue(PendingUpload.objects.filter(pk=upload_id).exists())
+
+    def test_invalid_file_in_batch_stores_nothing(self):
+        before = sum(len(names) for _, _, names in os.walk(settings.MEDIA_ROOT))
+        response = self._upload(
+            self._png(), SimpleUploadedFile('x.jpg', b'not an image at all', content_type='image/jpeg'),
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(PendingUpload.objects.exists())
+        self.assertEqual(sum(len(names) for _, _, names in os.walk(settings.MEDIA_ROOT)), before)
+
+    def test_base64_extension_comes_from_header(self):
+        from users.fields import Base64ImageField
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (4, 4)).save(buffer, format='WEBP')
+        self.assertEqual(Base64ImageField()._get_extension(buffer.getvalue()), 'webp')
+        self.assertEqual(Base64ImageField()._get_extension(b'garbage'), 'jpg')
+
+
+class KeysetPaginationTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='x', nickname='Reader')
+        self.category = Category.objects.create(name='Proces')
+        self.posts = [self._create_post(i) for i in range(5)]
+        self.client.force_authenticate(user=self.user)
+
+    def _create_post(self, i):
+        return KaizenPost.objects.create(
+            author=self.user,
+            title=f'Post {i}',
+            content='Treść',
+            category=self.category,
+            status=KaizenPost.Status.SUBMITTED,
+        )
+
+    def test_cursor_pages_do_not_repeat_after_new_post(self):
+        url = reverse('post-list')
+        first = self.client.get(url, {'pagination': 'cursor', 'page_size': 2})
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', first.data)
+
+        self._create_post(99)  # nowy post nie może przesunąć kolejnych stron
+
+        seen = [p['id'] for p in first.data['results']]
+        next_url = first.data['next']
+        while next_url:
+            page = self.client.get(next_url)
+            seen.extend(p['id'] for p in page.data['results'])
+            next_url = page.data['next']
+
+        expected = [p.id for p in sorted(self.posts, key=lambda p: (p.created_at, p.id), reverse=True)]
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(reverse('post-list'), {'cursor': 'nie-kursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_notifications_stay_unpaginated_without_cursor(self):
+        response = self.client.get(reverse('notification-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(response.data, list)
+
+
+class PostSearchTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='searcher', password='x', nickname='Searcher')
+        category = Category.objects.create(name='Produkcja')
+        self.match = KaizenPost.objects.create(
+            author=self.user,
+            category=category,
+            title='Szybsze przezbrojenie maszyny',
+            content='Nowa łódź transportowa skróci przezbrojenia linii o połowę.',
+            status=KaizenPost.Status.SUBMITTED,
+        )
+        self.other = KaizenPost.objects.create(
+            author=self.user,
+            category=category,
+            title='Oświetlenie magazynu',
+            content='Wymiana lamp na LED.',
+            status=KaizenPost.Status.SUBMITTED,
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_feed_search_ignores_diacritics_and_inflection(self):
+        response = self.client.get(reverse('post-list'), {'search': 'lodzi przezbrojeniach'})
+        self.assertEqual([p['id'] for p in response.data['results']], [self.match.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.other.content = 'Przezbrojenie też tutaj.'
+        self.other.save()
+        response = self.client.get(reverse('post-list'), {'search': 'przezbrojenie'})
+        self.assertEqual({p['id'] for p in response.data['results']}, {self.match.id, self.other.id})
+
+        self.match.delete()
+        response = self.client.get(reverse('post-list'), {'search': 'przezbrojenie'})
+        self.assertEqual([p['id'] for p in response.data['results']], [self.other.id])
+
+    def test_search_endpoint_ranks_and_highlights(self):
+        response = self.client.get(reverse('post-search'), {'q': 'maszyna'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in response.data], [self.match.id])
+        self.assertIn('<mark>maszyny</mark>', response.data[0]['search']['title_highlight'])
+
+    def test_malformed_query_error_means_no_results(self):
+        error = OperationalError('fts5: syntax error near "*"')
+        with mock.patch.object(search.SqliteFtsBackend, 'ranked', side_effect=error):
+            with self.assertLogs('ideas.services.search', level='WARNING'):
+                self.assertEqual(search.ranked_post_ids('maszyna'), [])
+
+    def test_backend_failure_is_not_hidden_as_no_results(self):
+        error = OperationalError('no such table: ideas_post_fts')
+        with mock.patch.object(search.SqliteFtsBackend, 'ranked', side_effect=error):
+            with self.assertLogs('ideas.services.search', level='ERROR'):
+                with self.assertRaises(OperationalError):
+                    search.ranked_post_ids('maszyna')
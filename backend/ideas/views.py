@@ -1,16 +1,21 @@
 import logging
-import re
+from functools import partial
 
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Q
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError, PermissionDenied
+from rest_framework.parsers import MultiPartParser
+from rest_framework.views import APIView
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
 from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Q
 from django.utils import timezone
 
-from .models import KaizenPost, Comment, Like, PostSurvey, Notification, Category, Bookmark, PostApproval
+from app.conditional import conditional, make_etag
+
+from .models import KaizenPost, Comment, Like, PostImage, PostSurvey, Notification, Category, Bookmark, PostApproval
 from .serializers import (
     PostSerializer,
     CommentSerializer,
@@ -19,8 +24,9 @@ from .serializers import (
     PostSurveyInputSerializer,
     NotificationSerializer,
     CategorySerializer,
+    PendingUploadSerializer,
 )
-from .pagination import PostPagination
+from .pagination import NotificationPagination, PostFeedPagination
 from .permissions import IsCommentAuthorOrReadOnly, IsPostAuthorOrReadOnly
 from .services.approval import (
     COST_THRESHOLD_DIRECTOR,
@@ -31,7 +37,12 @@ from .services.approval import (
     is_active_approver,
     process_decision,
 )
+from .services import feed_cache, search as search_service
+from .services.feed import viewer_post_flags, with_feed_data
 from .services.post_survey_calculator import calculate_survey_results
+from .services.notifications import create_notification, notify_mentions_later
+from .services.uploads import attach_uploads, create_pending_many
+from .signals import notifications_read
 
 logger = logging.getLogger(__name__)
 
@@ -59,68 +70,44 @@ def _parse_deadline(value):
         return _PARSE_ERROR
 
 
-def create_notification(notification_type, recipient, actor, post, comment=None):
-    if not recipient or not actor or recipient == actor:
-        return None
-    return Notification.objects.create(
-        type=notification_type,
-        recipient=recipient,
-        actor=actor,
-        post=post,
-        comment=comment,
-    )
-
-
-MENTION_REGEX = re.compile(r'@([A-Za-z0-9_\-]{2,50})')
-
-
-def extract_mentions(text):
-    """Zwraca posortowany set nicków bez duplikatów."""
-    if not text:
-        return []
-    return list({match.group(1) for match in MENTION_REGEX.finditer(text)})
-
-
-def notify_mentions(text, *, actor, post, comment, exclude_user_ids=None):
-    nicks = extract_mentions(text)
-    if not nicks:
-        return
-    User = get_user_model()
-    excluded = set(exclude_user_ids or [])
-    excluded.add(actor.id)
-    mentioned = User.objects.filter(nickname__in=nicks).exclude(id__in=excluded)
-    seen = set()
-    for user in mentioned:
-        if user.id in seen:
-            continue
-        seen.add(user.id)
-        create_notification(Notification.Type.MENTION, user, actor, post, comment)
+# Pola autora wyświetlane w szczegółach posta (`UserPublicSerializer`).
+RETRIEVE_ETAG_AUTHOR_FIELDS = tuple(
+    f'author__{field}'
+    for field in ('nickname', 'first_name', 'last_name', 'username', 'is_staff', 'role', 'avatar', 'avatar_renditions')
+)
 
 
 class PostViewSet(viewsets.ModelViewSet):
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsPostAuthorOrReadOnly]
-    pagination_class = PostPagination
+    pagination_class = PostFeedPagination
+
+    # Akcje tylko do odczytu — serializujemy wiele postów, więc ładujemy je w trybie feed.
+    # Akcje modyfikujące celowo go pomijają: prefetch `approvals` byłby nieaktualny po zmianach.
+    feed_actions = ('list', 'retrieve')
+    # Statusy widoczne w publicznym feedzie i wyszukiwarce.
+    public_statuses = (
+        KaizenPost.Status.SUBMITTED,
+        KaizenPost.Status.IN_PROGRESS,
+        KaizenPost.Status.IMPLEMENTED,
+    )
 
     def get_queryset(self):
-        qs = KaizenPost.objects.all().order_by('-created_at')
+        qs = KaizenPost.objects.all().order_by('-created_at', '-id')
+
+        if self.action in self.feed_actions:
+            qs = with_feed_data(qs)
 
         if self.action != 'list':
             return qs
 
-        qs = qs.filter(
-            status__in=[
-                KaizenPost.Status.SUBMITTED,
-                KaizenPost.Status.IN_PROGRESS,
-                KaizenPost.Status.IMPLEMENTED,
-            ]
-        )
+        qs = qs.filter(status__in=self.public_statuses)
 
         params = self.request.query_params
 
         search = params.get('search', '').strip()
         if search:
-            qs = qs.filter(Q(title__icontains=search) | Q(content__icontains=search))
+            qs = search_service.filter_queryset(qs, search)
 
         category = params.get('category')
         if category:
@@ -144,10 +131,52 @@ class PostViewSet(viewsets.ModelViewSet):
 
         ordering = params.get('ordering')
         if ordering == 'likes':
-            qs = qs.annotate(_likes=Count('likes')).order_by('-_likes', '-created_at')
+            qs = qs.order_by('-likes_count', '-created_at', '-id')
 
         return qs
 
+    def list(self, request, *args, **kwargs):
+        if not feed_cache.is_cacheable(request):
+            return super().list(request, *args, **kwargs)
+        key = feed_cache.cache_key(request)
+        data = feed_cache.get(request, key)
+        if data is not None:
+            return Response(data)
+        response = super().list(request, *args, **kwargs)
+        feed_cache.store(key, response.data)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            row = (
+                KaizenPost.objects.filter(pk=kwargs.get(self.lookup_url_kwarg or self.lookup_field))
+                .values_list('pk', 'updated_at', 'category__name', *RETRIEVE_ETAG_AUTHOR_FIELDS)
+                .first()
+            )
+        except (TypeError, ValueError):
+            row = None
+        if row is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        # `updated_at` obejmuje liczniki, zdjęcia i etapy; autor i kategoria nie mają
+        # znacznika zmian, więc do ETag-u wchodzą ich wyświetlane pola. Bez Last-Modified:
+        # zmiana nicku autora nie przesuwa `updated_at`. Flagi widza są osobno.
+        pk, updated_at, *embedded = row
+        flags = viewer_post_flags(request.user, [pk])[pk]
+        return conditional(
+            request,
+            partial(super().retrieve, request, *args, **kwargs),
+            etag=make_etag('post', pk, updated_at, *embedded, flags['liked'], flags['bookmarked']),
+        )
+
+    def get_keyset_ordering(self):
+        """Krotka sortowania dla paginacji kursorowej (tylko lista postów)."""
+        if self.action != 'list':
+            return None
+        if self.request.query_params.get('ordering') == 'likes':
+            return ('-likes_count', '-created_at', '-id')
+        return ('-created_at', '-id')
+
     def get_permissions(self):
         if self.action == 'like':
             return [permissions.IsAuthenticated()]
@@ -183,10 +212,13 @@ class PostViewSet(viewsets.ModelViewSet):
                 post,
             )
 
-    def perform_update(self, serializer):
-        post = self.get_object()
+    @staticmethod
+    def _ensure_editable(post):
         if post.status not in (KaizenPost.Status.TO_VERIFY, KaizenPost.Status.CANCELLED):
             raise PermissionDenied('Nie można edytować postów o tym statusie.')
+
+    def perform_update(self, serializer):
+        self._ensure_editable(self.get_object())
         serializer.save()
 
     @action(detail=True, methods=['post'])
@@ -350,6 +382,37 @@ class PostViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(post)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Wyszukiwanie pełnotekstowe z rankingiem i podświetleniem trafień.
+        Parametry: `q` (wymagany), `limit` (domyślnie 20, maks. 50).
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'detail': 'Parametr q jest wymagany.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 50)
+        except (TypeError, ValueError):
+            limit = 20
+
+        ranked = search_service.ranked_post_ids(query, limit=limit, statuses=self.public_statuses)
+        posts = with_feed_data(KaizenPost.objects.filter(pk__in=[pk for pk, _ in ranked]))
+        posts_by_id = {post.pk: post for post in posts}
+        ordered = [posts_by_id[pk] for pk, _ in ranked if pk in posts_by_id]
+
+        terms = search_service.query_terms(query)
+        scores = dict(ranked)
+        results = []
+        for post, data in zip(ordered, self.get_serializer(ordered, many=True).data):
+            data['search'] = {
+                'score': round(scores[post.pk], 4),
+                'title_highlight': search_service.highlight(post.title, terms),
+                'snippet': search_service.highlight(post.content, terms, max_words=30),
+            }
+            results.append(data)
+        return Response(results)
+
     @action(detail=False, methods=['get'])
     def my_cases(self, request):
         user = request.user
@@ -370,7 +433,7 @@ class PostViewSet(viewsets.ModelViewSet):
                 status__in=pending_statuses,
             )
 
-        qs = qs.order_by('-created_at')
+        qs = with_feed_data(qs.order_by('-created_at'))
         serializer = self.get_serializer(qs, many=True)
         return Response(serializer.data)
 
@@ -382,18 +445,40 @@ class PostViewSet(viewsets.ModelViewSet):
 
         if not created:
             like_obj.delete()
+            post.refresh_from_db(fields=['likes_count'])
             return Response({
                 'status': 'unliked',
-                'likes_count': post.likes.count(),
+                'likes_count': post.likes_count,
                 'is_liked_by_me': False,
             })
         create_notification(Notification.Type.LIKE, post.author, user, post)
+        post.refresh_from_db(fields=['likes_count'])
         return Response({
             'status': 'liked',
-            'likes_count': post.likes.count(),
+            'likes_count': post.likes_count,
             'is_liked_by_me': True,
         })
 
+    @action(detail=True, methods=['post'])
+    def attachments(self, request, pk=None):
+        """Podpina uploady z `POST /api/uploads/` jako zdjęcia posta (tylko autor, jak edycja)."""
+        post = self.get_object()
+        self._ensure_editable(post)
+        upload_ids = request.data.get('upload_ids')
+        if not isinstance(upload_ids, list) or not upload_ids:
+            return Response({'detail': 'Pole upload_ids jest wymagane.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            upload_ids = [int(upload_id) for upload_id in upload_ids]
+        except (TypeError, ValueError):
+            return Response({'detail': 'Nieprawidłowe upload_ids.'}, status=status.HTTP_400_BAD_REQUEST)
+        image_type = request.data.get('type') or PostImage.Type.GENERAL
+        if image_type not in PostImage.Type.values:
+            return Response({'detail': 'Nieprawidłowy typ zdjęcia.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        attach_uploads(post, request.user, upload_ids, image_type=image_type)
+        serializer = self.get_serializer(KaizenPost.objects.get(pk=post.pk))
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['post'])
     def bookmark(self, request, pk=None):
         post = self.get_object()
@@ -418,6 +503,7 @@ class PostViewSet(viewsets.ModelViewSet):
             .order_by('-bookmarks__created_at')
             .distinct()
         )
+        qs = with_feed_data(qs)
         page = self.paginate_queryset(qs)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -495,9 +581,21 @@ class PostViewSet(viewsets.ModelViewSet):
     def comments(self, request, pk=None):
         post = self.get_object()
         if request.method == 'GET':
-            comments = post.comments.all()
-            serializer = CommentSerializer(comments, many=True, context={'request': request})
-            return Response(serializer.data)
+            # Dodanie, edycja i usunięcie komentarza zmieniają liczność albo max(updated_at).
+            # Bez Last-Modified: po usunięciu najnowszego komentarza max(updated_at)
+            # cofa się, a klient z samym If-Modified-Since dostałby 304.
+            state = post.comments.aggregate(count=Count('id'), last=Max('updated_at'))
+
+            def build_response():
+                comments = post.comments.all()
+                serializer = CommentSerializer(comments, many=True, context={'request': request})
+                return Response(serializer.data)
+
+            return conditional(
+                request,
+                build_response,
+                etag=make_etag('comments', post.pk, state['count'], state['last']),
+            )
         elif request.method == 'POST':
             serializer = CommentSerializer(data=request.data, context={'request': request, 'post': post})
             if serializer.is_valid():
@@ -521,13 +619,7 @@ class PostViewSet(viewsets.ModelViewSet):
                 exclude_ids = {post.author_id}
                 if comment.parent:
                     exclude_ids.add(comment.parent.author_id)
-                notify_mentions(
-                    comment.text,
-                    actor=request.user,
-                    post=post,
-                    comment=comment,
-                    exclude_user_ids=exclude_ids,
-                )
+                notify_mentions_later(comment, exclude_user_ids=exclude_ids)
                 return Response(
                     CommentSerializer(comment, context={'request': request}).data,
                     status=status.HTTP_201_CREATED,
@@ -566,6 +658,30 @@ class PostViewSet(viewsets.ModelViewSet):
         return Response(PostSurveySerializer(survey).data, status=response_status)
 
 
+class UploadView(APIView):
+    """
+    `POST /api/uploads/` — zdjęcia jako multipart (pole `file`, można wiele).
+
+    Pliki są strumieniowane na dysk niezależnie od rozmiaru, więc pamięć
+    requestu nie rośnie z liczbą zdjęć. Zwraca id do `upload_ids` posta.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def initialize_request(self, request, *args, **kwargs):
+        # Przed parsowaniem body (także przed CSRF-em SessionAuthentication).
+        request.upload_handlers = [TemporaryFileUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def post(self, request):
+        files = request.FILES.getlist('file')
+        if not files:
+            return Response({'detail': 'Brak plików w polu file.'}, status=status.HTTP_400_BAD_REQUEST)
+        uploads = create_pending_many(request.user, files)
+        serializer = PendingUploadSerializer(uploads, many=True, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
@@ -609,14 +725,21 @@ class LikeViewSet(viewsets.ModelViewSet):
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Bez parametrów lista jest niestronicowana (jak dotychczas); `?pagination=cursor` włącza kursor.
+    pagination_class = NotificationPagination
 
     def get_queryset(self):
         return (
             Notification.objects.filter(recipient=self.request.user)
             .select_related('actor', 'post', 'comment')
-            .order_by('-created_at')
+            .order_by('-created_at', '-id')
         )
 
+    def get_keyset_ordering(self):
+        if self.action != 'list':
+            return None
+        return ('-created_at', '-id')
+
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         notification = self.get_object()
@@ -630,9 +753,20 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     def mark_all_read(self, request):
         now = timezone.now()
         updated = self.get_queryset().filter(read_at__isnull=True).update(read_at=now)
+        if updated:
+            notifications_read.send(sender=Notification, user_id=request.user.pk)
         return Response({'marked_count': updated})
 
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
-        count = self.get_queryset().filter(read_at__isnull=True).count()
-        return Response({'count': count})
+        # Jedno zapytanie: nowe powiadomienie zmienia max(created_at), przeczytanie — max(read_at).
+        state = self.get_queryset().aggregate(
+            count=Count('id', filter=Q(read_at__isnull=True)),
+            last_created=Max('created_at'),
+            last_read=Max('read_at'),
+        )
+        return conditional(
+            request,
+            lambda: Response({'count': state['count']}),
+            etag=make_etag('unread', request.user.pk, state['count'], state['last_created'], state['last_read']),
+        )
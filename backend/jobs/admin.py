@@ -0,0 +1,23 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'created_at', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'idempotency_key')
+    readonly_fields = ('created_at', 'finished_at', 'locked_by', 'locked_at', 'last_error')
+    actions = ['retry_jobs']
+
+    @admin.action(description='Ponów wybrane zadania')
+    def retry_jobs(self, request, queryset):
+        updated = queryset.exclude(status=Job.Status.RUNNING).update(
+            status=Job.Status.PENDING,
+            attempts=0,
+            run_at=timezone.now(),
+            finished_at=None,
+        )
+        self.message_user(request, f'Ponowiono {updated} zadań.')
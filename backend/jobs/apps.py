@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'jobs'
+    verbose_name = 'Zadania w tle'
+
+    def ready(self):
+        # Rejestruje zadania z modułów `<app>/tasks.py` wszystkich aplikacji.
+        from django.utils.module_loading import autodiscover_modules
+        autodiscover_modules('tasks')
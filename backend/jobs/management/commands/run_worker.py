@@ -0,0 +1,61 @@
+import os
+import signal
+import socket
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs import services
+
+
+class Command(BaseCommand):
+    help = 'Runs the database-backed background job worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10,
+                            help='Ile zadań rezerwować naraz.')
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help='Przerwa (s) między sprawdzeniami pustej kolejki.')
+        parser.add_argument('--once', action='store_true',
+                            help='Przetwórz zaległe zadania i zakończ.')
+        parser.add_argument('--purge-after-days', type=int, default=7,
+                            help='Usuwaj wykonane zadania starsze niż N dni (0 = nie usuwaj).')
+
+    def handle(self, *args, **options):
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        self.stdout.write(f'Worker {worker_id} started.')
+        last_housekeeping = 0.0
+        processed = 0
+        while not self._stopping:
+            if time.monotonic() - last_housekeeping > 60:
+                services.requeue_stale()
+                if options['purge_after_days']:
+                    services.purge_finished(timedelta(days=options['purge_after_days']))
+                last_housekeeping = time.monotonic()
+
+            close_old_connections()
+            jobs = services.claim(worker_id, limit=options['batch_size'])
+            for job in jobs:
+                ok = services.run_job(job)
+                processed += 1
+                if options['verbosity'] >= 2:
+                    self.stdout.write(f"  {job.name} #{job.pk}: {'ok' if ok else 'failed'}")
+                if self._stopping:
+                    break
+
+            if not jobs:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker_id} stopped after {processed} job(s).'))
+
+    def _stop(self, signum, frame):
+        # Kończymy bieżące zadanie i wychodzimy z pętli.
+        self._stopping = True
@@ -0,0 +1,38 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Zadanie w kolejce opartej o bazę danych (bez zewnętrznego brokera)."""
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Oczekuje'
+        RUNNING = 'RUNNING', 'W trakcie'
+        DONE = 'DONE', 'Wykonane'
+        FAILED = 'FAILED', 'Nieudane'
+
+    name = models.CharField(max_length=100, verbose_name='Zadanie')
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    # Drugi enqueue z tym samym kluczem nie tworzy nowego zadania.
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now, verbose_name='Uruchom od')
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Zadanie w tle'
+        verbose_name_plural = 'Zadania w tle'
+        ordering = ['run_at', 'id']
+        indexes = [
+            # Worker pobiera zadania `WHERE status = PENDING AND run_at <= now ORDER BY run_at`.
+            models.Index(fields=['status', 'run_at'], name='jobs_job_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
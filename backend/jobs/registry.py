@@ -0,0 +1,40 @@
+"""
+Rejestr zadań: nazwa → funkcja.
+
+Zadania definiuje się w `<app>/tasks.py` (autodiscover w `JobsConfig.ready`)::
+
+    @task('ideas.notify_mentions')
+    def notify_mentions(comment_id): ...
+
+Argumenty zadania muszą dać się zapisać w JSON-ie (id zamiast obiektów).
+
+Zadanie może wykonać się więcej niż raz — ponowienie po błędzie albo po
+`lock_timeout` sekundach w stanie RUNNING (worker uznany za martwy, patrz
+`services.requeue_stale`) — więc musi być idempotentne. Zadania, które
+potrafią legalnie trwać dłużej niż `JOB_LOCK_TIMEOUT_SECONDS`, podają
+własny `lock_timeout`.
+"""
+TASKS = {}
+
+
+class UnknownTask(KeyError):
+    pass
+
+
+def task(name, *, max_attempts=5, lock_timeout=None):
+    def decorator(func):
+        if name in TASKS and TASKS[name] is not func:
+            raise ValueError(f'Task {name!r} is already registered.')
+        func.task_name = name
+        func.max_attempts = max_attempts
+        func.lock_timeout = lock_timeout
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def get_task(name):
+    try:
+        return TASKS[name]
+    except KeyError:
+        raise UnknownTask(name)
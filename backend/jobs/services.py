@@ -0,0 +1,180 @@
+"""
+Kolejka zadań w bazie danych.
+
+`enqueue` działa w jednym z trybów (`settings.JOB_QUEUE_MODE`):
+
+- `sync` — zadanie wykonuje się od razu, w bieżącym requeście (jak dawniej);
+- `on_commit` — w tym samym procesie, ale dopiero po commicie transakcji;
+- `worker` — zapisujemy wiersz `Job` w bieżącej transakcji (wycofanie requestu
+  wycofuje też zadanie), a wykonuje je `manage.py run_worker`.
+
+Worker pobiera zadania z `SELECT … FOR UPDATE SKIP LOCKED` (PostgreSQL) oraz
+warunkowym UPDATE-em statusu, więc kilka workerów nie weźmie tego samego
+zadania. Błąd zadania → ponowienie z wykładniczym odstępem, po
+`max_attempts` próbach status FAILED. Zadanie zbyt długo w stanie RUNNING
+(`lock_timeout`) wraca do kolejki — zadania muszą być idempotentne.
+"""
+import logging
+import traceback
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+from .registry import UnknownTask, get_task
+
+logger = logging.getLogger(__name__)
+
+MODE_SYNC = 'sync'
+MODE_ON_COMMIT = 'on_commit'
+MODE_WORKER = 'worker'
+
+
+def queue_mode():
+    return getattr(settings, 'JOB_QUEUE_MODE', MODE_SYNC)
+
+
+def _run_after_commit(name, payload):
+    try:
+        get_task(name)(**payload)
+    except Exception:
+        # Transakcja requestu jest już zatwierdzona — błąd tylko logujemy.
+        logger.exception('Job %s failed after commit', name)
+
+
+def enqueue(name, payload=None, *, key=None, delay=None, max_attempts=None):
+    """Zleca zadanie `name` z argumentami `payload` (dict serializowalny do JSON-a).
+
+    `key` (idempotency key) sprawia, że ponowne zlecenie tego samego zadania
+    w trybie `worker` jest ignorowane. Zwraca `Job` albo None (tryby in-process
+    i duplikaty).
+    """
+    func = get_task(name)
+    payload = payload or {}
+    mode = queue_mode()
+
+    if mode == MODE_SYNC:
+        func(**payload)
+        return None
+    if mode == MODE_ON_COMMIT:
+        transaction.on_commit(lambda: _run_after_commit(name, payload))
+        return None
+
+    job = Job(
+        name=name,
+        payload=payload,
+        idempotency_key=key,
+        max_attempts=max_attempts or func.max_attempts,
+        run_at=timezone.now() + (delay or timedelta(0)),
+    )
+    if key is None:
+        job.save()
+        return job
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        return None
+    return job
+
+
+def retry_delay(attempts):
+    base = getattr(settings, 'JOB_RETRY_BASE_SECONDS', 10)
+    cap = getattr(settings, 'JOB_RETRY_MAX_SECONDS', 3600)
+    return timedelta(seconds=min(cap, base * 2 ** max(0, attempts - 1)))
+
+
+def claim(worker_id, limit=10):
+    """Rezerwuje do `limit` zaległych zadań dla workera i zwraca je (attempts już podbite)."""
+    now = timezone.now()
+    claimed = []
+    with transaction.atomic():
+        due = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.Status.PENDING, run_at__lte=now)
+            .order_by('run_at', 'id')
+            .values_list('pk', flat=True)[:limit]
+        )
+        for pk in list(due):
+            # Warunkowy UPDATE chroni też bazy bez SKIP LOCKED (SQLite).
+            taken = Job.objects.filter(pk=pk, status=Job.Status.PENDING).update(
+                status=Job.Status.RUNNING,
+                locked_by=worker_id,
+                locked_at=now,
+                attempts=F('attempts') + 1,
+            )
+            if taken:
+                claimed.append(pk)
+    return list(Job.objects.filter(pk__in=claimed).order_by('run_at', 'id'))
+
+
+def run_job(job):
+    """Wykonuje zarezerwowane zadanie i zapisuje wynik. Zwraca True przy sukcesie."""
+    try:
+        func = get_task(job.name)
+        with transaction.atomic():
+            func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Job %s #%s failed (attempt %s/%s)', job.name, job.pk, job.attempts, job.max_attempts)
+        if job.attempts >= job.max_attempts:
+            fields = {'status': Job.Status.FAILED, 'finished_at': timezone.now()}
+        else:
+            fields = {'status': Job.Status.PENDING, 'run_at': timezone.now() + retry_delay(job.attempts)}
+        Job.objects.filter(pk=job.pk).update(locked_by='', locked_at=None, last_error=error, **fields)
+        return False
+
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.Status.DONE,
+        finished_at=timezone.now(),
+        locked_by='',
+        locked_at=None,
+        last_error='',
+    )
+    return True
+
+
+def lock_timeout(name, default=None):
+    """Po ilu sekundach w stanie RUNNING zadanie `name` uznajemy za porzucone."""
+    default = default or getattr(settings, 'JOB_LOCK_TIMEOUT_SECONDS', 600)
+    try:
+        return get_task(name).lock_timeout or default
+    except UnknownTask:
+        return default
+
+
+def requeue_stale(timeout=None):
+    """Zwraca do kolejki zadania porzucone przez workera, który padł w trakcie.
+
+    Limit czasu to `lock_timeout` zadania (`@task(lock_timeout=…)`), a gdy go
+    nie podano — `timeout` albo `JOB_LOCK_TIMEOUT_SECONDS`. Zadanie, które
+    wciąż działa dłużej, zostanie wykonane drugi raz — stąd wymóg idempotencji.
+    """
+    by_timeout = defaultdict(list)
+    running = Job.objects.filter(status=Job.Status.RUNNING).values_list('name', flat=True).distinct().order_by()
+    for name in running:
+        by_timeout[lock_timeout(name, timeout)].append(name)
+
+    now = timezone.now()
+    count = 0
+    for seconds, names in by_timeout.items():
+        stale = Job.objects.filter(
+            status=Job.Status.RUNNING, name__in=names, locked_at__lt=now - timedelta(seconds=seconds),
+        )
+        failed = stale.filter(attempts__gte=F('max_attempts')).update(
+            status=Job.Status.FAILED, finished_at=now, locked_by='', locked_at=None,
+        )
+        requeued = stale.update(status=Job.Status.PENDING, locked_by='', locked_at=None)
+        count += requeued + failed
+    return count
+
+
+def purge_finished(older_than):
+    """Usuwa wykonane zadania starsze niż `older_than` (timedelta); nieudane zostają do wglądu."""
+    cutoff = timezone.now() - older_than
+    deleted, _ = Job.objects.filter(status=Job.Status.DONE, finished_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from jobs import services
+from jobs.models import Job
+from jobs.registry import TASKS, task
+
+CALLS = []
+
+
+@task('tests.record', max_attempts=3)
+def record(value, fail_times=0):
+    CALLS.append(value)
+    if CALLS.count(value) <= fail_times:
+        raise RuntimeError('boom')
+
+
+@task('tests.slow', lock_timeout=3600)
+def slow():
+    pass
+
+
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_sync_mode_runs_inline(self):
+        with override_settings(JOB_QUEUE_MODE='sync'):
+            self.assertIsNone(services.enqueue('tests.record', {'value': 'a'}))
+        self.assertEqual(CALLS, ['a'])
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(JOB_QUEUE_MODE='worker')
+    def test_idempotency_key_deduplicates(self):
+        first = services.enqueue('tests.record', {'value': 'a'}, key='k1')
+        second = services.enqueue('tests.record', {'value': 'a'}, key='k1')
+        self.assertIsNotNone(first)
+        self.assertIsNone(second)
+        self.assertEqual(Job.objects.count(), 1)
+        self.assertEqual(CALLS, [])
+
+    @override_settings(JOB_QUEUE_MODE='worker', JOB_RETRY_BASE_SECONDS=0)
+    def test_worker_retries_then_succeeds(self):
+        services.enqueue('tests.record', {'value': 'b', 'fail_times': 1})
+
+        job, = services.claim('w1')
+        self.assertEqual(job.status, Job.Status.RUNNING)
+        self.assertEqual(services.claim('w2'), [])
+        self.assertFalse(services.run_job(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.PENDING, 1))
+        self.assertIn('RuntimeError', job.last_error)
+
+        job, = services.claim('w1')
+        self.assertTrue(services.run_job(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.DONE, 2))
+        self.assertEqual(CALLS, ['b', 'b'])
+
+    @override_settings(JOB_QUEUE_MODE='worker', JOB_RETRY_BASE_SECONDS=0)
+    def test_worker_gives_up_after_max_attempts(self):
+        services.enqueue('tests.record', {'value': 'c', 'fail_times': 10})
+        for _ in range(3):
+            job, = services.claim('w1')
+            services.run_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertEqual(services.claim('w1'), [])
+
+    def test_registered_side_effect_tasks(self):
+        for name in ('gamification.award', 'ideas.notify_mentions', 'images.refresh_renditions'):
+            self.assertIn(name, TASKS)
+
+    @override_settings(JOB_QUEUE_MODE='worker', JOB_LOCK_TIMEOUT_SECONDS=600)
+    def test_requeue_stale_uses_task_lock_timeout(self):
+        quick = services.enqueue('tests.record', {'value': 'd'})
+        long = services.enqueue('tests.slow')
+        services.claim('w1')
+        Job.objects.update(locked_at=timezone.now() - timedelta(minutes=20))
+
+        self.assertEqual(services.requeue_stale(), 1)
+        quick.refresh_from_db()
+        long.refresh_from_db()
+        self.assertEqual(quick.status, Job.Status.PENDING)
+        self.assertEqual(long.status, Job.Status.RUNNING)
+
+        Job.objects.filter(pk=long.pk).update(locked_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(services.requeue_stale(), 1)
+        long.refresh_from_db()
+        self.assertEqual(long.status, Job.Status.PENDING)
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class RealtimeConfig(AppConfig):
+    name = 'realtime'
+    verbose_name = 'Powiadomienia na żywo'
+
+    def ready(self):
+        # Publikacja zdarzeń na sygnałach powiadomień i naliczeń punktów.
+        from . import checks, handlers  # noqa: F401
@@ -0,0 +1,77 @@
+"""Uwierzytelnianie połączeń na żywo.
+
+Nagłówek `Authorization: Bearer <access JWT>` działa jak w API. `EventSource`
+i WebSocket w przeglądarce nie ustawią nagłówka, więc klient pobiera wtedy
+bilet (`POST /api/realtime/ticket/`) i podaje go w `?ticket=`. Bilet jest
+jednorazowy i ważny `REALTIME_TICKET_SECONDS` s — w logach dostępu serwera
+zostaje tylko zużyty, krótkotrwały ciąg, a nie token dostępowy.
+
+Bilety leżą w domyślnym cache — przy kilku procesach serwera musi być
+wspólny (check `realtime.W001`).
+"""
+import secrets
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+TICKET_KEY = 'realtime:ticket:{}'
+TICKET_MAX_LENGTH = 64
+
+
+def ticket_seconds():
+    return getattr(settings, 'REALTIME_TICKET_SECONDS', 30)
+
+
+def issue_ticket(user):
+    ticket = secrets.token_urlsafe(32)
+    cache.set(TICKET_KEY.format(ticket), user.pk, ticket_seconds())
+    return ticket
+
+
+def user_for_ticket(ticket):
+    if not ticket or len(ticket) > TICKET_MAX_LENGTH:
+        return None
+    key = TICKET_KEY.format(ticket)
+    user_id = cache.get(key)
+    # `delete` zwraca False, gdy ktoś zużył bilet przed nami.
+    if user_id is None or not cache.delete(key):
+        return None
+    return get_user_model().objects.filter(pk=user_id, is_active=True).first()
+
+
+def user_for_token(raw_token):
+    if not raw_token:
+        return None
+    authentication = JWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+
+def _bearer(header):
+    parts = (header or '').split()
+    if len(parts) == 2 and parts[0] == 'Bearer':
+        return parts[1]
+    return None
+
+
+def user_from_request(request):
+    token = _bearer(request.headers.get('Authorization'))
+    if token is not None:
+        return user_for_token(token)
+    return user_for_ticket(request.GET.get('ticket'))
+
+
+def user_from_scope(scope):
+    headers = dict(scope.get('headers') or ())
+    token = _bearer(headers.get(b'authorization', b'').decode('latin-1'))
+    if token is not None:
+        return user_for_token(token)
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    return user_for_ticket((query.get('ticket') or [None])[0])
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Warning, register
+from django.utils.module_loading import import_string
+
+from .hub import InMemoryHub, RedisHub
+
+
+@register()
+def check_hub(app_configs, **kwargs):
+    """InMemoryHub nie dostarczy zdarzeń z osobnego procesu workera zadań."""
+    hub_class = import_string(getattr(settings, 'REALTIME_HUB', 'realtime.hub.InMemoryHub'))
+    if getattr(settings, 'JOB_QUEUE_MODE', 'sync') != 'worker' or issubclass(hub_class, RedisHub):
+        return []
+    if issubclass(hub_class, InMemoryHub):
+        return [Error(
+            'REALTIME_HUB=InMemoryHub cannot deliver events published by the job worker.',
+            hint='Set REALTIME_HUB=realtime.hub.RedisHub (and REALTIME_REDIS_URL) when JOB_QUEUE_MODE=worker.',
+            id='realtime.E001',
+        )]
+    return []
+
+
+def _uses_local_cache():
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    return issubclass(import_string(backend), LocMemCache) if backend else False
+
+
+@register()
+def check_cache(app_configs, **kwargs):
+    """Worker i serwer WWW muszą dzielić cache (wersja konfiguracji gamifikacji, cache analityki)."""
+    if getattr(settings, 'JOB_QUEUE_MODE', 'sync') != 'worker' or not _uses_local_cache():
+        return []
+    return [Error(
+        'LocMemCache is process-local: the job worker would not see cache versions bumped by the web server.',
+        hint='Set CACHE_BACKEND=django.core.cache.backends.redis.RedisCache (and CACHE_LOCATION) '
+             'when JOB_QUEUE_MODE=worker.',
+        id='realtime.E002',
+    )]
+
+
+@register()
+def check_ticket_cache(app_configs, **kwargs):
+    """Bilety SSE / WebSocket (`auth.issue_ticket`) leżą w domyślnym cache."""
+    hub_class = import_string(getattr(settings, 'REALTIME_HUB', 'realtime.hub.InMemoryHub'))
+    if not issubclass(hub_class, RedisHub) or not _uses_local_cache():
+        return []
+    return [Warning(
+        'Realtime tickets are stored in LocMemCache: a ticket issued by one server process '
+        'is rejected by another.',
+        hint='Use a shared CACHE_BACKEND (e.g. django.core.cache.backends.redis.RedisCache) '
+             'when running several server processes with RedisHub.',
+        id='realtime.W001',
+    )]
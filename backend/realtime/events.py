@@ -0,0 +1,76 @@
+"""
+Zdarzenia wypychane klientom. Każde to `{'type': ..., 'data': {...}}`:
+
+- `notification` — nowe powiadomienie (jak w `GET /api/notifications/`),
+- `unread_count` — liczba nieprzeczytanych powiadomień,
+- `points` — naliczone punkty i nowe saldo (naliczenia hurtowe
+  `award_many` go nie wysyłają),
+- `leaderboard` — ranking się zmienił (klient pobiera go ponownie);
+  rozgłaszane najwyżej raz na `REALTIME_LEADERBOARD_THROTTLE_SECONDS`.
+
+Publikujemy po commicie, żeby klient pobierający dane po zdarzeniu już je widział.
+Zapis jest wtedy już zatwierdzony, więc błąd huba (np. niedostępny Redis)
+tylko logujemy (`robust=True`) — żądanie nie kończy się 500.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .hub import get_hub
+
+LEADERBOARD_THROTTLE_KEY = 'realtime:leaderboard:throttle'
+
+
+def event(event_type, data):
+    return {'type': event_type, 'data': data}
+
+
+def unread_count_event(user_id):
+    from ideas.models import Notification
+    count = Notification.objects.filter(recipient_id=user_id, read_at__isnull=True).count()
+    return event('unread_count', {'count': count})
+
+
+def publish_later(user_id, build):
+    """Po commicie buduje zdarzenie (`build()`) i wysyła je użytkownikowi."""
+    transaction.on_commit(lambda: get_hub().publish(user_id, build()), robust=True)
+
+
+def notification_created(notification):
+    from ideas.serializers import NotificationSerializer
+
+    def publish():
+        hub = get_hub()
+        hub.publish(notification.recipient_id, event('notification', NotificationSerializer(notification).data))
+        hub.publish(notification.recipient_id, unread_count_event(notification.recipient_id))
+
+    transaction.on_commit(publish, robust=True)
+
+
+def unread_count_changed(user_id):
+    publish_later(user_id, lambda: unread_count_event(user_id))
+
+
+def points_awarded(txn):
+    from gamification.models import UserGamificationProfile
+
+    def build():
+        total = (
+            UserGamificationProfile.objects.filter(user_id=txn.user_id)
+            .values_list('total_points', flat=True).first()
+        )
+        return event('points', {'action': txn.action, 'points': txn.points, 'total_points': total})
+
+    publish_later(txn.user_id, build)
+    leaderboard_changed()
+
+
+def leaderboard_changed():
+    throttle = getattr(settings, 'REALTIME_LEADERBOARD_THROTTLE_SECONDS', 10)
+
+    def publish():
+        # `add` jest atomowe we wspólnym cache — rozgłasza tylko pierwszy proces w oknie.
+        if throttle <= 0 or cache.add(LEADERBOARD_THROTTLE_KEY, 1, throttle):
+            get_hub().broadcast(event('leaderboard', {}))
+
+    transaction.on_commit(publish, robust=True)
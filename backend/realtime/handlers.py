@@ -0,0 +1,41 @@
+"""
+Źródła zdarzeń na żywo — sygnały `ideas` i `gamification` (kierunek
+zależności: realtime → ideas / gamification; tamte nie wiedzą o realtime).
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from gamification.models import PointTransaction
+from gamification.signals import points_bulk_awarded
+from ideas.models import Notification
+from ideas.signals import notifications_read
+
+from . import events
+
+
+@receiver(post_save, sender=Notification)
+def _on_notification_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        events.notification_created(instance)
+    else:
+        # Np. `mark_read` — zmienia się tylko licznik nieprzeczytanych.
+        events.unread_count_changed(instance.recipient_id)
+
+
+@receiver(notifications_read)
+def _on_notifications_read(sender, user_id, **kwargs):
+    events.unread_count_changed(user_id)
+
+
+@receiver(post_save, sender=PointTransaction)
+def _on_points(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        events.points_awarded(instance)
+
+
+@receiver(points_bulk_awarded)
+def _on_points_bulk_awarded(sender, user_ids, **kwargs):
+    # Backfill / import: bez zdarzeń `points` per transakcja, tylko zmiana rankingu.
+    events.leaderboard_changed()
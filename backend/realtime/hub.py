@@ -0,0 +1,151 @@
+"""
+Rozsyłka zdarzeń do podłączonych klientów (SSE / WebSocket).
+
+Połączenie zapisuje się w hubie (`subscribe(user_id)`) i czyta zdarzenia ze
+swojej kolejki `asyncio`. `publish` / `broadcast` wołane są z kodu
+synchronicznego (sygnały, zadania) — zdarzenie trafia do pętli połączenia
+przez `call_soon_threadsafe`.
+
+- `InMemoryHub` — fan-out w obrębie jednego procesu (domyślny).
+- `RedisHub` — publikacja przez Redis pub/sub; każdy proces ma wątek
+  nasłuchujący, który oddaje zdarzenia lokalnym połączeniom. Potrzebny, gdy
+  serwerów ASGI jest kilka albo zdarzenia powstają w workerze zadań.
+
+Backend wybiera `REALTIME_HUB` (ścieżka klasy), opcje — `REALTIME_HUB_OPTIONS`.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Kolejka zdarzeń jednego połączenia, związana z jego pętlą zdarzeń."""
+
+    def __init__(self, hub, user_id, maxsize):
+        self.hub = hub
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+    def offer(self, event):
+        # Wolny klient nie blokuje rozsyłki — najstarsze zdarzenie przepada.
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+
+class InMemoryHub:
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Nowa subskrypcja; wołać z wnętrza pętli zdarzeń połączenia."""
+        subscription = Subscription(self, user_id, self.queue_size)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id, event):
+        """Zdarzenie dla wszystkich połączeń użytkownika."""
+        self.deliver(user_id, event)
+
+    def broadcast(self, event):
+        """Zdarzenie dla wszystkich połączeń."""
+        self.deliver(None, event)
+
+    def deliver(self, user_id, event):
+        with self._lock:
+            if user_id is None:
+                targets = [s for subscriptions in self._subscriptions.values() for s in subscriptions]
+            else:
+                targets = list(self._subscriptions.get(user_id, ()))
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError:
+                # Pętla połączenia już zamknięta — połączenie nie zdążyło się wypisać.
+                self.unsubscribe(subscription)
+
+    def connection_count(self):
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+
+class RedisHub(InMemoryHub):
+    def __init__(self, url=None, channel='kaizen:realtime', **kwargs):
+        super().__init__(**kwargs)
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImproperlyConfigured('RedisHub requires the "redis" package.') from exc
+        self.channel = channel
+        self._redis = redis.Redis.from_url(url or 'redis://localhost:6379/0')
+        self._listener = None
+
+    def publish(self, user_id, event):
+        self._redis.publish(self.channel, json.dumps({'user_id': user_id, 'event': event}, cls=DjangoJSONEncoder))
+
+    def broadcast(self, event):
+        self.publish(None, event)
+
+    def subscribe(self, user_id):
+        self._ensure_listener()
+        return super().subscribe(user_id)
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='realtime-redis', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    payload = json.loads(message['data'])
+                    self.deliver(payload['user_id'], payload['event'])
+            except Exception:
+                logger.exception('Realtime Redis listener failed, reconnecting')
+                time.sleep(1)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                hub_class = import_string(getattr(settings, 'REALTIME_HUB', 'realtime.hub.InMemoryHub'))
+                _hub = hub_class(**getattr(settings, 'REALTIME_HUB_OPTIONS', {}))
+    return _hub
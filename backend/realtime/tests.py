@@ -0,0 +1,237 @@
+import asyncio
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from gamification.models import Action
+from gamification.services import engine
+from ideas.models import Category, KaizenPost, Notification
+from realtime.auth import issue_ticket
+from realtime.checks import check_cache, check_hub, check_ticket_cache
+from realtime.hub import InMemoryHub, get_hub
+from realtime.websocket import CLOSE_UNAUTHORIZED, websocket_application
+
+User = get_user_model()
+
+
+class HubTests(TestCase):
+    def test_publish_reaches_only_the_users_connections_and_broadcast_reaches_all(self):
+        hub = InMemoryHub(queue_size=2)
+
+        async def scenario():
+            first, second, other = hub.subscribe(1), hub.subscribe(1), hub.subscribe(2)
+            hub.publish(1, {'type': 'a'})
+            hub.broadcast({'type': 'b'})
+            await asyncio.sleep(0)
+            received = [
+                [await subscription.get() for _ in range(subscription.queue.qsize())]
+                for subscription in (first, second, other)
+            ]
+            for subscription in (first, second, other):
+                subscription.close()
+            return received
+
+        first, second, other = asyncio.run(scenario())
+        self.assertEqual(first, [{'type': 'a'}, {'type': 'b'}])
+        self.assertEqual(second, first)
+        self.assertEqual(other, [{'type': 'b'}])
+        self.assertEqual(hub.connection_count(), 0)
+
+    def test_slow_connection_drops_oldest_events(self):
+        hub = InMemoryHub(queue_size=2)
+
+        async def scenario():
+            subscription = hub.subscribe(1)
+            for n in range(3):
+                hub.publish(1, {'n': n})
+            await asyncio.sleep(0)
+            received = [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+            subscription.close()
+            return received
+
+        self.assertEqual(asyncio.run(scenario()), [{'n': 1}, {'n': 2}])
+
+
+class EventPublishingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='odbiorca', password='pass')
+        self.actor = User.objects.create_user(username='aktor', password='pass')
+        self.post = KaizenPost.objects.create(
+            author=self.user, category=Category.objects.create(name='Ogólne'), title='T', content='C',
+        )
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.subscription = self.loop.run_until_complete(self._subscribe())
+        self.addCleanup(self.subscription.close)
+
+    async def _subscribe(self):
+        return get_hub().subscribe(self.user.pk)
+
+    def _received(self):
+        self.loop.run_until_complete(asyncio.sleep(0))
+        queue = self.subscription.queue
+        return [queue.get_nowait() for _ in range(queue.qsize())]
+
+    def test_new_notification_is_pushed_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            notification = Notification.objects.create(
+                recipient=self.user, actor=self.actor, post=self.post, type=Notification.Type.LIKE,
+            )
+        self.assertEqual(self._received(), [])
+
+        for callback in callbacks:
+            callback()
+        events = self._received()
+        self.assertEqual([event['type'] for event in events], ['notification', 'unread_count'])
+        self.assertEqual(events[0]['data']['id'], notification.pk)
+        self.assertEqual(events[1]['data'], {'count': 1})
+
+    def test_mark_all_read_pushes_unread_count(self):
+        Notification.objects.create(recipient=self.user, actor=self.actor, post=self.post, type=Notification.Type.LIKE)
+        self._received()
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(reverse('notification-mark-all-read'))
+
+        self.assertEqual(self._received(), [{'type': 'unread_count', 'data': {'count': 0}}])
+
+    @override_settings(REALTIME_LEADERBOARD_THROTTLE_SECONDS=0)
+    def test_bulk_award_broadcasts_leaderboard_once(self):
+        awards = [
+            {'user_id': self.user.pk, 'action': Action.IDEA_CREATED, 'points_override': 5, 'dedupe_key': f'import:{n}'}
+            for n in range(3)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(engine.award_many(awards), 3)
+        self.assertEqual(self._received(), [{'type': 'leaderboard', 'data': {}}])
+
+
+    def test_hub_failure_does_not_fail_committed_write(self):
+        client = APIClient()
+        client.force_authenticate(self.actor)
+        hub = get_hub()
+        failure = ConnectionError('Redis niedostępny')
+        with mock.patch.object(hub, 'publish', side_effect=failure), \
+                mock.patch.object(hub, 'broadcast', side_effect=failure), \
+                self.assertLogs(level='ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.post(
+                    reverse('post-comments', args=[self.post.pk]), {'text': 'Działa'}, format='json',
+                )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Notification.objects.filter(recipient=self.user, post=self.post).exists())
+
+
+class ConnectionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='klient', password='pass')
+
+    def test_event_stream_requires_asgi(self):
+        response = self.client.get(reverse('realtime-events'), {'ticket': issue_ticket(self.user)})
+        self.assertEqual(response.status_code, 501)
+
+    def test_ticket_endpoint_requires_authentication(self):
+        client = APIClient()
+        self.assertEqual(client.post(reverse('realtime-ticket')).status_code, 401)
+        client.force_authenticate(self.user)
+        response = client.post(reverse('realtime-ticket'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['ticket'])
+
+    async def test_event_stream_starts_with_unread_count(self):
+        ticket = await sync_to_async(issue_ticket)(self.user)
+        response = await AsyncClient().get(reverse('realtime-events'), {'ticket': ticket})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        first = await anext(stream)
+        await stream.aclose()
+        self.assertEqual(first, b'event: unread_count\ndata: {"count": 0}\n\n')
+
+    async def test_event_stream_rejects_anonymous(self):
+        response = await AsyncClient().get(reverse('realtime-events'))
+        self.assertEqual(response.status_code, 401)
+
+    async def test_event_stream_rejects_access_token_in_url_and_reused_ticket(self):
+        client = AsyncClient()
+        token = str(AccessToken.for_user(self.user))
+        response = await client.get(reverse('realtime-events'), {'token': token, 'ticket': token})
+        self.assertEqual(response.status_code, 401)
+
+        ticket = await sync_to_async(issue_ticket)(self.user)
+        first = await client.get(reverse('realtime-events'), {'ticket': ticket})
+        await first.streaming_content.aclose()
+        second = await client.get(reverse('realtime-events'), {'ticket': ticket})
+        self.assertEqual((first.status_code, second.status_code), (200, 401))
+
+    async def test_event_stream_accepts_bearer_header(self):
+        token = str(AccessToken.for_user(self.user))
+        response = await AsyncClient().get(reverse('realtime-events'), headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        await response.streaming_content.aclose()
+
+    async def test_websocket_without_valid_token_is_closed(self):
+        sent = []
+
+        async def receive():
+            return {'type': 'websocket.connect'}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'websocket', 'path': '/ws/', 'headers': [], 'query_string': b'ticket=zepsuty'}
+        await websocket_application(scope, receive, send)
+        self.assertEqual(sent, [{'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED}])
+
+    async def test_websocket_sends_unread_count_then_closes_on_disconnect(self):
+        ticket = await sync_to_async(issue_ticket)(self.user)
+        incoming = asyncio.Queue()
+        await incoming.put({'type': 'websocket.connect'})
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+            if message['type'] == 'websocket.send':
+                await incoming.put({'type': 'websocket.disconnect', 'code': 1000})
+
+        scope = {'type': 'websocket', 'path': '/ws/', 'headers': [], 'query_string': f'ticket={ticket}'.encode()}
+        await asyncio.wait_for(websocket_application(scope, incoming.get, send), 5)
+
+        self.assertEqual(sent[0], {'type': 'websocket.accept'})
+        self.assertEqual(json.loads(sent[1]['text']), {'type': 'unread_count', 'data': {'count': 0}})
+        self.assertEqual(get_hub().connection_count(), 0)
+
+
+class HubCheckTests(TestCase):
+    @override_settings(JOB_QUEUE_MODE='worker', REALTIME_HUB='realtime.hub.InMemoryHub')
+    def test_worker_mode_requires_shared_hub(self):
+        self.assertEqual([error.id for error in check_hub(None)], ['realtime.E001'])
+
+    @override_settings(JOB_QUEUE_MODE='worker', REALTIME_HUB='realtime.hub.RedisHub')
+    def test_redis_hub_passes(self):
+        self.assertEqual(check_hub(None), [])
+
+    @override_settings(JOB_QUEUE_MODE='worker')
+    def test_worker_mode_requires_shared_cache(self):
+        self.assertEqual([error.id for error in check_cache(None)], ['realtime.E002'])
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://redis:6379/1'}}
+        with override_settings(CACHES=redis):
+            self.assertEqual(check_cache(None), [])
+
+    def test_local_cache_passes_without_worker(self):
+        self.assertEqual(check_cache(None), [])
+
+    @override_settings(REALTIME_HUB='realtime.hub.RedisHub')
+    def test_redis_hub_warns_about_local_ticket_cache(self):
+        self.assertEqual([warning.id for warning in check_ticket_cache(None)], ['realtime.W001'])
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://redis:6379/1'}}
+        with override_settings(CACHES=redis):
+            self.assertEqual(check_ticket_cache(None), [])
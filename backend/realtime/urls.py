@@ -0,0 +1,8 @@
+from django.urls import path
+
+from .views import TicketView, event_stream
+
+urlpatterns = [
+    path('events/', event_stream, name='realtime-events'),
+    path('ticket/', TicketView.as_view(), name='realtime-ticket'),
+]
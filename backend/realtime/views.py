@@ -0,0 +1,66 @@
+"""
+Strumień zdarzeń na żywo przez Server-Sent Events (`GET /api/realtime/events/`).
+
+Widok jest asynchroniczny i wymaga serwera ASGI (np. `uvicorn app.asgi:application`)
+— pod WSGI Django musiałby najpierw skonsumować cały, nieskończony strumień.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import events
+from .auth import issue_ticket, ticket_seconds, user_from_request
+from .hub import get_hub
+
+
+class TicketView(APIView):
+    """Jednorazowy bilet do `?ticket=` dla SSE / WebSocket (zamiast JWT w adresie)."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        return Response({'ticket': issue_ticket(request.user), 'expires_in': ticket_seconds()})
+
+
+def heartbeat_seconds():
+    return getattr(settings, 'REALTIME_HEARTBEAT_SECONDS', 25)
+
+
+def format_sse(event):
+    data = json.dumps(event['data'], cls=DjangoJSONEncoder)
+    return f"event: {event['type']}\ndata: {data}\n\n"
+
+
+async def _stream(user_id):
+    subscription = get_hub().subscribe(user_id)
+    try:
+        yield format_sse(await sync_to_async(events.unread_count_event)(user_id))
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), heartbeat_seconds())
+            except asyncio.TimeoutError:
+                # Komentarz SSE podtrzymuje połączenie przez proxy i pozwala wykryć rozłączenie.
+                yield ': ping\n\n'
+                continue
+            yield format_sse(event)
+    finally:
+        subscription.close()
+
+
+async def event_stream(request):
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'detail': 'Event stream requires an ASGI server.'}, status=501)
+    user = await sync_to_async(user_from_request)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    response = StreamingHttpResponse(_stream(user.pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
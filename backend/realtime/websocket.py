@@ -0,0 +1,61 @@
+"""
+Kanał WebSocket (`/ws/`) jako czysta aplikacja ASGI — bez Django Channels.
+
+Klient łączy się z `?ticket=<bilet>` (`realtime.auth`) albo nagłówkiem
+`Authorization: Bearer` i dostaje te same zdarzenia co przez
+SSE, jako wiadomości tekstowe JSON. Brak/nieważny bilet zamyka połączenie
+kodem 4401. Wiadomości od klienta są ignorowane.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+from . import events
+from .auth import user_from_scope
+from .hub import get_hub
+from .views import heartbeat_seconds
+
+CLOSE_UNAUTHORIZED = 4401
+
+
+def _text(event):
+    return {'type': 'websocket.send', 'text': json.dumps(event, cls=DjangoJSONEncoder)}
+
+
+async def websocket_application(scope, receive, send):
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    user = await sync_to_async(user_from_scope)(scope)
+    if user is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+        return
+
+    await send({'type': 'websocket.accept'})
+    subscription = get_hub().subscribe(user.pk)
+    incoming = outgoing = None
+    try:
+        await send(_text(await sync_to_async(events.unread_count_event)(user.pk)))
+        incoming = asyncio.ensure_future(receive())
+        outgoing = asyncio.ensure_future(subscription.get())
+        while True:
+            done, _ = await asyncio.wait(
+                {incoming, outgoing}, timeout=heartbeat_seconds(), return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                await send(_text(events.event('ping', {})))
+                continue
+            if incoming in done:
+                if incoming.result()['type'] == 'websocket.disconnect':
+                    return
+                incoming = asyncio.ensure_future(receive())
+            if outgoing in done:
+                await send(_text(outgoing.result()))
+                outgoing = asyncio.ensure_future(subscription.get())
+    finally:
+        for task in (incoming, outgoing):
+            if task is not None and not task.done():
+                task.cancel()
+        subscription.close()
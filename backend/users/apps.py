@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class UsersConfig(AppConfig):
     name = 'users'
+
+    def ready(self):
+        # Sygnały generujące miniatury awatara.
+        from . import signals  # noqa: F401
@@ -1,31 +1,19 @@
 import base64
-import io
 import uuid
 
 from django.core.files.base import ContentFile
-from PIL import Image
 from rest_framework import serializers
 
-try:
-    from pillow_heif import register_heif_opener
-    register_heif_opener()
-except ImportError:
-    pass
+# Import rejestruje też opener HEIC (pillow_heif), jeśli jest zainstalowany.
+from .images import SNIFF_BYTES, sniff_format
 
 
 class Base64ImageField(serializers.ImageField):
     """Akceptuje obraz jako string base64 (z lub bez prefixu data:...) lub natywny upload."""
 
     def _get_extension(self, decoded):
-        try:
-            image = Image.open(io.BytesIO(decoded))
-            image_format = image.format
-            if not image_format:
-                return 'jpg'
-            image_format = image_format.lower()
-            return 'jpg' if image_format == 'jpeg' else image_format
-        except Exception:
-            return 'jpg'
+        # Sam nagłówek wystarcza — bez dekodowania całego obrazu.
+        return sniff_format(decoded[:SNIFF_BYTES]) or 'jpg'
 
     def to_internal_value(self, data):
         if isinstance(data, str):
@@ -0,0 +1,218 @@
+"""
+Rendycje obrazów (miniatury w kilku szerokościach, WebP + JPEG).
+
+Telefony wysyłają zdjęcia po kilka–kilkanaście MB, a karty feedu i awatary
+potrzebują ułamka tej rozdzielczości. `generate_renditions` tworzy obok
+oryginału warianty o stałych szerokościach `WIDTHS`, z obrotem wg EXIF
+i bez metadanych (EXIF z GPS-em, profil aparatu itd. nie trafiają do plików).
+
+Wynik zapisujemy w JSONField modelu (`PostImage.renditions`,
+`CustomUser.avatar_renditions`) w postaci::
+
+    {"source": "<nazwa oryginału>", "items": [
+        {"name": "...", "format": "webp", "width": 320, "height": 240}, ...]}
+
+`source` pozwala wykryć, że oryginał się zmienił (np. nowy awatar).
+Pliki poprzednich rendycji usuwamy po wygenerowaniu nowych oraz po usunięciu
+obiektu (`delete_renditions_later`).
+"""
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from jobs.services import enqueue
+
+try:
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = (320, 640, 1280)
+FORMATS = {
+    # format: (rozszerzenie, parametry zapisu Pillow)
+    'webp': ('webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+# Sygnatury nagłówków; `sniff_format` patrzy tylko na pierwsze `SNIFF_BYTES` bajtów.
+SNIFF_BYTES = 32
+_HEIF_BRANDS = {b'heic', b'heix', b'hevc', b'hevx', b'heim', b'heis', b'mif1', b'msf1'}
+
+
+def sniff_format(head):
+    """Rozszerzenie pliku obrazu rozpoznane po nagłówku albo None.
+
+    Nie dekoduje obrazu — wystarcza kilkadziesiąt początkowych bajtów.
+    """
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    if head[4:8] == b'ftyp' and head[8:12] in _HEIF_BRANDS:
+        return 'heic'
+    if head[:4] in (b'II*\x00', b'MM\x00*'):
+        return 'tiff'
+    if head[:2] == b'BM':
+        return 'bmp'
+    return None
+
+
+def sniff_file(uploaded):
+    """`sniff_format` dla pliku (upload / File) — czyta nagłówek i przewija z powrotem."""
+    uploaded.seek(0)
+    head = uploaded.read(SNIFF_BYTES)
+    uploaded.seek(0)
+    return sniff_format(head)
+
+
+def is_current(renditions, field_file):
+    """Czy zapisane rendycje dotyczą aktualnego pliku."""
+    return bool(field_file) and (renditions or {}).get('source') == field_file.name
+
+
+def _target_widths(width):
+    widths = [w for w in WIDTHS if w < width]
+    # Mniejszy od najmniejszej szerokości oryginał i tak dostaje wersję bez metadanych.
+    return widths or [width]
+
+
+def _prepare(image, fmt):
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    if image.mode not in ('RGB', 'RGBA'):
+        return image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    return image
+
+
+def generate_renditions(field_file):
+    """Tworzy rendycje dla `field_file` i zwraca ich opis (patrz docstring modułu).
+
+    Błędy dekodowania nie przerywają uploadu — zwracamy pustą listę `items`,
+    a klienci używają wtedy oryginalnego URL-a.
+    """
+    storage = field_file.storage
+    result = {'source': field_file.name, 'items': []}
+    try:
+        with field_file.open('rb') as fh:
+            image = Image.open(fh)
+            width, height = image.size
+            widths = _target_widths(width)
+            # Dekodowanie JPEG od razu w zmniejszonej skali (1/2, 1/4, 1/8) — dużo szybsze.
+            image.draft('RGB', (max(widths), max(widths)))
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except Exception:
+        logger.warning('Cannot decode image %s, skipping renditions', field_file.name, exc_info=True)
+        return result
+
+    stem, _ = os.path.splitext(field_file.name)
+    for target in _target_widths(image.width):
+        target_height = max(1, round(image.height * target / image.width))
+        resized = image.resize((target, target_height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        for fmt, (extension, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            # Bez `exif=` / `icc_profile=` Pillow nie przepisuje metadanych oryginału.
+            _prepare(resized, fmt).save(buffer, format=fmt.upper(), **options)
+            name = storage.save(f'{stem}_{target}w.{extension}', ContentFile(buffer.getvalue()))
+            result['items'].append({
+                'name': name,
+                'format': fmt,
+                'width': target,
+                'height': target_height,
+            })
+    return result
+
+
+def needs_refresh(instance, file_attr, renditions_attr):
+    """Czy rendycje trzeba wygenerować albo wyczyścić (bez dotykania plików)."""
+    field_file = getattr(instance, file_attr)
+    current = getattr(instance, renditions_attr) or {}
+    if not field_file:
+        return bool(current)
+    return not is_current(current, field_file)
+
+
+def refresh_renditions(instance, file_attr, renditions_attr, force=False):
+    """Generuje brakujące / nieaktualne rendycje i zapisuje je `update()`-em (bez sygnałów).
+
+    Zwraca True, jeśli coś zapisano.
+    """
+    if not force and not needs_refresh(instance, file_attr, renditions_attr):
+        return False
+    field_file = getattr(instance, file_attr)
+    previous = type(instance)._default_manager.filter(pk=instance.pk).values_list(
+        renditions_attr, flat=True,
+    ).first()
+    renditions = generate_renditions(field_file) if field_file else {}
+
+    type(instance)._default_manager.filter(pk=instance.pk).update(**{renditions_attr: renditions})
+    setattr(instance, renditions_attr, renditions)
+    kept = {item['name'] for item in renditions.get('items', ())}
+    delete_renditions(previous, field_file.storage, keep=kept)
+    return True
+
+
+def delete_renditions(renditions, storage, keep=()):
+    """Usuwa pliki rendycji opisane w `renditions` (poza nazwami z `keep`)."""
+    for item in (renditions or {}).get('items') or []:
+        if item['name'] in keep:
+            continue
+        try:
+            storage.delete(item['name'])
+        except Exception:
+            logger.warning('Cannot delete rendition %s', item['name'], exc_info=True)
+
+
+def delete_renditions_later(instance, file_attr, renditions_attr):
+    """Po commicie usuwa pliki rendycji usuniętego obiektu (sygnał `post_delete`)."""
+    renditions = getattr(instance, renditions_attr)
+    if not (renditions or {}).get('items'):
+        return
+    storage = getattr(instance, file_attr).storage
+    transaction.on_commit(lambda: delete_renditions(renditions, storage))
+
+
+def refresh_renditions_later(instance, file_attr, renditions_attr):
+    """Zleca generowanie rendycji kolejce zadań, jeśli są potrzebne (zadanie `images.refresh_renditions`)."""
+    if not needs_refresh(instance, file_attr, renditions_attr):
+        return
+    field_file = getattr(instance, file_attr)
+    label = instance._meta.label
+    enqueue(
+        'images.refresh_renditions',
+        {'model': label, 'pk': instance.pk, 'file_attr': file_attr, 'renditions_attr': renditions_attr},
+        key=f'renditions:{label}:{instance.pk}:{field_file.name if field_file else ""}',
+    )
+
+
+def srcset(renditions, storage, request=None):
+    """`{'webp': 'url 320w, url 640w', 'jpeg': ...}` albo None, gdy brak rendycji."""
+    items = (renditions or {}).get('items') or []
+    if not items:
+        return None
+    result = {}
+    for fmt in FORMATS:
+        candidates = []
+        for item in sorted((i for i in items if i['format'] == fmt), key=lambda i: i['width']):
+            url = storage.url(item['name'])
+            if request:
+                url = request.build_absolute_uri(url)
+            candidates.append(f"{url} {item['width']}w")
+        if candidates:
+            result[fmt] = ', '.join(candidates)
+    return result
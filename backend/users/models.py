@@ -51,6 +51,8 @@ class CustomUser(AbstractUser):
         blank=True,
         verbose_name='Awatar',
     )
+    # Miniatury awatara (users.images), odświeżane przy zmianie pliku.
+    avatar_renditions = models.JSONField(default=dict, blank=True, editable=False)
     department = models.ForeignKey(
         Department,
         on_delete=models.SET_NULL,
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 
 from .fields import Base64ImageField
+from .images import srcset
 
 User = get_user_model()
 
@@ -16,10 +17,18 @@ def _absolute_avatar_url(instance, request):
     return url
 
 
+def _avatar_srcset(instance, request):
+    avatar = getattr(instance, 'avatar', None)
+    if not avatar:
+        return None
+    return srcset(instance.avatar_renditions, avatar.storage, request)
+
+
 class UserPublicSerializer(serializers.ModelSerializer):
     """Publiczne dane użytkownika — używane wszędzie w API (posts, comments, notifications, users)."""
 
     avatar_url = serializers.SerializerMethodField()
+    avatar_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -32,15 +41,20 @@ class UserPublicSerializer(serializers.ModelSerializer):
             'is_staff',
             'role',
             'avatar_url',
+            'avatar_srcset',
         ]
 
     def get_avatar_url(self, obj):
         return _absolute_avatar_url(obj, self.context.get('request'))
 
+    def get_avatar_srcset(self, obj):
+        return _avatar_srcset(obj, self.context.get('request'))
+
 
 class UserMeSerializer(serializers.ModelSerializer):
     avatar = Base64ImageField(required=False, allow_null=True, write_only=True)
     avatar_url = serializers.SerializerMethodField()
+    avatar_srcset = serializers.SerializerMethodField()
     department_name = serializers.CharField(source='department.name', read_only=True, default=None)
 
     class Meta:
@@ -59,8 +73,12 @@ class UserMeSerializer(serializers.ModelSerializer):
             'department_name',
             'avatar',
             'avatar_url',
+            'avatar_srcset',
         ]
         read_only_fields = ['id', 'username', 'email', 'is_staff', 'role', 'department']
 
     def get_avatar_url(self, obj):
         return _absolute_avatar_url(obj, self.context.get('request'))
+
+    def get_avatar_srcset(self, obj):
+        return _avatar_srcset(obj, self.context.get('request'))
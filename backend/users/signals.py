@@ -0,0 +1,23 @@
+"""
+Miniatury awatara — odświeżane po zapisie użytkownika, gdy zmienił się plik,
+i usuwane razem z użytkownikiem.
+
+Podłączane w `UsersConfig.ready`.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .images import delete_renditions_later, refresh_renditions_later
+
+
+@receiver(post_save, sender=get_user_model())
+def _render_avatar(sender, instance, raw=False, **kwargs):
+    # Porównanie nazwy pliku z `source` jest tanie, więc zwykłe zapisy (last_login itd.) nic nie kosztują.
+    if not raw:
+        refresh_renditions_later(instance, 'avatar', 'avatar_renditions')
+
+
+@receiver(post_delete, sender=get_user_model())
+def _delete_avatar_renditions(sender, instance, **kwargs):
+    delete_renditions_later(instance, 'avatar', 'avatar_renditions')
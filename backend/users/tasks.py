@@ -0,0 +1,13 @@
+from django.apps import apps
+
+from jobs.registry import task
+
+from .images import refresh_renditions
+
+
+@task('images.refresh_renditions')
+def refresh_model_renditions(model, pk, file_attr, renditions_attr):
+    instance = apps.get_model(model)._default_manager.filter(pk=pk).first()
+    if instance is None:
+        return
+    refresh_renditions(instance, file_attr, renditions_attr)